@@ -0,0 +1,165 @@
+"""
+Agent loop record/replay benchmark: a scripted session is recorded once into
+a cassette (OpenAI completions and Method HTTP exchanges), then replayed
+offline at the original timing and with no delays at all.
+
+The model is a scripted fake answering chat completions (streamed or not)
+after model_latency seconds; Method is the local stub with stub_latency per
+request. On replay neither is running: the OpenAI client and the server's
+HTTP pools answer from the cassette, so the agent loop (tool selection,
+history, MCP calls, response shaping) is what gets measured.
+
+    python -m bench.agent_replay --model-latency 0.3 --stub-latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import httpx
+from fastmcp import Client
+
+from bench.stub_method import StubMethodAPI
+from server import api
+from server.cassette import Cassette
+
+# Per query, the tool calls the fake model makes on each turn before answering
+SCRIPT = {
+    "Which entities do we have?": [[("list_entities", {"page_limit": 5})]],
+    "Show me accounts and payments side by side": [[("list_accounts", {"page_limit": 5}),
+                                                    ("list_payments", {"page_limit": 5})]],
+    "Look up entity ent_000001 and its accounts": [[("retrieve_entity", {"entity_id": "ent_000001"})],
+                                                   [("list_accounts", {"entity_id": "ent_000001"})]],
+}
+
+
+def _sse(payload: dict) -> bytes:
+    return f"data: {json.dumps(payload)}\n\n".encode()
+
+
+def _chunk(delta: dict, finish_reason=None) -> dict:
+    return {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 0, "model": "bench",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+
+class _DelayedStream(httpx.AsyncByteStream):
+    def __init__(self, chunks, first_delay: float, chunk_delay: float):
+        self._chunks = chunks
+        self._first_delay = first_delay
+        self._chunk_delay = chunk_delay
+
+    async def __aiter__(self):
+        await asyncio.sleep(self._first_delay)
+        for chunk in self._chunks:
+            await asyncio.sleep(self._chunk_delay)
+            yield chunk
+
+
+def _turn(messages) -> tuple:
+    """The scripted tool calls for this point of the conversation, or the answer text once they are used up"""
+    last_user = max(i for i, m in enumerate(messages) if m["role"] == "user")
+    turn = sum(1 for m in messages[last_user:] if m["role"] == "assistant")
+    turns = SCRIPT.get(messages[last_user]["content"], [])
+    if turn >= len(turns):
+        return [], "Here is what I found."
+    return [{"id": f"call_{turn}_{index}", "type": "function",
+             "function": {"name": name, "arguments": json.dumps(arguments)}}
+            for index, (name, arguments) in enumerate(turns[turn])], None
+
+
+def fake_model(latency: float) -> httpx.MockTransport:
+    """Answers chat completions (streamed or not) from SCRIPT after latency seconds"""
+    usage = {"prompt_tokens": 1000, "completion_tokens": 20, "total_tokens": 1020}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        tool_calls, content = _turn(body["messages"])
+        finish = "tool_calls" if tool_calls else "stop"
+        if not body.get("stream"):
+            await asyncio.sleep(latency)
+            message = {"role": "assistant", "content": content, "tool_calls": tool_calls or None}
+            return httpx.Response(200, json={
+                "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": "bench",
+                "choices": [{"index": 0, "message": message, "finish_reason": finish}], "usage": usage})
+        chunks = [_sse(_chunk({"role": "assistant", "content": None}))]
+        for index, tool_call in enumerate(tool_calls):
+            chunks.append(_sse(_chunk({"tool_calls": [dict(tool_call, index=index)]})))
+        for word in (content or "").split(" "):
+            if word:
+                chunks.append(_sse(_chunk({"content": word + " "})))
+        chunks.append(_sse(_chunk({}, finish)))
+        chunks.append(_sse({"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 0,
+                            "model": "bench", "choices": [], "usage": usage}))
+        chunks.append(b"data: [DONE]\n\n")
+        return httpx.Response(200, headers={"content-type": "text/event-stream"},
+                              stream=_DelayedStream(chunks, latency, 0.005))
+
+    return httpx.MockTransport(handler)
+
+
+async def run_session(cassette: Cassette, queries, inner=None):
+    """Run queries through a fresh client and server state; returns wall time and traced model/tool time"""
+    from client.client import OPENAIClient
+    from server.main import mcp
+    await api.tenant_pools.close_all()
+    if api.response_cache is not None:
+        api.response_cache.clear()
+    api.cassette = cassette
+
+    client = OPENAIClient(openai_api_key="bench", methodapi_key="bench", tool_catalog_dir=None, cassette=cassette)
+    if inner is not None:
+        from openai import AsyncOpenAI
+        client.async_openai_client = AsyncOpenAI(
+            api_key="bench", http_client=httpx.AsyncClient(transport=cassette.transport(inner)))
+    client.mcp_client = Client(mcp)
+    model = tools = 0.0
+    async with client.mcp_client:
+        await client.initialize()
+        start = time.perf_counter()
+        for query in queries:
+            await client.process_query(query)
+            summary = client.last_trace_summary
+            model += summary["model_seconds"]
+            tools += summary["tool_wait_seconds"]
+        wall = time.perf_counter() - start
+    await api.tenant_pools.close_all()
+    cassette.close()
+    return wall, model, tools
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-latency", type=float, default=0.3, help="Fake model time to first chunk in seconds")
+    parser.add_argument("--stub-latency", type=float, default=0.05, help="Stub API latency per request in seconds")
+    parser.add_argument("--cassette", help="Keep the recorded cassette at this path")
+    args = parser.parse_args()
+
+    api.snapshot_store = None
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.cassette or os.path.join(tmp, "session.jsonl")
+        stub = StubMethodAPI(latency=args.stub_latency).start()
+        api.base_url = stub.base_url
+        try:
+            recorder = Cassette(path, "record")
+            wall, model, tools = await run_session(recorder, list(SCRIPT), inner=fake_model(args.model_latency))
+            recorded = recorder.stats()["recorded"]
+        finally:
+            stub.stop()
+        print(f"{'record (live)':<18} wall {wall:6.3f}s  model {model:6.3f}s  tools {tools:6.3f}s  "
+              f"exchanges recorded={recorded}")
+
+        # Nothing is listening here any more; every request must come from the cassette
+        api.base_url = "http://127.0.0.1:9"
+        for label, scale in (("replay x1", 1.0), ("replay x0", 0.0)):
+            player = Cassette(path, "replay", time_scale=scale)
+            queries = [note["text"] for note in player.notes("query")]
+            wall, model, tools = await run_session(player, queries)
+            stats = player.stats()
+            print(f"{label:<18} wall {wall:6.3f}s  model {model:6.3f}s  tools {tools:6.3f}s  "
+                  f"replayed={stats['replayed']} in order={stats['replayed_in_order']} missed={stats['missed']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+"""
+Batch benchmark: sequential retrieve_account tool calls vs one batch_retrieve_accounts call.
+
+Both go through an in-memory FastMCP client against the stub Method API,
+so each single call pays the same MCP framing a real agent turn would.
+
+    python -m bench.batch --accounts 40 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastmcp import Client
+
+from bench.stub_method import StubMethodAPI
+from server import api
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=40, help="Number of accounts to retrieve")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub API latency per request in seconds")
+    parser.add_argument("--concurrency", type=int, default=8, help="Batch fan-out concurrency")
+    args = parser.parse_args()
+
+    stub = StubMethodAPI(latency=args.latency).start()
+    api.base_url = stub.base_url
+    # Measure the network path, not response cache hits
+    api.response_cache = None
+    api.snapshot_store = None
+    api.batch_concurrency = args.concurrency
+    try:
+        from server.main import mcp
+        account_ids = list(stub.data["accounts"])[:args.accounts]
+
+        async with Client(mcp) as client:
+            start = time.perf_counter()
+            for account_id in account_ids:
+                await client.call_tool("retrieve_account", {"account_id": account_id})
+            sequential = time.perf_counter() - start
+
+            start = time.perf_counter()
+            result = await client.call_tool("batch_retrieve_accounts", {"account_ids": account_ids})
+            batched = time.perf_counter() - start
+            summary = json.loads(result.content[0].text)
+
+        print(f"sequential retrieve_account   {len(account_ids):>4} calls  {sequential:8.3f}s")
+        print(f"batch_retrieve_accounts       {1:>4} call   {batched:8.3f}s  "
+              f"succeeded={summary['succeeded']} failed={summary['failed']}")
+        print(f"\nspeedup: {sequential / batched:.1f}x")
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
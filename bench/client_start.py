@@ -0,0 +1,94 @@
+"""
+Client cold start benchmark: import time of client.client (OpenAI deferred)
+and connect + tool list time with and without the cached tool catalog.
+
+Runs the MCP server's HTTP app on a local port, which publishes its tool
+schema hash like `python -m server.main` does, and starts OPENAIClient against it
+repeatedly: without a catalog, with an empty catalog (first run fetches and
+saves), then with the saved catalog.
+
+    python -m bench.client_start --runs 10
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import uvicorn
+
+from bench.stub_method import StubMethodAPI
+
+IMPORT_SNIPPET = "import time; s = time.perf_counter(); import {module}; print(time.perf_counter() - s)"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_seconds(module: str, runs: int) -> float:
+    """Median import time of a module in a fresh interpreter"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET.format(module=module)], cwd=root,
+                             capture_output=True, text=True, check=True).stdout
+        samples.append(float(out.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+async def start_client(url: str, catalog_dir):
+    from client.client import OPENAIClient
+    client = OPENAIClient(openai_api_key="bench", methodapi_key="bench", server_url=url, tool_catalog_dir=catalog_dir)
+    start = time.perf_counter()
+    async with client.mcp_client:
+        await client.initialize()
+        elapsed = time.perf_counter() - start
+    return elapsed, client.startup_timings["tool_catalog"]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Client starts per scenario")
+    args = parser.parse_args()
+
+    print(f"{'import client.client':<34} {import_seconds('client.client', 5):7.3f}s  (median of 5 fresh interpreters)")
+    print(f"{'import openai (deferred)':<34} {import_seconds('openai', 5):7.3f}s")
+
+    stub = StubMethodAPI(latency=0.0).start()
+    from server import api
+    from server.main import mcp
+    api.base_url = stub.base_url
+    api.snapshot_store = None
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(mcp.http_app(), host="127.0.0.1", port=port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    url = f"http://127.0.0.1:{port}/mcp"
+    try:
+        with tempfile.TemporaryDirectory() as catalog_dir:
+            for label, directory in (("no catalog (list_tools)", None), ("catalog", catalog_dir)):
+                samples, sources = [], []
+                for _ in range(args.runs):
+                    elapsed, source = await start_client(url, directory)
+                    samples.append(elapsed)
+                    sources.append(source)
+                warm = samples[1:] if directory else samples
+                print(f"{label:<34} {statistics.median(warm) * 1000:7.1f}ms connect + tools (median), "
+                      f"first {samples[0] * 1000:.1f}ms, {sources.count('cached')}/{len(sources)} cached")
+    finally:
+        server.should_exit = True
+        await server_task
+        stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+Load benchmark: N concurrent tool calls against the stub Method API.
+
+Compares the old blocking call path (requests inside an async tool) with the
+non-blocking async_call_endpoint path, and then drives the real MCP tools
+through an in-memory FastMCP client.
+
+    python -m bench.load --concurrency 50 --latency 0.05
+"""
+import argparse
+import asyncio
+import time
+
+from fastmcp import Client
+
+from bench.stub_method import StubMethodAPI
+from server import api
+
+
+async def _blocking_tool(entity_id: str):
+    # What every tool did before: a synchronous HTTP call on the event loop
+    return api.call_endpoint(f"/entities/{entity_id}", "GET")
+
+
+async def _async_tool(entity_id: str):
+    return await api.async_call_endpoint(f"/entities/{entity_id}", "GET")
+
+
+async def _run(label: str, factory, ids):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(factory(i) for i in ids))
+    elapsed = time.perf_counter() - start
+    errors = sum(1 for r in results if isinstance(r, dict) and r.get("error"))
+    print(f"{label:<28} {len(ids):>5} calls  {elapsed:8.3f}s  {len(ids) / elapsed:9.1f} calls/s  errors={errors}")
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50, help="Number of concurrent tool calls")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub API latency per request in seconds")
+    args = parser.parse_args()
+
+    stub = StubMethodAPI(latency=args.latency).start()
+    api.base_url = stub.base_url
+    # Measure the network path, not response cache hits
+    api.response_cache = None
+    api.snapshot_store = None
+    try:
+        entity_ids = list(stub.data["entities"])[:args.concurrency]
+        ids = [entity_ids[i % len(entity_ids)] for i in range(args.concurrency)]
+
+        before = await _run("blocking call_endpoint", _blocking_tool, ids)
+        after = await _run("async_call_endpoint", _async_tool, ids)
+
+        from server.main import mcp
+        async with Client(mcp) as client:
+            await _run("MCP retrieve_entity tool",
+                       lambda i: client.call_tool("retrieve_entity", {"entity_id": i}), ids)
+
+        print(f"\nspeedup: {before / after:.1f}x")
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""
+Payload benchmark: bytes returned to the model per tool and view.
+
+Compares the raw Method response each tool used to return with the full
+(null-free), summary and ids_only projections, calling the tools through an
+in-memory FastMCP client against the stub Method API.
+
+    python -m bench.payload
+"""
+import asyncio
+import json
+
+from fastmcp import Client
+
+from bench.stub_method import StubMethodAPI
+from server import api
+
+VIEWS = ("full", "summary", "ids_only")
+
+
+def _text_bytes(result) -> int:
+    return sum(len(block.text.encode()) for block in result.content if hasattr(block, "text"))
+
+
+async def main():
+    stub = StubMethodAPI(latency=0).start()
+    api.base_url = stub.base_url
+    api.snapshot_store = None
+    try:
+        from server.main import mcp
+        entity_id = next(iter(stub.data["entities"]))
+        account_id = next(iter(stub.data["accounts"]))
+        payment_id = next(iter(stub.data["payments"]))
+        cases = [
+            ("retrieve_entity", {"entity_id": entity_id}, f"/entities/{entity_id}"),
+            ("retrieve_account", {"account_id": account_id}, f"/accounts/{account_id}"),
+            ("retrieve_payment", {"payment_id": payment_id}, f"/payments/{payment_id}"),
+            ("list_entities", {"page_limit": 100}, "/entities?page[limit]=100"),
+            ("list_accounts", {"page_limit": 100}, "/accounts?page[limit]=100"),
+            ("list_payments", {"page_limit": 100}, "/payments?page[limit]=100"),
+            ("list_merchants", {}, "/merchants"),
+        ]
+
+        print(f"{'tool':<20} {'raw':>9} " + " ".join(f"{v:>9}" for v in VIEWS) + f" {'saved':>7}")
+        async with Client(mcp) as client:
+            for tool, arguments, endpoint in cases:
+                raw = len(json.dumps(await api.async_call_endpoint(endpoint), separators=(",", ":")).encode())
+                sizes = []
+                for view in VIEWS:
+                    result = await client.call_tool(tool, dict(arguments, view=view))
+                    sizes.append(_text_bytes(result))
+                saved = 1 - sizes[1] / raw
+                print(f"{tool:<20} {raw:>9} " + " ".join(f"{n:>9}" for n in sizes) + f" {saved:>7.0%}")
+        print("\nsaved = summary view vs raw Method response")
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
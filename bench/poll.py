@@ -0,0 +1,78 @@
+"""
+Polling benchmark: create_balance then retrieve_balance until completed, as an
+agent does it, vs create_balance with wait=true polling on the server.
+
+Several callers wait on balances concurrently. The agent-style loop sleeps
+--turn-delay between attempts to stand in for the LLM round trip of each poll.
+The server-side waits run --rounds times, so later rounds show the first poll
+timed from the job durations the poller has learned.
+
+    python -m bench.poll --callers 10 --job-duration 1.5 --turn-delay 2
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastmcp import Client
+
+from bench.stub_method import StubMethodAPI
+from server import api
+
+
+async def agent_style(client: Client, account_id: str, turn_delay: float) -> int:
+    result = await client.call_tool("create_balance", {"account_id": account_id})
+    balance = json.loads(result.content[0].text)["data"]
+    turns = 1
+    while balance["status"] not in ("completed", "failed"):
+        await asyncio.sleep(turn_delay)
+        result = await client.call_tool("retrieve_balance", {"account_id": account_id, "balance_id": balance["id"]})
+        balance = json.loads(result.content[0].text)["data"]
+        turns += 1
+    return turns
+
+
+async def server_wait(client: Client, account_id: str) -> int:
+    result = await client.call_tool("create_balance", {"account_id": account_id, "wait": True})
+    balance = json.loads(result.content[0].text)["data"]
+    assert balance["status"] == "completed", balance
+    return 1
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callers", type=int, default=10, help="Concurrent balance requests")
+    parser.add_argument("--job-duration", type=float, default=1.5, help="Seconds a balance stays pending")
+    parser.add_argument("--turn-delay", type=float, default=2.0, help="Simulated LLM round trip per agent poll")
+    parser.add_argument("--rounds", type=int, default=2, help="Rounds of server-side waits")
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub API latency per request in seconds")
+    args = parser.parse_args()
+
+    stub = StubMethodAPI(latency=args.latency, job_duration=args.job_duration).start()
+    api.base_url = stub.base_url
+    api.response_cache = None
+    api.snapshot_store = None
+    try:
+        from server.main import mcp
+        account_ids = list(stub.data["accounts"])[:args.callers]
+
+        async with Client(mcp) as client:
+            runs = [("agent polling", lambda a: agent_style(client, a, args.turn_delay))]
+            runs += [(f"server wait=true #{i + 1}", lambda a: server_wait(client, a)) for i in range(args.rounds)]
+            for label, run in runs:
+                requests_before = stub.request_count
+                start = time.perf_counter()
+                turns = await asyncio.gather(*(run(account_id) for account_id in account_ids))
+                elapsed = time.perf_counter() - start
+                upstream = stub.request_count - requests_before
+                print(f"{label:<20} {elapsed:7.2f}s  tool calls={sum(turns):>4}  "
+                      f"upstream requests={upstream:>4} ({upstream / len(account_ids):.1f} per wait)")
+            from server.main import job_poller
+            stats = job_poller.stats()
+            print(f"server polls per wait {stats['polls_per_wait']}, learned job durations {stats['typical_seconds']}")
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+Local query benchmark: "outstanding payments this month, summed by destination
+merchant", answered through list/retrieve tool calls vs one aggregate_snapshot
+call over the synced snapshot store.
+
+    python -m bench.query --entities 2000 --payments 8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+from fastmcp import Client
+
+from bench.stub_method import StubMethodAPI
+from server import api
+from server.store import SnapshotStore
+
+OUTSTANDING = ["pending", "processing", "sent"]
+MONTH_START, MONTH_END = "2024-12-01", "2024-12-31"
+
+
+async def call(client: Client, name: str, arguments: dict):
+    result = await client.call_tool(name, arguments)
+    text = result.content[0].text
+    return json.loads(text), len(text.encode())
+
+
+async def via_api(client: Client):
+    calls, size = 1, 0
+    listed, n = await call(client, "list_payments", {"all_pages": True, "max_items": 10000,
+                                                     "fields": ["id", "destination", "amount", "status", "created_at"]})
+    size += n
+    payments = [p for p in listed["data"] if p["status"] in OUTSTANDING
+                and MONTH_START <= p["created_at"][:10] <= MONTH_END]
+    destinations = sorted({p["destination"] for p in payments})
+    merchant_of = {}
+    for i in range(0, len(destinations), 100):
+        batch, n = await call(client, "batch_retrieve_accounts", {"account_ids": destinations[i:i + 100],
+                                                                  "fields": ["liability.mch_id"]})
+        calls += 1
+        size += n
+        merchant_of.update({acc_id: acc["liability"]["mch_id"] for acc_id, acc in batch["results"].items()})
+    totals = defaultdict(int)
+    for p in payments:
+        totals[merchant_of[p["destination"]]] += p["amount"]
+    return dict(totals), calls, size
+
+
+async def via_snapshot(client: Client):
+    result, size = await call(client, "aggregate_snapshot", {
+        "collection": "payments", "group_by": ["destination.liability.mch_id"], "metric": "sum",
+        "value_field": "amount", "where": {"status": OUTSTANDING},
+        "created_from": MONTH_START, "created_to": MONTH_END, "limit": 1000,
+    })
+    return {g["destination.liability.mch_id"]: g["sum"] for g in result["groups"]}, 1, size, result["query_ms"]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=2000, help="Entities in the stub (two accounts each)")
+    parser.add_argument("--payments", type=int, default=8000, help="Payments in the stub")
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub API latency per request in seconds")
+    args = parser.parse_args()
+
+    stub = StubMethodAPI(latency=args.latency, n_entities=args.entities, n_payments=args.payments).start()
+    api.base_url = stub.base_url
+    api.response_cache = None
+    with tempfile.TemporaryDirectory() as tmp:
+        api.snapshot_store = SnapshotStore(os.path.join(tmp, "store.sqlite3"))
+        try:
+            from server.main import mcp
+            await api.sync_store(["accounts", "payments"], full=True)
+            async with Client(mcp) as client:
+                before = stub.request_count
+                start = time.perf_counter()
+                expected, calls, size = await via_api(client)
+                elapsed = time.perf_counter() - start
+                print(f"list + batch retrieve  {elapsed:7.3f}s  tool calls={calls:>3}  "
+                      f"upstream requests={stub.request_count - before:>4}  bytes to model={size:>9}")
+
+                before = stub.request_count
+                start = time.perf_counter()
+                totals, calls, size, query_ms = await via_snapshot(client)
+                elapsed = time.perf_counter() - start
+                print(f"aggregate_snapshot     {elapsed:7.3f}s  tool calls={calls:>3}  "
+                      f"upstream requests={stub.request_count - before:>4}  bytes to model={size:>9}  "
+                      f"(query {query_ms}ms)")
+                print(f"\nsame answer: {totals == expected} ({len(totals)} merchants)")
+        finally:
+            api.snapshot_store.close()
+            stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""
+Batch query benchmark: throughput of `python -m client.client --batch` at
+several concurrency levels.
+
+A JSONL file of queries (cycling over the scripted ones of
+bench.agent_replay) is answered by the fake model of that benchmark with
+model_latency seconds per completion, over one in-memory MCP connection to the
+server backed by the local stub.
+
+    python -m bench.query_batch --queries 60 --concurrency 1 8 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+
+import httpx
+from fastmcp import Client
+
+from bench.agent_replay import SCRIPT, fake_model
+from bench.stub_method import StubMethodAPI
+from client.batch import format_batch, run_batch
+from server import api
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=60, help="Queries in the batch")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Levels to run")
+    parser.add_argument("--model-latency", type=float, default=0.3, help="Fake model time per completion in seconds")
+    parser.add_argument("--stub-latency", type=float, default=0.05, help="Stub API latency per request in seconds")
+    args = parser.parse_args()
+
+    from client.client import OPENAIClient
+    from openai import AsyncOpenAI
+    from server.main import mcp
+
+    stub = StubMethodAPI(latency=args.stub_latency).start()
+    api.base_url = stub.base_url
+    api.snapshot_store = None
+    scripted = list(SCRIPT)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            queries = os.path.join(tmp, "queries.jsonl")
+            with open(queries, "w") as f:
+                for i in range(args.queries):
+                    f.write(json.dumps({"id": f"q{i}", "query": scripted[i % len(scripted)]}) + "\n")
+
+            client = OPENAIClient(openai_api_key="bench", methodapi_key="bench", tool_catalog_dir=None)
+            client.async_openai_client = AsyncOpenAI(
+                api_key="bench", http_client=httpx.AsyncClient(transport=fake_model(args.model_latency)))
+            client.mcp_client = Client(mcp)
+            async with client.mcp_client:
+                await client.initialize()
+                for concurrency in args.concurrency:
+                    # Every level starts cold, so cached reads do not favour later ones
+                    if api.response_cache is not None:
+                        api.response_cache.clear()
+                    output = os.path.join(tmp, f"results-{concurrency}.jsonl")
+                    totals = await run_batch(client, queries, output, concurrency)
+                    with open(output) as f:
+                        finished = [json.loads(line)["id"] for line in f]
+                    print(format_batch(dict(totals, output=f"{len(finished)} result lines")))
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""
+Snapshot store benchmark: full sync, incremental sync, cold-start load and
+retrieves served from the store, against the stub Method API.
+
+The default fixture holds about 100k objects (20k entities, 40k accounts,
+40k payments). The store is written to a temporary file.
+
+    python -m bench.store --entities 20000 --payments 40000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from bench.stub_method import StubMethodAPI
+from server import api
+from server.store import SnapshotStore
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=20000, help="Entities in the stub (two accounts each)")
+    parser.add_argument("--payments", type=int, default=40000, help="Payments in the stub")
+    parser.add_argument("--new", type=int, default=50, help="Payments created between the full and incremental sync")
+    parser.add_argument("--retrieves", type=int, default=200, help="retrieve calls served after the sync")
+    args = parser.parse_args()
+
+    stub = StubMethodAPI(latency=0, n_entities=args.entities, n_payments=args.payments).start()
+    api.base_url = stub.base_url
+    api.response_cache = None
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "store.sqlite3")
+        api.snapshot_store = SnapshotStore(path)
+        try:
+            start = time.perf_counter()
+            full = await api.sync_store(full=True)
+            print(f"full sync          {time.perf_counter() - start:7.2f}s  "
+                  + "  ".join(f"{c}={r['fetched']}" for c, r in full.items()))
+
+            account_ids = list(stub.data["accounts"])
+            for i in range(args.new):
+                await api.async_call_endpoint("/payments", "POST", data={
+                    "source": account_ids[i], "destination": account_ids[i + 1], "amount": 100 + i})
+            requests_before = stub.request_count
+            start = time.perf_counter()
+            incremental = await api.sync_store()
+            print(f"incremental sync   {time.perf_counter() - start:7.2f}s  "
+                  + "  ".join(f"{c}={r['fetched']}/{r['written']}" for c, r in incremental.items())
+                  + f"  (fetched/written, {stub.request_count - requests_before} requests)")
+
+            requests_before = stub.request_count
+            start = time.perf_counter()
+            for account_id in account_ids[:args.retrieves]:
+                await api.async_call_endpoint(f"/accounts/{account_id}")
+            elapsed = time.perf_counter() - start
+            print(f"retrieve_account   {elapsed * 1000 / args.retrieves:7.3f}ms each  "
+                  f"upstream requests={stub.request_count - requests_before}")
+            api.snapshot_store.close()
+
+            cold = SnapshotStore(path)
+            cold.open()
+            print(f"cold start load    {cold.load_seconds:7.3f}s  objects={cold.count()}")
+            cold.close()
+        finally:
+            stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,314 @@
+"""
+A small in-process fake of the Method API used by the benchmarks.
+
+It serves deterministic entities, accounts, payments and merchants with a
+configurable artificial latency, so tools can be exercised offline.
+Balances, updates, connects and credit scores stay pending for
+job_duration seconds before they complete. With a webhook_url, update()
+changes a resource and POSTs a signed event about it, like Method would.
+error_rate answers that fraction of requests with error_status,
+payload_bytes pads every entity, account and payment, and page_size is the
+default page limit of list endpoints.
+"""
+import asyncio
+import itertools
+import json
+import random
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from server.webhooks import SIGNATURE_HEADER, sign
+
+
+def _timestamp(fraction: float) -> str:
+    """Creation time spread over 2024, so date-filtered (incremental) syncs see realistic slices"""
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(1704067200 + fraction * 365 * 86400))
+
+
+def _make_fixtures(n_entities: int, accounts_per_entity: int, n_payments: int, n_merchants: int,
+                   payload_bytes: int = 0) -> Dict[str, Dict[str, dict]]:
+    entities = {}
+    accounts = {}
+    payments = {}
+    merchants = {}
+
+    for i in range(n_merchants):
+        mch_id = f"mch_{i}"
+        merchants[mch_id] = {
+            "id": mch_id,
+            "parent_name": f"Bank {i // 3}",
+            "name": f"Bank {i // 3} Card {i}",
+            "logo": f"https://static.methodfi.com/mch_logos/{mch_id}.png",
+            "type": ["credit_card", "auto_loan", "student_loan", "mortgage"][i % 4],
+            "provider_ids": {"plaid": [f"ins_{i}"], "mx": [f"mx_{i}"], "finicity": []},
+            "is_temp": False,
+            "account_number_formats": ["################"],
+        }
+
+    for i in range(n_entities):
+        ent_id = f"ent_{i:06d}"
+        ts = _timestamp(i / n_entities)
+        entities[ent_id] = {
+            "id": ent_id,
+            "type": "individual",
+            "individual": {
+                "first_name": f"First{i}",
+                "last_name": f"Last{i}",
+                "phone": "+16505555555",
+                "email": f"user{i}@example.com",
+                "dob": "1990-01-01",
+            },
+            "address": {"line1": "1 Main St", "line2": None, "city": "Austin", "state": "TX", "zip": "78701"},
+            "status": "active",
+            "verification": {"identity": {"verified": True}, "phone": {"verified": True}},
+            "metadata": None,
+            "created_at": ts,
+            "updated_at": ts,
+        }
+        for j in range(accounts_per_entity):
+            acc_id = f"acc_{i:06d}_{j}"
+            accounts[acc_id] = {
+                "id": acc_id,
+                "holder_id": ent_id,
+                "status": "active",
+                "type": "liability",
+                "liability": {
+                    "mch_id": f"mch_{(i + j) % max(n_merchants, 1)}",
+                    "mask": "1234",
+                    "type": "credit_card",
+                    "name": "Card",
+                },
+                "metadata": None,
+                "created_at": ts,
+                "updated_at": ts,
+            }
+
+    account_ids = list(accounts)
+    for i in range(n_payments):
+        pmt_id = f"pmt_{i:06d}"
+        ts = _timestamp(i / n_payments)
+        payments[pmt_id] = {
+            "id": pmt_id,
+            "source": account_ids[i % len(account_ids)] if account_ids else None,
+            "destination": account_ids[(i + 1) % len(account_ids)] if account_ids else None,
+            "amount": 1000 + i,
+            "description": "Payment",
+            "status": ["pending", "processing", "sent", "settled"][i % 4],
+            "metadata": None,
+            "created_at": ts,
+            "updated_at": ts,
+        }
+
+    if payload_bytes:
+        padding = {"notes": "x" * payload_bytes}
+        for collection in (entities, accounts, payments):
+            for obj in collection.values():
+                obj["metadata"] = padding
+    return {"entities": entities, "accounts": accounts, "payments": payments, "merchants": merchants}
+
+
+class StubMethodAPI:
+    """Fake Method API served by uvicorn on a background thread."""
+
+    def __init__(self,
+                 latency: float = 0.05,
+                 n_entities: int = 200,
+                 accounts_per_entity: int = 2,
+                 n_payments: int = 400,
+                 n_merchants: int = 60,
+                 job_duration: float = 1.0,
+                 webhook_url: Optional[str] = None,
+                 webhook_secret: str = "stub-secret",
+                 error_rate: float = 0.0,
+                 error_status: int = 500,
+                 payload_bytes: int = 0,
+                 page_size: int = 100,
+                 seed: int = 0,
+                 port: Optional[int] = None):
+        self.latency = latency
+        self.job_duration = job_duration
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.events_sent = 0
+        self.port = port or _free_port()
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.page_size = page_size
+        self.errors_sent = 0
+        self._random = random.Random(seed)
+        self.data = _make_fixtures(n_entities, accounts_per_entity, n_payments, n_merchants, payload_bytes)
+        self.request_count = 0
+        self._ids = itertools.count(1)
+        # Balances, updates, connects and credit scores by id, with the time they were created
+        self.jobs: Dict[str, Tuple[float, dict]] = {}
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self.app = Starlette(routes=[
+            Route("/{path:path}", self._handle, methods=["GET", "POST", "PUT", "DELETE"]),
+        ])
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def _envelope(self, data, status_code: int = 200, headers: Optional[dict] = None) -> JSONResponse:
+        return JSONResponse({"success": status_code < 400, "data": data, "message": None},
+                            status_code=status_code, headers=headers)
+
+    def _list(self, items: List[dict], request: Request) -> JSONResponse:
+        limit = min(int(request.query_params.get("page[limit]", self.page_size)), 250)
+        cursor = request.query_params.get("page[cursor]")
+        start = int(cursor) if cursor else 0
+        page = items[start:start + limit]
+        headers = {
+            "Pagination-Page-Limit": str(limit),
+            "Pagination-Total-Count": str(len(items)),
+        }
+        if start + limit < len(items):
+            headers["Pagination-Page-Cursor-Next"] = str(start + limit)
+        if start > 0:
+            headers["Pagination-Page-Cursor-Prev"] = str(max(start - limit, 0))
+        return self._envelope(page, headers=headers)
+
+    def _create_child(self, prefix: str, parent_key: str, parent_id: str) -> dict:
+        now = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+        return {
+            "id": f"{prefix}_{next(self._ids):08d}",
+            parent_key: parent_id,
+            "status": "pending",
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+    async def _handle(self, request: Request) -> JSONResponse:
+        self.request_count += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors_sent += 1
+            return JSONResponse({"success": False, "data": None, "message": "Injected stub error",
+                                 "type": "api_error", "code": self.error_status}, status_code=self.error_status)
+
+        parts = [p for p in request.url.path.split("/") if p]
+        method = request.method
+        if not parts:
+            return self._envelope(None, 404)
+
+        collection = parts[0]
+        store = self.data.get(collection)
+
+        if store is not None and len(parts) == 1:
+            if method == "GET":
+                items = list(store.values())
+                holder_id = request.query_params.get("holder_id")
+                if holder_id:
+                    items = [i for i in items if i.get("holder_id") == holder_id]
+                from_date = request.query_params.get("from_date")
+                if from_date:
+                    items = [i for i in items if (i.get("created_at") or "")[:10] >= from_date]
+                if collection == "merchants":
+                    return self._envelope(items)
+                return self._list(items, request)
+            if method == "POST":
+                body = await request.json()
+                prefix = {"entities": "ent", "accounts": "acc", "payments": "pmt"}.get(collection, "obj")
+                now = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+                obj = dict(body, id=f"{prefix}_{next(self._ids):08d}", status="active", created_at=now, updated_at=now)
+                store[obj["id"]] = obj
+                return self._envelope(obj)
+
+        if store is not None and len(parts) == 2:
+            obj = store.get(parts[1])
+            if obj is None:
+                return JSONResponse({"success": False, "data": None, "message": f"{parts[1]} not found",
+                                     "type": "invalid_request", "code": 404}, status_code=404)
+            if method == "PUT":
+                body = await request.json()
+                obj.update(body)
+            if method == "DELETE":
+                obj = store.pop(parts[1])
+            return self._envelope(obj)
+
+        if len(parts) >= 3:
+            child = parts[2]
+            prefix = {"balances": "bal", "updates": "upt", "connect": "cxn",
+                      "credit_scores": "crs", "subscriptions": "sub"}.get(child, "obj")
+            parent_key = "account_id" if collection == "accounts" else "entity_id"
+            if method == "POST":
+                obj = self._create_child(prefix, parent_key, parts[1])
+                self.jobs[obj["id"]] = (time.monotonic(), obj)
+                return self._envelope(obj)
+            if len(parts) == 4:
+                created_at, obj = self.jobs.get(parts[3], (0.0, None))
+                if obj is None:
+                    obj = self._create_child(prefix, parent_key, parts[1])
+                    obj["id"] = parts[3]
+                # Jobs stay pending for job_duration seconds, then complete
+                if time.monotonic() - created_at >= self.job_duration:
+                    obj["status"] = "completed"
+                return self._envelope(obj)
+            return self._envelope([])
+
+        return self._envelope(None, 404)
+
+    def emit(self, event_type: str, path: str) -> httpx.Response:
+        """POST a signed webhook event about the resource at path to webhook_url"""
+        self.events_sent += 1
+        body = json.dumps({
+            "id": path.rsplit("/", 1)[-1],
+            "type": event_type,
+            "path": path,
+            "event_id": f"evt_{next(self._ids):08d}",
+        }).encode()
+        headers = {"Content-Type": "application/json", SIGNATURE_HEADER: sign(self.webhook_secret, body)}
+        return httpx.post(self.webhook_url, content=body, headers=headers)
+
+    def update(self, collection: str, obj_id: str, **fields) -> dict:
+        """Change a stored resource as Method would, emitting <type>.update when a webhook_url is set"""
+        obj = self.data[collection][obj_id]
+        obj.update(fields, updated_at=time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()))
+        if self.webhook_url:
+            kind = {"entities": "entity", "accounts": "account", "payments": "payment"}[collection]
+            self.emit(f"{kind}.update", f"/{collection}/{obj_id}")
+        return obj
+
+    def start(self) -> "StubMethodAPI":
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.should_exit = True
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+if __name__ == "__main__":
+    stub = StubMethodAPI().start()
+    print(f"Stub Method API listening on {stub.base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stub.stop()
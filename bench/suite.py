@@ -0,0 +1,229 @@
+"""
+Benchmark suite: a weighted mix of realistic tool calls driven through an
+in-memory FastMCP client against the stub Method API, at several concurrency
+levels. Reports p50/p95/p99 latency and throughput per tool and writes the
+results as JSON, so runs from different commits can be compared.
+
+    python -m bench.suite --concurrency 1 8 32 --calls 400 --output results.json
+    python -m bench.suite --compare baseline.json --fail-on-regression
+
+The response cache, snapshot store and merchant snapshot are isolated (off or
+in a temporary directory) so results reflect the request path, not state left
+over from earlier runs.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+from fastmcp import Client
+
+from bench.stub_method import StubMethodAPI
+from server import api
+
+# (tool, weight, arguments builder) - roughly what an agent does across a session
+Mix = List[Tuple[str, int, Callable[[random.Random, Dict], Dict]]]
+
+DEFAULT_MIX: Mix = [
+    ("retrieve_account", 25, lambda r, d: {"account_id": r.choice(d["accounts"])}),
+    ("retrieve_entity", 15, lambda r, d: {"entity_id": r.choice(d["entities"])}),
+    ("list_accounts", 15, lambda r, d: {"entity_id": r.choice(d["entities"]), "view": "summary"}),
+    ("list_payments", 10, lambda r, d: {"page_limit": 50, "view": "summary"}),
+    ("retrieve_payment", 10, lambda r, d: {"payment_id": r.choice(d["payments"])}),
+    ("search_merchants", 10, lambda r, d: {"query": f"Bank {r.randrange(20)}"}),
+    ("create_balance", 10, lambda r, d: {"account_id": r.choice(d["accounts"])}),
+    ("batch_retrieve_accounts", 5, lambda r, d: {"account_ids": r.sample(d["accounts"], 10), "view": "summary"}),
+]
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> Dict:
+    return {
+        "calls": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / seconds, 2) if seconds else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def _is_error(result) -> bool:
+    if getattr(result, "is_error", False):
+        return True
+    structured = getattr(result, "structured_content", None)
+    if isinstance(structured, dict):
+        inner = structured.get("result", structured)
+        return isinstance(inner, dict) and bool(inner.get("error"))
+    return False
+
+
+async def run_level(client: Client, mix: Mix, ids: Dict, concurrency: int, calls: int, seed: int) -> Dict:
+    """Run `calls` tool calls from the mix with `concurrency` workers; returns the per-tool summary"""
+    rng = random.Random(seed)
+    tools = [tool for tool, _, _ in mix]
+    weights = [weight for _, weight, _ in mix]
+    builders = {tool: build for tool, _, build in mix}
+    plan = [(tool, builders[tool](rng, ids)) for tool in rng.choices(tools, weights, k=calls)]
+    queue = iter(plan)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+
+    async def worker():
+        for tool, arguments in queue:
+            start = time.perf_counter()
+            try:
+                result = await client.call_tool(tool, arguments, raise_on_error=False)
+                failed = _is_error(result)
+            except Exception:
+                failed = True
+            latencies[tool].append(time.perf_counter() - start)
+            errors[tool] += int(failed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    every = [latency for samples in latencies.values() for latency in samples]
+    return {
+        "concurrency": concurrency,
+        "seconds": round(seconds, 3),
+        "overall": summarize(every, sum(errors.values()), seconds),
+        "tools": {tool: summarize(latencies[tool], errors[tool], seconds) for tool in sorted(latencies)},
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def print_level(level: Dict):
+    print(f"\nconcurrency {level['concurrency']}: {level['overall']['calls']} calls in {level['seconds']}s, "
+          f"{level['overall']['throughput']} calls/s, {level['overall']['errors']} errors")
+    print(f"  {'tool':<26}{'calls':>6}{'errors':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for tool, stats in list(level["tools"].items()) + [("(all)", level["overall"])]:
+        print(f"  {tool:<26}{stats['calls']:>6}{stats['errors']:>7}"
+              f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+
+def compare(results: Dict, baseline: Dict, threshold: float, min_calls: int = 20) -> List[str]:
+    """
+    Regressions of p95 latency or throughput beyond threshold (a fraction)
+    against a baseline run. Tools with fewer than min_calls samples in either
+    run are shown but not flagged, their p95 is too noisy to compare.
+    """
+    regressions = []
+    baseline_levels = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    print(f"\nvs baseline {baseline.get('meta', {}).get('commit', '?')} (threshold {threshold:.0%})")
+    for level in results["levels"]:
+        base = baseline_levels.get(level["concurrency"])
+        if base is None:
+            continue
+        rows = [("(all)", level["overall"], base["overall"])]
+        rows += [(tool, stats, base["tools"][tool]) for tool, stats in level["tools"].items() if tool in base["tools"]]
+        for tool, now, before in rows:
+            p95_change = now["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+            line = f"  c={level['concurrency']:<4}{tool:<26} p95 {before['p95_ms']:>9.2f} -> {now['p95_ms']:>9.2f}ms ({p95_change:+.1%})"
+            if tool == "(all)":
+                tp_change = now["throughput"] / before["throughput"] - 1 if before["throughput"] else 0.0
+                line += f"  throughput {before['throughput']} -> {now['throughput']} ({tp_change:+.1%})"
+                if tp_change < -threshold:
+                    regressions.append(f"c={level['concurrency']} throughput {tp_change:+.1%}")
+            if p95_change > threshold and min(now["calls"], before["calls"]) >= min_calls:
+                line += "  REGRESSION"
+                regressions.append(f"c={level['concurrency']} {tool} p95 {p95_change:+.1%}")
+            print(line)
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Concurrency levels to run")
+    parser.add_argument("--calls", type=int, default=400, help="Tool calls per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub API latency per request in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=500, help="Status code of injected errors")
+    parser.add_argument("--payload-bytes", type=int, default=0, help="Padding added to every entity, account and payment")
+    parser.add_argument("--page-size", type=int, default=100, help="Default page size of stub list endpoints")
+    parser.add_argument("--entities", type=int, default=500, help="Entities in the stub (two accounts each)")
+    parser.add_argument("--payments", type=int, default=1000, help="Payments in the stub")
+    parser.add_argument("--cache", action="store_true", help="Keep the response cache on")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the call mix and injected errors")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression")
+    parser.add_argument("--min-calls", type=int, default=20, help="Fewest calls of a tool for its p95 to be compared")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on regressions")
+    args = parser.parse_args()
+
+    stub = StubMethodAPI(latency=args.latency, n_entities=args.entities, n_payments=args.payments,
+                         error_rate=args.error_rate, error_status=args.error_status,
+                         payload_bytes=args.payload_bytes, page_size=args.page_size, seed=args.seed).start()
+    api.base_url = stub.base_url
+    api.snapshot_store = None
+    if not args.cache:
+        api.response_cache = None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from server.main import mcp, merchant_catalog
+        merchant_catalog.snapshot_path = os.path.join(tmp, "merchants.json")
+        ids = {collection: list(stub.data[collection]) for collection in ("entities", "accounts", "payments")}
+        results = {
+            "meta": {
+                "commit": _git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "fail_on_regression")},
+            },
+            "levels": [],
+        }
+        try:
+            async with Client(mcp) as client:
+                await merchant_catalog.ensure_loaded()
+                for concurrency in args.concurrency:
+                    # Seeded per level so a level run alone replays the same calls as in a full run
+                    level = await run_level(client, DEFAULT_MIX, ids, concurrency, args.calls, args.seed + concurrency)
+                    results["levels"].append(level)
+                    print_level(level)
+        finally:
+            stub.stop()
+
+    results["meta"]["stub_requests"] = stub.request_count
+    results["meta"]["stub_errors"] = stub.errors_sent
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold, args.min_calls)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): " + "; ".join(regressions))
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
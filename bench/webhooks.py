@@ -0,0 +1,93 @@
+"""
+Webhook benchmark: retrieve_payment re-polling Method vs serving the copy
+refreshed by a signed payment.update event.
+
+Runs the MCP server's HTTP app on a local port with the webhook receiver
+enabled. The stub Method API changes a payment and POSTs the signed event to
+/webhooks/method, then the payment is retrieved repeatedly.
+
+    python -m bench.webhooks --retrieves 50 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+
+import httpx
+import uvicorn
+from fastmcp import Client
+
+from bench.stub_method import StubMethodAPI
+
+SECRET = "bench-webhook-secret"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def retrieve_many(client: Client, payment_id: str, count: int):
+    start = time.perf_counter()
+    status = None
+    for _ in range(count):
+        result = await client.call_tool("retrieve_payment", {"payment_id": payment_id})
+        status = json.loads(result.content[0].text)["data"]["status"]
+    return time.perf_counter() - start, status
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retrieves", type=int, default=50, help="retrieve_payment calls per phase")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub API latency per request in seconds")
+    args = parser.parse_args()
+
+    os.environ["METHOD_WEBHOOK_SECRET"] = SECRET
+    port = _free_port()
+    stub = StubMethodAPI(latency=args.latency, webhook_url=f"http://127.0.0.1:{port}/webhooks/method",
+                         webhook_secret=SECRET).start()
+
+    from server import api
+    from server.main import mcp, webhook_receiver
+    api.base_url = stub.base_url
+    api.snapshot_store = None
+    api.response_cache.clear()
+    server = uvicorn.Server(uvicorn.Config(mcp.http_app(), host="127.0.0.1", port=port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    try:
+        payment_id = next(iter(stub.data["payments"]))
+        async with Client(mcp) as client:
+            # Without events, seeing a change means asking Method every time
+            cache, api.response_cache = api.response_cache, None
+            before = stub.request_count
+            elapsed, _ = await retrieve_many(client, payment_id, args.retrieves)
+            print(f"{'re-polling Method':<28} {elapsed:7.3f}s  upstream requests={stub.request_count - before:>4}")
+            api.response_cache = cache
+
+            # Method changes the payment and tells us; the receiver refreshes it once
+            before = stub.request_count
+            await asyncio.to_thread(stub.update, "payments", payment_id, status="settled")
+            while webhook_receiver.stats()["refreshed"] < 1:
+                await asyncio.sleep(0.005)
+            elapsed, status = await retrieve_many(client, payment_id, args.retrieves)
+            print(f"{'after payment.update event':<28} {elapsed:7.3f}s  upstream requests={stub.request_count - before:>4}  "
+                  f"status={status}")
+
+            forged = await asyncio.to_thread(httpx.post, stub.webhook_url, content=b'{"type":"payment.update"}',
+                                             headers={"method-webhook-signature": "0" * 64})
+            print(f"forged event rejected with {forged.status_code}")
+        print(json.dumps(webhook_receiver.stats()))
+    finally:
+        server.should_exit = True
+        await server_task
+        stub.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+"""
+Multi-worker throughput benchmark: tool calls per second against
+`python -m server.main` run with 1 to N worker processes (METHOD_WORKERS)
+behind one port, sharing their response cache, rate limit buckets and
+in-flight requests.
+
+The server runs as a subprocess against the local stub. Load comes from
+--clients processes, each keeping --sessions MCP sessions busy with a mix of
+retrieve_entity (mostly cache hits once warm) and list_accounts calls.
+Upstream requests stay about the same at every level when the cache is shared.
+Scaling is bounded by the cores of the machine, which the load processes
+also use.
+
+    python -m bench.workers --workers 1 2 4 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from bench.stub_method import StubMethodAPI
+from bench.suite import percentile
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _session_loop(url: str, deadline: float, rng: random.Random, latencies, errors):
+    from fastmcp import Client
+    from fastmcp.client.transports import StreamableHttpTransport
+    async with Client(StreamableHttpTransport(url)) as client:
+        while time.perf_counter() < deadline:
+            if rng.random() < 0.8:
+                name, arguments = "retrieve_entity", {"entity_id": f"ent_{rng.randrange(200):06d}"}
+            else:
+                name, arguments = "list_accounts", {"page_limit": 20}
+            start = time.perf_counter()
+            try:
+                result = await client.call_tool(name, arguments, raise_on_error=False)
+                if result.is_error:
+                    errors.append(name)
+            except Exception:
+                errors.append(name)
+            latencies.append(time.perf_counter() - start)
+
+
+def run_load(url: str, sessions: int, duration: float, seed: int):
+    """One load process: sessions concurrent MCP sessions calling tools for duration seconds"""
+    latencies, errors = [], []
+
+    async def main():
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(_session_loop(url, deadline, random.Random(seed * 1000 + i), latencies, errors)
+                               for i in range(sessions)))
+
+    asyncio.run(main())
+    return latencies, len(errors)
+
+
+def _wait_ready(port: int, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/stats", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def run_level(workers: int, stub: StubMethodAPI, args) -> dict:
+    port = _free_port()
+    env = dict(os.environ, BASE_URL=stub.base_url, METHOD_API_KEY="bench", METHOD_WORKERS=str(workers),
+               METHOD_PORT=str(port), METHOD_STORE_ENABLED="false", METHOD_WEBHOOK_SECRET="",
+               METHOD_RATE_LIMIT="1000000", METHOD_RATE_BURST="1000000")
+    server = subprocess.Popen([sys.executable, "-m", "server.main"], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(port)
+        # Give every worker time to finish starting before load arrives
+        time.sleep(1.0 + 0.5 * workers)
+        url = f"http://127.0.0.1:{port}/mcp"
+        before = stub.request_count
+        start = time.perf_counter()
+        with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+            results = pool.starmap(run_load, [(url, args.sessions, args.duration, args.seed + i)
+                                              for i in range(args.clients)])
+        wall = time.perf_counter() - start
+        upstream = stub.request_count - before
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    latencies = sorted(latency for result, _ in results for latency in result)
+    return {
+        "workers": workers,
+        "calls": len(latencies),
+        "errors": sum(errors for _, errors in results),
+        "calls_per_second": len(latencies) / wall,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "upstream_requests": upstream,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to run")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per level")
+    parser.add_argument("--clients", type=int, default=2, help="Load generator processes")
+    parser.add_argument("--sessions", type=int, default=16, help="Concurrent MCP sessions per load process")
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub API latency per request in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs; {args.clients} load processes x {args.sessions} sessions, {args.duration:.0f}s per level")
+    stub = StubMethodAPI(latency=args.latency).start()
+    try:
+        baseline = None
+        for workers in args.workers:
+            row = run_level(workers, stub, args)
+            baseline = baseline or row["calls_per_second"]
+            print(f"workers {row['workers']:>2}  {row['calls_per_second']:8.1f} calls/s  "
+                  f"x{row['calls_per_second'] / baseline:4.2f}  p50 {row['p50_ms']:7.1f}ms  "
+                  f"p95 {row['p95_ms']:7.1f}ms  calls {row['calls']:>6}  errors {row['errors']:>3}  "
+                  f"upstream requests {row['upstream_requests']:>5}")
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
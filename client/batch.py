@@ -0,0 +1,129 @@
+import asyncio
+import json
+import math
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Fields of a JSON object line holding the query, in order of preference
+QUERY_FIELDS = ("query", "prompt", "text", "body")
+ID_FIELDS = ("id", "request_id", "query_id")
+
+
+def parse_query(line: str, line_number: int) -> Tuple[str, str]:
+    """
+    The (id, query) of one input line: a JSON string, or an object with a
+    query/prompt/text/body field and optionally an id (the line number
+    otherwise). A title is put above a body. Raises ValueError when the line
+    holds no query.
+    """
+    item = json.loads(line)
+    if isinstance(item, str):
+        return str(line_number), item
+    if not isinstance(item, dict):
+        raise ValueError("expected a JSON string or object")
+    field = next((f for f in QUERY_FIELDS if isinstance(item.get(f), str) and item[f].strip()), None)
+    if field is None:
+        raise ValueError(f"no {'/'.join(QUERY_FIELDS)} field")
+    query = item[field]
+    if field == "body" and isinstance(item.get("title"), str):
+        query = f"{item['title']}\n\n{query}"
+    query_id = next((item[f] for f in ID_FIELDS if item.get(f) is not None), line_number)
+    return str(query_id), query
+
+
+def read_queries(path: str) -> Iterator[Tuple[int, str, Optional[str], Optional[str]]]:
+    """(line number, id, query, error) for every non-blank line, read lazily"""
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                query_id, query = parse_query(line, line_number)
+                yield line_number, query_id, query, None
+            except ValueError as e:
+                yield line_number, str(line_number), None, f"Invalid input line: {e}"
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+async def run_batch(client: Any, input_path: str, output_path: str, concurrency: int = 8) -> Dict[str, Any]:
+    """
+    Answer every query of a JSONL file with up to concurrency of them in flight.
+
+    client is a connected, initialized OPENAIClient; each query gets its own
+    conversation (see OPENAIClient.conversation) over the shared MCP
+    connection and OpenAI client. Input is read only as slots free up, and a
+    result line (response or error, plus the query's trace summary) is
+    appended to output_path as soon as the query finishes. Returns totals.
+    """
+    concurrency = max(1, concurrency)
+    # Create the shared OpenAI client before conversations copy the client
+    client.async_openai_client
+    slots = asyncio.Semaphore(concurrency)
+    tasks = set()
+    latencies: List[float] = []
+    counts = {"queries": 0, "errors": 0}
+    started = time.perf_counter()
+
+    with open(output_path, "w", buffering=1) as out:
+        def write(result: Dict[str, Any]):
+            counts["queries"] += 1
+            if "error" in result:
+                counts["errors"] += 1
+            out.write(json.dumps(result, default=str) + "\n")
+
+        async def answer(line_number: int, query_id: str, query: str):
+            conversation = client.conversation()
+            result = {"id": query_id, "line": line_number, "query": query,
+                      "started_seconds": round(time.perf_counter() - started, 6)}
+            start = time.perf_counter()
+            try:
+                result["response"] = await conversation.process_query(query)
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+            finally:
+                seconds = time.perf_counter() - start
+                latencies.append(seconds)
+                result["seconds"] = round(seconds, 6)
+                result["trace"] = conversation.last_trace_summary
+                slots.release()
+            write(result)
+
+        try:
+            for line_number, query_id, query, error in read_queries(input_path):
+                if error is not None:
+                    write({"id": query_id, "line": line_number, "error": error})
+                    continue
+                await slots.acquire()
+                task = asyncio.create_task(answer(line_number, query_id, query))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    wall = time.perf_counter() - started
+    return dict(
+        counts,
+        concurrency=concurrency,
+        wall_seconds=round(wall, 3),
+        queries_per_second=round(len(latencies) / wall, 2) if wall > 0 else 0.0,
+        p50_seconds=round(_percentile(latencies, 50), 3),
+        p95_seconds=round(_percentile(latencies, 95), 3),
+        output=output_path,
+    )
+
+
+def format_batch(totals: Dict[str, Any]) -> str:
+    """One-line batch report"""
+    return (f"[Batch] {totals['queries']} queries ({totals['errors']} errors) in {totals['wall_seconds']:.2f}s "
+            f"at concurrency {totals['concurrency']}: {totals['queries_per_second']:.2f} queries/s, "
+            f"p50 {totals['p50_seconds']:.2f}s, p95 {totals['p95_seconds']:.2f}s -> {totals['output']}")
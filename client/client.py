@@ -1,11 +1,15 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import asyncio
+import copy
+import importlib
 import json
 import os
 import sys
 from typing import List, Dict, Any, Optional, Literal, Union, cast
 
-# OpenAI imports
-from openai import OpenAI, AsyncOpenAI
+# OpenAI is imported on first use (see OPENAIClient.async_openai_client); it is the slowest import here
 
 # FastMCP imports
 from fastmcp import Client
@@ -16,12 +20,19 @@ from fastmcp.client.sampling import SamplingMessage, SamplingParams, RequestCont
 
 from dotenv import load_dotenv
 
-# Configure logging
-configure_logging(level="INFO")
+from client.batch import run_batch, format_batch
+from client.history import HistoryManager
+from client.tracing import Tracer, QueryTrace, format_summary
+from client.tool_selection import ToolSelector
+from client.tool_catalog import ToolCatalogCache, published_schema_hash, DEFAULT_CATALOG_DIR
+from mcp.types import Tool
+
 load_dotenv()
 # Define provider type
 provider = "openai"
 PORT = os.getenv("PORT", "8000")
+SERVER_URL = "http://localhost:8002/mcp"
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
 
 class OPENAIClient:
     """A client that integrates Claude/GPT with FastMCP tools."""
@@ -29,16 +40,51 @@ class OPENAIClient:
     def __init__(self,
                  openai_api_key: Optional[str] = None,
                  methodapi_key: Optional[str] = None,
-                 model: Optional[str] = None):
+                 model: Optional[str] = None,
+                 tool_concurrency: int = 4,
+                 tool_timeout: float = 60.0,
+                 history_token_budget: int = 16000,
+                 stream: bool = False,
+                 trace: bool = False,
+                 trace_file: Optional[str] = None,
+                 tool_top_k: int = 10,
+                 tool_catalog_dir: Optional[str] = DEFAULT_CATALOG_DIR,
+                 server_url: str = SERVER_URL,
+                 cassette: Optional[Any] = None):
         """Initialize the client.
+
+        tool_concurrency caps how many tool calls of one assistant turn run at once,
+        and tool_timeout is the per-call limit in seconds.
+        history_token_budget is the token budget self.messages is compacted to
+        before every completion call.
+        With stream set, content is printed as it arrives and each tool call starts
+        as soon as its arguments have finished streaming.
+        With trace set, every query's model calls, tool calls and history compaction
+        are written to stderr as JSON lines and summarized when the query ends;
+        trace_file appends the JSON lines to a file instead.
+        tool_top_k is how many of the most relevant tools are sent with each
+        completion call (plus the ones already used in the query); 0 sends all.
+        The formatted tool list is cached in tool_catalog_dir and reused while the
+        server publishes the same tool schema hash; None always fetches it.
+        OpenAI clients are created on first use.
+        With a cassette (server/cassette.py), OpenAI requests are recorded to it
+        or replayed from it instead of reaching the API.
         """
+        self.server_url = server_url
         self.transport = StreamableHttpTransport(
-            url=f"http://localhost:8002/mcp",
+            url=self.server_url,
             headers={"Authorization": f"Bearer {methodapi_key}"}
         )
-        self.openai_client = OpenAI(api_key=openai_api_key)
-        self.async_openai_client = AsyncOpenAI(api_key=openai_api_key)
+        self.openai_api_key = openai_api_key
+        self._openai_client = None
+        self._async_openai_client = None
+        self.cassette = cassette
         self.model = "gpt-4o-mini" if model is None else model
+        self.tool_concurrency = max(1, tool_concurrency)
+        self.tool_timeout = tool_timeout
+        self.stream = stream
+        # Streamed content and tool progress are printed unless echo is off (batch mode)
+        self.echo = True
             
         # Create the client using the transport WITH sampling handler
         self.mcp_client = Client(
@@ -46,55 +92,254 @@ class OPENAIClient:
         )
 
         self.messages: List[Dict[str, Any]] = []
+        self.history = HistoryManager(token_budget=history_token_budget, model=self.model)
+        self.tracer = Tracer.open(trace_file, trace)
+        self._trace: Optional[QueryTrace] = None
+        self.last_trace_summary: Optional[Dict[str, Any]] = None
             
         self.available_tools = []
         self.formatted_tools = []
-    
+        self.tool_top_k = tool_top_k
+        self.tool_selector: Optional[ToolSelector] = None
+        self.tool_catalog = ToolCatalogCache(tool_catalog_dir) if tool_catalog_dir else None
+        self.startup_timings: Dict[str, Any] = {"import_seconds": round(IMPORT_SECONDS, 4)}
+
+    def _cassette_options(self, asynchronous: bool) -> Dict[str, Any]:
+        """OpenAI client options routing its HTTP traffic through the cassette, if any"""
+        if self.cassette is None:
+            return {}
+        import httpx
+        if asynchronous:
+            http_client = httpx.AsyncClient(transport=self.cassette.transport(httpx.AsyncHTTPTransport()))
+        else:
+            http_client = httpx.Client(transport=self.cassette.transport(httpx.HTTPTransport()))
+        # Retrying a request missing from a replayed cassette cannot succeed
+        return {"http_client": http_client, "max_retries": 0 if self.cassette.mode == "replay" else 2}
+
+    @property
+    def openai_client(self):
+        if self._openai_client is None:
+            from openai import OpenAI
+            self._openai_client = OpenAI(api_key=self.openai_api_key, **self._cassette_options(False))
+        return self._openai_client
+
+    @openai_client.setter
+    def openai_client(self, value):
+        self._openai_client = value
+
+    @property
+    def async_openai_client(self):
+        if self._async_openai_client is None:
+            from openai import AsyncOpenAI
+            self._async_openai_client = AsyncOpenAI(api_key=self.openai_api_key, **self._cassette_options(True))
+        return self._async_openai_client
+
+    @async_openai_client.setter
+    def async_openai_client(self, value):
+        self._async_openai_client = value
     
     async def initialize(self):
-        """Initialize the client by fetching available tools."""
-        tools = await self.mcp_client.list_tools()
-        self.available_tools = tools
-        
-        # Format tools based on the provider
-        self.formatted_tools = []
-        for tool in tools:
-
-                # Format for OpenAI API
-            self.formatted_tools.append({
-                "type": "function",
-                "function": {
-                    "name": tool.name,
-                    "description": tool.description,
-                    "parameters": tool.inputSchema
-                }
-            })
+        """Initialize the client with the server's tools, reusing the cached list while its schema hash is unchanged."""
+        start = time.perf_counter()
+        schema_hash = None
+        cached = None
+        if self.tool_catalog is not None:
+            schema_hash = await published_schema_hash(self.mcp_client)
+            if schema_hash:
+                cached = self.tool_catalog.load(self.server_url, schema_hash)
+
+        if cached is not None:
+            self.formatted_tools = cached
+            self.available_tools = [
+                Tool(name=t["function"]["name"], description=t["function"].get("description"),
+                     inputSchema=t["function"].get("parameters") or {})
+                for t in cached
+            ]
+        else:
+            tools = await self.mcp_client.list_tools()
+            self.available_tools = tools
+
+            # Format tools based on the provider
+            self.formatted_tools = []
+            for tool in tools:
+
+                    # Format for OpenAI API
+                self.formatted_tools.append({
+                    "type": "function",
+                    "function": {
+                        "name": tool.name,
+                        "description": tool.description,
+                        "parameters": tool.inputSchema
+                    }
+                })
+            if self.tool_catalog is not None and schema_hash:
+                self.tool_catalog.save(self.server_url, schema_hash, self.formatted_tools)
+        self.tool_selector = ToolSelector(self.formatted_tools, self.tool_top_k, self.history.count_text)
+        self.startup_timings.update(tools_seconds=round(time.perf_counter() - start, 4),
+                                    tool_catalog="cached" if cached is not None else "fetched")
     
     async def _call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> str:
         """Call a tool with the provided arguments and return the result as a string."""
         try:
             # Use the already established connection
-            result = await self.mcp_client.call_tool(tool_name, arguments)
-            if isinstance(result, dict) and "error" in result:
-                if result.get("status_code") == 403:
-                    return f"Authorization Error, User does not have access to this tool: {result['error']}"
-                else:
-                    return f"Error: {result['error']}"
-            # Convert result to string based on type
-            elif isinstance(result, list):
-                if hasattr(result[0], 'text'):
-                    return result[0].text
-                else:
-                    return json.dumps(result, default=str)
+            result = await self.mcp_client.call_tool(tool_name, arguments, raise_on_error=False)
+            # Only the content blocks go back to the model; structured_content and data repeat the same payload
+            content = result.content
+            if content and hasattr(content[0], "text"):
+                text = content[0].text
             else:
-                return str(result)
+                text = json.dumps(content, default=str)
+            if result.is_error:
+                return f"Error: {text}"
+            # Tools report Method API failures as an {"error": true, ...} payload rather than a tool error
+            payload = result.structured_content
+            if payload is None:
+                try:
+                    payload = json.loads(text)
+                except ValueError:
+                    payload = None
+            if isinstance(payload, dict) and payload.get("error"):
+                if payload.get("status_code") == 403:
+                    return f"Authorization Error, User does not have access to this tool: {payload.get('message')}"
+                return f"Error: {text}"
+            return text
         except Exception as e:
             return f"Error calling tool {tool_name}: {str(e)}"
     
+    async def _run_tool_call(self, tool_call: Any, semaphore: asyncio.Semaphore) -> str:
+        """Run one function tool call under the turn's concurrency limit and the per-call timeout."""
+        tool_name = tool_call.function.name
+        try:
+            # Parse arguments from JSON string
+            arguments = json.loads(tool_call.function.arguments)
+        except json.JSONDecodeError:
+            arguments = {}
+        trace = self._trace
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(self._call_tool(tool_name, arguments), timeout=self.tool_timeout)
+            except asyncio.TimeoutError:
+                result = f"Error calling tool {tool_name}: timed out after {self.tool_timeout}s"
+            if trace is not None:
+                error = result.startswith(("Error", "Authorization Error"))
+                trace.tool_call(tool_name, time.perf_counter() - start, len(result), error)
+            return result
+
+    async def _call_tools_concurrently(self, tool_calls: List[Any]) -> List[str]:
+        """Run the tool calls of one assistant turn concurrently, returning results in call order."""
+        semaphore = asyncio.Semaphore(self.tool_concurrency)
+        return await asyncio.gather(*(self._run_tool_call(tool_call, semaphore) for tool_call in tool_calls))
+
+    async def _stream_turn(self, tools: List[Dict[str, Any]]) -> tuple:
+        """Stream one completion, printing content deltas and dispatching tool calls early.
+
+        Returns the content, the assembled tool calls and one task per function call,
+        already running (or finished) by the time the stream ends.
+        """
+        from openai.types.chat import ChatCompletionMessageToolCall
+        from openai.types.chat.chat_completion_message_tool_call import Function
+        start = time.perf_counter()
+        first_token_seconds = None
+        usage = None
+        stream = await self.async_openai_client.chat.completions.create(
+            model=self.model,
+            messages=self.messages,
+            tools=tools,
+            tool_choice="auto",
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        semaphore = asyncio.Semaphore(self.tool_concurrency)
+        content_parts: List[str] = []
+        pending: Dict[int, Dict[str, str]] = {}
+        tool_calls: Dict[int, ChatCompletionMessageToolCall] = {}
+        tasks: Dict[int, asyncio.Task] = {}
+
+        def dispatch(index: int):
+            # Arguments are complete: build the typed tool call and start running it
+            entry = pending.pop(index)
+            tool_call = ChatCompletionMessageToolCall(
+                id=entry["id"],
+                type="function",
+                function=Function(name=entry["name"], arguments=entry["arguments"] or "{}")
+            )
+            tool_calls[index] = tool_call
+            tasks[index] = asyncio.create_task(self._run_tool_call(tool_call, semaphore))
+            if self.echo:
+                print(f"\n[Using tool: {tool_call.function.name}]", flush=True)
+
+        try:
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                if first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - start
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    if self.echo:
+                        print(delta.content, end="", flush=True)
+                    content_parts.append(delta.content)
+                for tc in delta.tool_calls or []:
+                    if tc.index not in pending and tc.index not in tool_calls:
+                        # A new call starts, so every earlier one has finished streaming
+                        for index in list(pending):
+                            dispatch(index)
+                        pending[tc.index] = {"id": "", "name": "", "arguments": ""}
+                    entry = pending.get(tc.index)
+                    if entry is None:
+                        continue
+                    if tc.id:
+                        entry["id"] = tc.id
+                    if tc.function and tc.function.name:
+                        entry["name"] += tc.function.name
+                    if tc.function and tc.function.arguments:
+                        entry["arguments"] += tc.function.arguments
+                        if entry["arguments"].rstrip().endswith("}"):
+                            try:
+                                json.loads(entry["arguments"])
+                                dispatch(tc.index)
+                            except json.JSONDecodeError:
+                                pass
+            for index in list(pending):
+                dispatch(index)
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+        if self._trace is not None:
+            self._trace.llm_call(time.perf_counter() - start,
+                                 usage.prompt_tokens if usage else None,
+                                 usage.completion_tokens if usage else None,
+                                 len(tool_calls), first_token_seconds)
+        order = sorted(tool_calls)
+        return "".join(content_parts) or None, [tool_calls[i] for i in order], [tasks[i] for i in order]
+
     async def _process_openai_query(self, query: str) -> str:
+        """Process a user query, tracing where its wall time goes."""
+        self._trace = self.tracer.start_query(query)
+        if self.cassette is not None:
+            self.cassette.note("query", text=query)
+        error = None
+        try:
+            return await self._run_query_loop(query)
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.last_trace_summary = self._trace.finish(error)
+            self._trace = None
+            if self.tracer.print_summary:
+                print(format_summary(self.last_trace_summary), file=sys.stderr)
+
+    async def _run_query_loop(self, query: str) -> str:
         """Process a user query using OpenAI's API with improved tool chaining."""
-        if not self.openai_client or not self.async_openai_client:
+        if not self.async_openai_client:
             raise ValueError("OpenAI client not initialized")
+        trace = self._trace
             
         # Add the user's query to the conversation
         self.messages.append({
@@ -104,58 +349,98 @@ class OPENAIClient:
         
         final_output = []
         tool_usage_complete = False
+        # Tools called so far stay available; a call to a tool that was not offered switches to the full list
+        used_tools: List[str] = []
+        selection_text = query
+        send_all_tools = self.tool_selector is None
+        tokens_saved = 0
         
         # Start a loop to handle multiple rounds of tool calling
         while not tool_usage_complete:
+            # Keep the history within the token budget before resending it
+            start = time.perf_counter()
+            saved = self.history.compact(self.messages)
+            context_tokens = self.history.count_tokens(self.messages)
+            trace.history(time.perf_counter() - start, saved, context_tokens)
+            if saved:
+                final_output.append(f"[History compacted: saved {saved} tokens, "
+                                    f"{context_tokens} tokens in context]")
+
+            # Only send the tools relevant to the query and the model's reasoning so far
+            if send_all_tools:
+                tools = self.formatted_tools
+            else:
+                tools = self.tool_selector.select(selection_text, pinned=used_tools)
+                saved = self.tool_selector.full_tokens - self.tool_selector.tokens(tools)
+                tokens_saved += saved
+                trace.tool_selection(len(tools), len(self.formatted_tools), saved)
+            offered = {tool["function"]["name"] for tool in tools}
+
             # Get GPT's response
-            response = await self.async_openai_client.chat.completions.create(
-                model=self.model,
-                messages=self.messages,
-                tools=self.formatted_tools,
-                tool_choice="auto"  # Let the model decide when to use tools
-            )
-            
-            message = response.choices[0].message
+            tool_tasks = None
+            trace.begin_iteration()
+            if self.stream:
+                content, tool_calls, tool_tasks = await self._stream_turn(tools)
+            else:
+                start = time.perf_counter()
+                response = await self.async_openai_client.chat.completions.create(
+                    model=self.model,
+                    messages=self.messages,
+                    tools=tools,
+                    tool_choice="auto"  # Let the model decide when to use tools
+                )
+                message = response.choices[0].message
+                content, tool_calls = message.content, message.tool_calls
+                usage = response.usage
+                trace.llm_call(time.perf_counter() - start,
+                               usage.prompt_tokens if usage else None,
+                               usage.completion_tokens if usage else None,
+                               len(tool_calls or []))
             
             # Add the message content to the output if it exists
-            if message.content:
-                final_output.append(message.content)
+            if content:
+                final_output.append(content)
+                selection_text += f" {content}"
+            for tool_call in tool_calls or []:
+                name = tool_call.function.name
+                if name not in offered:
+                    send_all_tools = True
+                if name not in used_tools:
+                    used_tools.append(name)
             
             # Add the assistant's message to the conversation history
             assistant_message = {
                 "role": "assistant",
-                "content": message.content
+                "content": content
             }
-            if message.tool_calls:
-                assistant_message["tool_calls"] = message.tool_calls
+            if tool_calls:
+                assistant_message["tool_calls"] = tool_calls
             self.messages.append(assistant_message)
             
             # Handle tool calls if they exist
-            if message.tool_calls and len(message.tool_calls) > 0:
-                # Process all tool calls and collect the results
-                for idx, tool_call in enumerate(message.tool_calls):
-                    if tool_call.type == "function":
-                        tool_name = tool_call.function.name
-                        
-                        try:
-                            # Parse arguments from JSON string
-                            arguments = json.loads(tool_call.function.arguments)
-                        except json.JSONDecodeError:
-                            arguments = {}
-                            
-                        final_output.append(f"\n[Using tool {idx+1}/{len(message.tool_calls)}: {tool_name}]")
-                        
-                        # Call the tool
-                        tool_result = await self._call_tool(tool_name, arguments)
-                        final_output.append(f"[Tool result: {tool_result}]")
-                        
-                        # Add tool result to the conversation history
-                        self.messages.append({
-                            "role": "tool",
-                            "tool_call_id": tool_call.id,
-                            "name": tool_name,
-                            "content": tool_result
-                        })
+            if tool_calls and len(tool_calls) > 0:
+                # Run all tool calls of this turn concurrently, then record results in call order
+                function_calls = [tc for tc in tool_calls if tc.type == "function"]
+                start = time.perf_counter()
+                if tool_tasks is not None:
+                    # Streaming already started these as their arguments completed
+                    tool_results = await asyncio.gather(*tool_tasks)
+                else:
+                    tool_results = await self._call_tools_concurrently(function_calls)
+                trace.tool_wait(time.perf_counter() - start, len(function_calls))
+
+                for idx, (tool_call, tool_result) in enumerate(zip(function_calls, tool_results)):
+                    tool_name = tool_call.function.name
+                    final_output.append(f"\n[Using tool {idx+1}/{len(tool_calls)}: {tool_name}]")
+                    final_output.append(f"[Tool result: {tool_result}]")
+
+                    # Add tool result to the conversation history
+                    self.messages.append({
+                        "role": "tool",
+                        "tool_call_id": tool_call.id,
+                        "name": tool_name,
+                        "content": tool_result
+                    })
                 
                 # Continue the loop to allow GPT to make more tool calls
                 # We don't want to prematurely ask for a final response
@@ -163,20 +448,48 @@ class OPENAIClient:
             else:
                 # No more tool calls - the process is complete
                 tool_usage_complete = True
-        
+
+        if tokens_saved:
+            final_output.append(f"[Tool selection: saved about {tokens_saved} prompt tokens of tool schemas]")
         return "\n".join(final_output)
     
     async def process_query(self, query: str) -> str:
         return await self._process_openai_query(query)
+
+    def conversation(self) -> "OPENAIClient":
+        """A client sharing this one's MCP connection, OpenAI client and tools, with its own empty history."""
+        conversation = copy.copy(self)
+        conversation.messages = []
+        conversation._trace = None
+        conversation.last_trace_summary = None
+        conversation.echo = False
+        return conversation
+
+    async def batch(self, input_path: str, output_path: str, concurrency: int = 8) -> Dict[str, Any]:
+        """Answer the queries of a JSONL file concurrently, each in its own conversation (see client/batch.py)."""
+        async with self.mcp_client:
+            await self.initialize()
+            totals = await run_batch(self, input_path, output_path, concurrency)
+        self.tracer.close()
+        print(format_batch(totals), file=sys.stderr)
+        return totals
     
     async def chat(self):
         """Run an interactive chat loop with the selected model."""
+        # Import OpenAI in a thread while the MCP connection is set up
+        start = time.perf_counter()
+        openai_import = asyncio.ensure_future(asyncio.to_thread(importlib.import_module, "openai"))
         # Use the correct async with pattern for the client
         async with self.mcp_client:
+            self.startup_timings["connect_seconds"] = round(time.perf_counter() - start, 4)
             # Initialize and fetch tools
             await self.initialize()
+            await openai_import
+            self.startup_timings["ready_seconds"] = round(time.perf_counter() - _IMPORT_STARTED, 4)
+            self.tracer.emit(dict(self.startup_timings, event="startup"))
             
             print(f"Connected to FastMCP. Found {len(self.available_tools)} tools.")
+            print(format_startup(self.startup_timings))
             if self.available_tools:
                 print("Available tools:")
                 for tool in self.available_tools:
@@ -193,25 +506,59 @@ class OPENAIClient:
                 
                 try:
                     # Process the query
-                    response = await self.process_query(user_input)
-                    print(f"\n{model_name}: {response}")
+                    if self.stream:
+                        # Content and tool progress are printed while the response streams in
+                        print(f"\n{model_name}: ", end="", flush=True)
+                        await self.process_query(user_input)
+                        print()
+                    else:
+                        response = await self.process_query(user_input)
+                        print(f"\n{model_name}: {response}")
                     
                 except Exception as e:
                     print(f"\nError: {str(e)}")
                     import traceback
                     traceback.print_exc()
         
+        self.tracer.close()
         print("MCP connection closed")
 
+def format_startup(timings: Dict[str, Any]) -> str:
+    """One-line cold start report"""
+    return (f"Ready in {timings.get('ready_seconds', 0):.2f}s since import: imports "
+            f"{timings.get('import_seconds', 0):.2f}s, connect {timings.get('connect_seconds', 0):.2f}s, "
+            f"tool list {timings.get('tools_seconds', 0):.3f}s ({timings.get('tool_catalog', 'fetched')})")
+
 async def main():
     from dotenv import load_dotenv
     load_dotenv()
+    configure_logging(level="INFO")
     import os
+    import argparse
+    parser = argparse.ArgumentParser(description="Chat with the Method MCP server")
+    parser.add_argument("--trace", action="store_true", help="Print per-query trace events (JSON lines) and a summary to stderr")
+    parser.add_argument("--trace-file", help="Append per-query trace events as JSON lines to this file")
+    parser.add_argument("--record", metavar="CASSETTE", help="Record OpenAI requests and responses to this file")
+    parser.add_argument("--replay", metavar="CASSETTE", help="Answer OpenAI requests from a recorded file, offline")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Replayed delays relative to the recording (1 original, 0 none)")
+    parser.add_argument("--batch", metavar="QUERIES", help="Answer the queries of a JSONL file instead of chatting")
+    parser.add_argument("--output", help="Results file of --batch (default: QUERIES with .results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("BATCH_CONCURRENCY", "8")),
+                        help="Queries of --batch in flight at once")
+    args = parser.parse_args()
+    cassette = None
+    if args.record or args.replay:
+        from server.cassette import Cassette
+        cassette = Cassette(args.record or args.replay, "record" if args.record else "replay", args.time_scale)
     # Get provider from command line or environment
     provider = "openai"
 
     openai_api_key = os.environ.get("OPENAI_API_KEY")
-    
+    if cassette is not None and cassette.mode == "replay":
+        # Nothing reaches OpenAI, and the server is expected to replay Method too (METHOD_CASSETTE)
+        openai_api_key = openai_api_key or "replay"
+        os.environ.setdefault("METHOD_API_KEY", "replay")
 
     if provider == "openai" and not openai_api_key:
         print("Please set the OPENAI_API_KEY environment variable")
@@ -229,13 +576,30 @@ async def main():
     client = OPENAIClient(
         openai_api_key=openai_api_key,
         methodapi_key=methodapi,
-        model=model
+        model=model,
+        tool_concurrency=int(os.getenv("TOOL_CONCURRENCY", "4")),
+        tool_timeout=float(os.getenv("TOOL_TIMEOUT", "60")),
+        history_token_budget=int(os.getenv("HISTORY_TOKEN_BUDGET", "16000")),
+        stream=os.getenv("STREAM", "false").lower() in ("1", "true", "yes"),
+        trace=args.trace or os.getenv("TRACE", "false").lower() in ("1", "true", "yes"),
+        trace_file=args.trace_file or os.getenv("TRACE_FILE"),
+        tool_top_k=int(os.getenv("TOOL_TOP_K", "10")),
+        tool_catalog_dir=None if os.getenv("TOOL_CATALOG", "true").lower() in ("0", "false", "no")
+        else os.getenv("TOOL_CATALOG_DIR", DEFAULT_CATALOG_DIR),
+        cassette=cassette
     )
     
     try:
-        await client.chat()
+        if args.batch:
+            output = args.output or os.path.splitext(args.batch)[0] + ".results.jsonl"
+            await client.batch(args.batch, output, args.concurrency)
+        else:
+            await client.chat()
     except KeyboardInterrupt:
         print("\nExiting...")
+    finally:
+        if cassette is not None:
+            cassette.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,106 @@
+from typing import Any, Dict, List, Optional
+
+
+def _load_encoder(model: str):
+    """tiktoken encoder for the model when tiktoken is installed, else None"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def _field(obj: Any, name: str) -> Any:
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+
+class HistoryManager:
+    """Keeps an OpenAI chat history under a token budget.
+
+    Tool results from earlier, already answered queries are always cut to a short
+    preview. If the history is still over budget, compaction continues in stages
+    and stops as soon as it fits:
+    1. oversized tool results of the current query are truncated
+    2. the tool-call exchanges of earlier queries are dropped, keeping their user/assistant text
+    3. the oldest earlier queries are dropped entirely
+    System messages and the current query are always kept.
+    """
+
+    # Characters of a stale tool result kept as a preview (ids usually appear early)
+    STALE_PREVIEW_CHARS = 200
+    # Fixed per-message overhead of the chat format, in tokens
+    MESSAGE_OVERHEAD = 4
+
+    def __init__(self, token_budget: int = 16000, tool_result_token_limit: int = 2000, model: str = "gpt-4o-mini"):
+        self.token_budget = token_budget
+        self.tool_result_token_limit = tool_result_token_limit
+        self._encoder = _load_encoder(model)
+        self.total_saved = 0
+
+    def count_text(self, text: Optional[str]) -> int:
+        if not text:
+            return 0
+        if self._encoder is not None:
+            return len(self._encoder.encode(text))
+        # Rough estimate when tiktoken is unavailable
+        return (len(text) + 3) // 4
+
+    def count_message(self, message: Dict[str, Any]) -> int:
+        tokens = self.MESSAGE_OVERHEAD + self.count_text(message.get("content"))
+        for tool_call in message.get("tool_calls") or []:
+            function = _field(tool_call, "function")
+            tokens += self.count_text(_field(function, "name")) + self.count_text(_field(function, "arguments"))
+        return tokens
+
+    def count_tokens(self, messages: List[Dict[str, Any]]) -> int:
+        return sum(self.count_message(m) for m in messages)
+
+    def _truncate(self, content: str, keep_chars: int, note: str) -> str:
+        if len(content) <= keep_chars:
+            return content
+        return f"{content[:keep_chars]}... [{note}; {len(content) - keep_chars} chars omitted]"
+
+    def compact(self, messages: List[Dict[str, Any]]) -> int:
+        """Compact messages in place to fit the token budget, returning the tokens saved"""
+        before = self.count_tokens(messages)
+        last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=0)
+
+        # Answered tool results only need a preview
+        for message in messages[:last_user]:
+            if message.get("role") == "tool" and isinstance(message.get("content"), str):
+                message["content"] = self._truncate(message["content"], self.STALE_PREVIEW_CHARS, "answered earlier")
+
+        # 1. Cap any single tool result of the current query
+        if self.count_tokens(messages) > self.token_budget:
+            for message in messages[last_user:]:
+                if message.get("role") == "tool" and isinstance(message.get("content"), str):
+                    message["content"] = self._truncate(message["content"], self.tool_result_token_limit * 4, "truncated")
+
+        # 2. Drop earlier tool-call exchanges; tool messages go together with the call that produced them
+        if self.count_tokens(messages) > self.token_budget:
+            kept = [
+                m for m in messages[:last_user]
+                if m.get("role") != "tool" and not (m.get("role") == "assistant" and m.get("tool_calls"))
+            ]
+            messages[:last_user] = kept
+            last_user = len(kept)
+
+        # 3. Drop the oldest earlier queries until the history fits
+        while self.count_tokens(messages) > self.token_budget:
+            first_user = next((i for i, m in enumerate(messages[:last_user]) if m.get("role") == "user"), None)
+            if first_user is None:
+                break
+            next_user = next(
+                (i for i in range(first_user + 1, last_user) if messages[i].get("role") == "user"),
+                last_user,
+            )
+            system = [m for m in messages[first_user:next_user] if m.get("role") == "system"]
+            messages[first_user:next_user] = system
+            last_user -= next_user - first_user - len(system)
+
+        saved = before - self.count_tokens(messages)
+        self.total_saved += saved
+        return saved
@@ -0,0 +1,55 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+DEFAULT_CATALOG_DIR = os.path.join(os.path.expanduser("~"), ".cache", "method-fi-mcp", "tool-catalog")
+
+# Must match server/tool_schema.py
+TOOL_SCHEMA_URI = "method://tool-schema-hash"
+
+
+async def published_schema_hash(mcp_client: Any) -> Optional[str]:
+    """The tool schema hash a connected server publishes as a resource, None if it publishes none"""
+    try:
+        contents = await mcp_client.read_resource(TOOL_SCHEMA_URI)
+    except Exception:
+        return None
+    schema_hash = getattr(contents[0], "text", None) if contents else None
+    return schema_hash.strip() if isinstance(schema_hash, str) and schema_hash.strip() else None
+
+
+class ToolCatalogCache:
+    """OpenAI-formatted tool lists kept on disk per server URL and reused while the server's schema hash is unchanged"""
+
+    def __init__(self, directory: str = DEFAULT_CATALOG_DIR):
+        self.directory = directory
+
+    def _path(self, server_url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(server_url.encode()).hexdigest()[:16] + ".json")
+
+    def load(self, server_url: str, schema_hash: str) -> Optional[List[Dict[str, Any]]]:
+        """The cached tools for this schema hash, None on a miss or an unreadable file"""
+        try:
+            with open(self._path(server_url)) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(cached, dict) or cached.get("schema_hash") != schema_hash:
+            return None
+        tools = cached.get("tools")
+        return tools if isinstance(tools, list) else None
+
+    def save(self, server_url: str, schema_hash: str, tools: List[Dict[str, Any]]):
+        """Write atomically so a concurrent client never reads a partial file"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"server_url": server_url, "schema_hash": schema_hash, "saved_at": time.time(),
+                           "tools": tools}, f)
+            os.replace(tmp_path, self._path(server_url))
+        except OSError as e:
+            print(f"Could not save tool catalog: {e}")
@@ -0,0 +1,113 @@
+import json
+import math
+import re
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Words that say nothing about which tool is wanted
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "i", "if", "in", "is", "it",
+    "me", "my", "of", "on", "or", "please", "the", "this", "that", "to", "what", "when", "which", "with", "you",
+}
+
+# Repeats of each part of a tool's text in its document, so name matches outweigh parameter docs
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 2
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens with stopwords removed and plurals folded (accounts -> account, entities -> entity)"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _schema_text(schema: Any) -> Iterable[str]:
+    """Property names, descriptions and enum values anywhere in a JSON schema"""
+    if isinstance(schema, dict):
+        for key, value in schema.items():
+            if key == "properties" and isinstance(value, dict):
+                for name, prop in value.items():
+                    yield name.replace("_", " ")
+                    yield from _schema_text(prop)
+            elif key in ("description", "title") and isinstance(value, str):
+                yield value
+            elif key == "enum" and isinstance(value, list):
+                yield " ".join(str(v) for v in value)
+            else:
+                yield from _schema_text(value)
+    elif isinstance(schema, list):
+        for item in schema:
+            yield from _schema_text(item)
+
+
+class ToolSelector:
+    """Picks the tools worth sending to the model for a query.
+
+    A BM25 index over each tool's name, description and parameter docs is built
+    once from the OpenAI-formatted tool list. select() returns the top_k tools
+    for a query plus any pinned ones (tools already used in the conversation),
+    in catalog order, or the full list when nothing matches or top_k is 0.
+    """
+
+    def __init__(self, tools: List[Dict[str, Any]], top_k: int = 10,
+                 count_text: Optional[Callable[[str], int]] = None, k1: float = 1.2, b: float = 0.75):
+        self.tools = tools
+        self.top_k = top_k
+        self.k1 = k1
+        self.b = b
+        self._count_text = count_text or (lambda text: (len(text) + 3) // 4)
+        self.names = [tool["function"]["name"] for tool in tools]
+
+        self._docs: List[Counter] = []
+        for tool in tools:
+            function = tool["function"]
+            tokens = tokenize(function["name"].replace("_", " ")) * NAME_WEIGHT
+            tokens += tokenize(function.get("description") or "") * DESCRIPTION_WEIGHT
+            tokens += tokenize(" ".join(_schema_text(function.get("parameters") or {})))
+            self._docs.append(Counter(tokens))
+        self._lengths = [sum(doc.values()) for doc in self._docs]
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        document_frequency = Counter(token for doc in self._docs for token in doc)
+        n = len(self._docs)
+        self._idf = {token: math.log(1 + (n - df + 0.5) / (df + 0.5)) for token, df in document_frequency.items()}
+        self._tool_tokens = {name: self._count_text(json.dumps(tool)) for name, tool in zip(self.names, tools)}
+        self.full_tokens = sum(self._tool_tokens.values())
+
+    def search(self, query: str) -> List[Tuple[str, float]]:
+        """Tools with a positive BM25 score for the query, best first"""
+        terms = set(tokenize(query)) & self._idf.keys()
+        scores = []
+        for name, doc, length in zip(self.names, self._docs, self._lengths):
+            score = 0.0
+            for term in terms:
+                tf = doc.get(term)
+                if tf:
+                    norm = self.k1 * (1 - self.b + self.b * length / self._avg_length)
+                    score += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scores.append((name, score))
+        scores.sort(key=lambda item: -item[1])
+        return scores
+
+    def select(self, query: str, pinned: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        if self.top_k <= 0 or len(self.tools) <= self.top_k:
+            return self.tools
+        ranked = self.search(query)
+        if not ranked:
+            return self.tools
+        chosen = {name for name, _ in ranked[:self.top_k]} | set(pinned)
+        return [tool for name, tool in zip(self.names, self.tools) if name in chosen]
+
+    def tokens(self, tools: List[Dict[str, Any]]) -> int:
+        """Approximate prompt tokens of a tool list"""
+        return sum(self._tool_tokens.get(tool["function"]["name"], 0) for tool in tools)
@@ -0,0 +1,134 @@
+import itertools
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional, TextIO
+
+
+class QueryTrace:
+    """Timeline of one query through the agent loop.
+
+    Every event is kept in memory and, when the tracer has a sink, written
+    to it right away as one JSON line. finish() emits a query_end event
+    splitting the wall time into model, tool wait and history time.
+    """
+
+    def __init__(self, tracer: "Tracer", query_id: int, query: str):
+        self.tracer = tracer
+        self.query_id = query_id
+        self.started = time.perf_counter()
+        self.events: List[Dict[str, Any]] = []
+        self.iterations = 0
+        self.record("query_start", query_chars=len(query))
+
+    def record(self, event: str, **fields) -> Dict[str, Any]:
+        entry = {
+            "event": event,
+            "query_id": self.query_id,
+            "t": round(time.perf_counter() - self.started, 6),
+            **fields,
+        }
+        self.events.append(entry)
+        self.tracer.emit(entry)
+        return entry
+
+    def begin_iteration(self):
+        """Start the next model call; tool calls dispatched from now on belong to it"""
+        self.iterations += 1
+
+    def llm_call(self, seconds: float, prompt_tokens: Optional[int], completion_tokens: Optional[int],
+                 tool_calls: int, first_token_seconds: Optional[float] = None):
+        fields = {"iteration": self.iterations, "seconds": round(seconds, 6), "prompt_tokens": prompt_tokens,
+                  "completion_tokens": completion_tokens, "tool_calls": tool_calls}
+        if first_token_seconds is not None:
+            fields["first_token_seconds"] = round(first_token_seconds, 6)
+        self.record("llm_call", **fields)
+
+    def tool_call(self, name: str, seconds: float, result_chars: int, error: bool):
+        self.record("tool_call", iteration=self.iterations, tool=name, seconds=round(seconds, 6),
+                    result_chars=result_chars, error=error)
+
+    def tool_wait(self, seconds: float, tool_calls: int):
+        """Time the loop was blocked on the tool calls of one turn after the model finished"""
+        self.record("tool_wait", iteration=self.iterations, seconds=round(seconds, 6), tool_calls=tool_calls)
+
+    def tool_selection(self, selected: int, total: int, saved_tokens: int):
+        """Tools sent with the next model call out of the full list, and the schema tokens that saved"""
+        self.record("tool_selection", iteration=self.iterations + 1, selected=selected, total=total,
+                    saved_tokens=saved_tokens)
+
+    def history(self, seconds: float, saved_tokens: int, context_tokens: int):
+        self.record("history", iteration=self.iterations + 1, seconds=round(seconds, 6),
+                    saved_tokens=saved_tokens, context_tokens=context_tokens)
+
+    def _total(self, event: str, field: str) -> float:
+        return sum(e.get(field) or 0 for e in self.events if e["event"] == event)
+
+    def finish(self, error: Optional[str] = None) -> Dict[str, Any]:
+        wall = time.perf_counter() - self.started
+        model = self._total("llm_call", "seconds")
+        tool_wait = self._total("tool_wait", "seconds")
+        history = self._total("history", "seconds")
+        tools = [e for e in self.events if e["event"] == "tool_call"]
+        slowest = max(tools, key=lambda e: e["seconds"], default=None)
+        summary = {
+            "wall_seconds": round(wall, 6),
+            "iterations": self.iterations,
+            "model_seconds": round(model, 6),
+            "tool_wait_seconds": round(tool_wait, 6),
+            "history_seconds": round(history, 6),
+            "other_seconds": round(max(wall - model - tool_wait - history, 0.0), 6),
+            "prompt_tokens": int(self._total("llm_call", "prompt_tokens")),
+            "completion_tokens": int(self._total("llm_call", "completion_tokens")),
+            "tool_schema_tokens_saved": int(self._total("tool_selection", "saved_tokens")),
+            "tool_calls": len(tools),
+            "tool_seconds": round(sum(e["seconds"] for e in tools), 6),
+            "tool_errors": sum(1 for e in tools if e["error"]),
+            "slowest_tool": {"tool": slowest["tool"], "seconds": slowest["seconds"]} if slowest else None,
+        }
+        if error:
+            summary["error"] = error
+        self.record("query_end", **summary)
+        return summary
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """One-line human summary of a query_end event"""
+    line = (f"[Trace] {summary['wall_seconds']:.2f}s over {summary['iterations']} model calls: "
+            f"model {summary['model_seconds']:.2f}s ({summary['prompt_tokens']} in / "
+            f"{summary['completion_tokens']} out tokens), "
+            f"tool wait {summary['tool_wait_seconds']:.2f}s ({summary['tool_calls']} calls, "
+            f"{summary['tool_errors']} errors), history {summary['history_seconds'] * 1000:.1f}ms, "
+            f"other {summary['other_seconds']:.2f}s")
+    if summary.get("tool_schema_tokens_saved"):
+        line += f"; tool selection saved {summary['tool_schema_tokens_saved']} prompt tokens"
+    if summary.get("slowest_tool"):
+        line += f"; slowest tool {summary['slowest_tool']['tool']} {summary['slowest_tool']['seconds']:.2f}s"
+    return line
+
+
+class Tracer:
+    """Creates a QueryTrace per query and writes its events as JSON lines to an optional sink"""
+
+    def __init__(self, sink: Optional[TextIO] = None, print_summary: bool = False):
+        self.sink = sink
+        self.print_summary = print_summary
+        self._ids = itertools.count(1)
+
+    @classmethod
+    def open(cls, trace_file: Optional[str] = None, enabled: bool = False) -> "Tracer":
+        """Trace to a file (appending), to stderr when only enabled, or nowhere"""
+        if trace_file:
+            return cls(open(trace_file, "a", buffering=1), print_summary=True)
+        return cls(sys.stderr if enabled else None, print_summary=enabled)
+
+    def start_query(self, query: str) -> QueryTrace:
+        return QueryTrace(self, next(self._ids), query)
+
+    def emit(self, entry: Dict[str, Any]):
+        if self.sink is not None:
+            self.sink.write(json.dumps(entry, default=str) + "\n")
+
+    def close(self):
+        if self.sink is not None and self.sink not in (sys.stderr, sys.stdout):
+            self.sink.close()
@@ -1,60 +1,277 @@
 from fastmcp.server.dependencies import get_http_headers
 import os
 import requests
+import httpx
 from dotenv import load_dotenv
 load_dotenv()
 import json
 import asyncio
+import copy
+import hashlib
+import re
+import time
+import uuid
+import sqlite3
+from server.cache import cache_from_env, route_ttl, split_endpoint
+from server.store import store_from_env, store_path, FULL_SYNC_COLLECTIONS, STORE_COLLECTIONS
+from server.metrics import record_upstream, record_cache_hit
+from server.scheduler import scheduler_from_env, SchedulerBusyError, PRIORITY_INTERACTIVE, PRIORITY_BULK
+from server.tenants import TenantPools, TenantError, Tenant, bearer_token, BASE_URL_HEADER, METHOD_BASE_URLS
+from server.cassette import cassette_from_env
+from server.shared import SharedStateError
 
 base_url = os.getenv("BASE_URL", "https://dev.methodfi.com")
 method_api_key = os.getenv("METHOD_API_KEY")
 
+# Route each MCP request to the caller's own key (Authorization: Bearer) and base URL (X-Method-Base-URL);
+# requests without one, and background work, use METHOD_API_KEY and BASE_URL
+tenant_routing = os.getenv("METHOD_TENANT_ROUTING", "true").lower() in ("1", "true", "yes")
+allowed_base_urls = {url.strip().rstrip("/") for url in
+                     os.getenv("METHOD_ALLOWED_BASE_URLS", ",".join(METHOD_BASE_URLS)).split(",") if url.strip()}
+
+# Connection pool settings for each tenant's async client
+pool_max_connections = int(os.getenv("METHOD_MAX_CONNECTIONS", "100"))
+pool_max_keepalive = int(os.getenv("METHOD_MAX_KEEPALIVE_CONNECTIONS", "20"))
+pool_keepalive_expiry = float(os.getenv("METHOD_KEEPALIVE_EXPIRY", "30"))
+pool_http2 = os.getenv("METHOD_HTTP2", "false").lower() in ("1", "true", "yes")
+
+# Concurrency limit for batch tools fanning out many requests
+batch_concurrency = int(os.getenv("METHOD_BATCH_CONCURRENCY", "8"))
+
+# Shared cache of read-only responses, None when METHOD_CACHE_ENABLED is false
+response_cache = cache_from_env()
+
+# On-disk copy of entities, accounts, payments and merchants, None when METHOD_STORE_ENABLED is false
+snapshot_store = store_from_env()
+
+# Records Method API exchanges to, or replays them from, METHOD_CASSETTE; None when unset
+cassette = cassette_from_env()
+
+# Queueing, rate limiting and retries for every async Method API request
+scheduler = scheduler_from_env(default_max_in_flight=pool_max_connections)
+
+# Identical writes from one caller within this many seconds of the first share its idempotency key,
+# so a write reissued after a timeout is executed once
+idempotency_window = float(os.getenv("METHOD_IDEMPOTENCY_WINDOW", "120"))
+_idempotency_keys = {}
+
+# Body-less POSTs that start a job (balances, updates, connects, credit scores); identical ones in
+# progress share one result like GETs do, since every caller wants the same job
+COALESCED_WRITES = re.compile(r"^/(accounts|entities)/[^/?]+/(balances|updates|connect|credit_scores)$")
+
+# Single-flight: identical GETs and job-creating POSTs in progress, keyed by (API key, base URL, method, endpoint, body)
+_in_flight = {}
+_coalesce_counters = {"leaders": 0, "coalesced": 0, "coalesced_shared": 0}
+
+# Response cache, rate limit buckets and in-flight requests shared with the other workers of a
+# multi-worker server (server/shared.py); None in a single process
+shared_state = None
+
+def _build_headers(api_key: str = None) -> dict:
+    return {
+        "Method-Version": "2024-04-04",
+        "Authorization": f"Bearer {api_key or method_api_key}",
+        "Content-Type": "application/json"
+    }
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _open_pool(api_key: str, url: str, max_connections: int = None, max_keepalive_connections: int = None,
+               keepalive_expiry: float = None, http2: bool = None):
+    limits = httpx.Limits(
+        max_connections=max_connections or pool_max_connections,
+        max_keepalive_connections=max_keepalive_connections or pool_max_keepalive,
+        keepalive_expiry=pool_keepalive_expiry if keepalive_expiry is None else keepalive_expiry,
+    )
+    use_http2 = pool_http2 if http2 is None else http2
+    if use_http2 and not _http2_available():
+        print("HTTP/2 requested but the 'h2' package is not installed; falling back to HTTP/1.1")
+        use_http2 = False
+
+    transport = httpx.AsyncHTTPTransport(limits=limits, http2=use_http2)
+    if cassette is not None:
+        transport = cassette.transport(transport)
+    client = httpx.AsyncClient(
+        base_url=url,
+        headers=_build_headers(api_key),
+        transport=transport,
+        timeout=30,
+    )
+    return client, transport
+
+# Pool settings given to open_http_client, applied to every tenant opened afterwards
+_pool_settings = {}
+
+def _forget_tenant(tenant: Tenant):
+    """Drop the rate limit bucket and cached responses of an evicted tenant"""
+    if tenant.api_key == method_api_key:
+        # Webhook refreshes and syncs keep filling the server key's cache while its pool is closed
+        return
+    scheduler.forget(tenant.api_key or "")
+    # The shared cache outlives one worker's tenant; its entries expire on their own
+    if response_cache is not None and shared_state is None:
+        response_cache.clear(tenant.api_key or "")
+
+# One pooled client per (API key, base URL), closed after METHOD_TENANT_IDLE_SECONDS without requests
+tenant_pools = TenantPools(
+    lambda api_key, url: _open_pool(api_key, url, **_pool_settings),
+    idle_timeout=float(os.getenv("METHOD_TENANT_IDLE_SECONDS", "300")),
+    max_tenants=int(os.getenv("METHOD_MAX_TENANTS", "256")),
+    on_evict=_forget_tenant,
+)
+
+def open_http_client(max_connections: int = None,
+                     max_keepalive_connections: int = None,
+                     keepalive_expiry: float = None,
+                     http2: bool = None) -> httpx.AsyncClient:
+    """
+    Open the pooled client for the server's own credentials (METHOD_API_KEY, BASE_URL)
+    Callers' pools are opened on their first request with the same settings
+    Arguments left as None fall back to the METHOD_* environment settings
+    """
+    settings = {"max_connections": max_connections, "max_keepalive_connections": max_keepalive_connections,
+                "keepalive_expiry": keepalive_expiry, "http2": http2}
+    _pool_settings.update({k: v for k, v in settings.items() if v is not None})
+    return tenant_pools.get(method_api_key, base_url).client
+
+async def close_http_client():
+    """Close every tenant's pooled client and drop their kept-alive connections"""
+    await tenant_pools.close_all()
+
+def caller_credentials() -> tuple:
+    """
+    (API key, base URL) to use for the current MCP request
+    Raises TenantError for a base URL outside METHOD_ALLOWED_BASE_URLS
+    """
+    if tenant_routing:
+        headers = get_http_headers(include_all=True)
+        api_key = bearer_token(headers.get("authorization"))
+        if api_key:
+            url = (headers.get(BASE_URL_HEADER) or base_url).rstrip("/")
+            if url != base_url.rstrip("/") and url not in allowed_base_urls:
+                raise TenantError(f"Base URL {url} is not allowed on this server")
+            return api_key, url
+    return method_api_key, base_url
+
+def caller_key() -> str:
+    """The current caller's API key, or '' when their credentials cannot be routed"""
+    try:
+        return caller_credentials()[0] or ""
+    except TenantError:
+        return ""
+
+def get_cache_stats() -> dict:
+    """Hit/miss/eviction counters for the response cache"""
+    if shared_state is not None:
+        return {"enabled": True, "shared": True}
+    if response_cache is None:
+        return {"enabled": False}
+    return dict(response_cache.stats(), enabled=True)
+
+async def get_shared_stats() -> dict:
+    """Counters of the state shared between workers, including the shared response cache"""
+    if shared_state is None:
+        return {"enabled": False}
+    try:
+        return dict(await shared_state.stats(), enabled=True, client=shared_state.counters)
+    except SharedStateError as e:
+        return {"enabled": True, "error": True, "message": str(e), "client": shared_state.counters}
+
+def get_store_stats() -> dict:
+    """Counters of the on-disk snapshot store"""
+    if snapshot_store is None:
+        return {"enabled": False}
+    return dict(snapshot_store.stats(), enabled=True)
+
+def get_scheduler_stats() -> dict:
+    """Queue depth, in-flight requests, retry, rate-limit and coalescing counters"""
+    return dict(scheduler.stats(), coalesced=_coalesce_counters["coalesced"],
+                coalesced_shared=_coalesce_counters["coalesced_shared"],
+                upstream_calls=_coalesce_counters["leaders"] - _coalesce_counters["coalesced_shared"],
+                in_flight_unique=len(_in_flight))
+
+def get_pool_stats() -> dict:
+    """Connection pool statistics summed over every tenant's client"""
+    totals = {"connections_open": 0, "connections_idle": 0, "connections_created": 0, "connections_reused": 0,
+              "requests_active": 0, "requests_waiting": 0, "requests_total": 0, "http2": False}
+    for tenant in tenant_pools:
+        for name, value in tenant.pool_stats().items():
+            totals[name] = (totals[name] or value) if name == "http2" else totals[name] + value
+    return totals
+
+def get_cassette_stats() -> dict:
+    """Recorded or replayed Method API exchanges"""
+    if cassette is None:
+        return {"enabled": False}
+    return dict(cassette.stats(), enabled=True)
+
+def get_tenant_stats() -> dict:
+    """Open tenant pools (by hashed API key) and eviction counters"""
+    return dict(tenant_pools.stats(), routing=tenant_routing)
+
+def _parse_response(status_code: int, text: str):
+    """
+    Turn a raw Method API response into the response data or an error dict
+    """
+    # Check if response is successful
+    if status_code >= 200 and status_code < 300:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return {"success": True, "status_code": status_code}
+    else:
+        # Return error as dict instead of raising exception
+        try:
+            error_data = json.loads(text)
+            return {
+                "error": True,
+                "message": error_data.get('message', f'HTTP {status_code} error'),
+                "status_code": status_code,
+                "error_type": error_data.get('type', 'unknown_error'),
+                "error_code": error_data.get('code')
+            }
+        except (json.JSONDecodeError, AttributeError):
+            return {
+                "error": True,
+                "message": f"HTTP {status_code}: {text}",
+                "status_code": status_code
+            }
+
 def call_endpoint(endpoint: str, method: str = "GET", data: dict = None):
     """
     Call Method API endpoint with simple error handling
     Returns either the response data or an error dict
     """
-    url = f"{base_url}{endpoint}"
-    
-    headers = {
-        "Method-Version": "2024-04-04",
-        "Authorization": f"Bearer {method_api_key}",
-        "Content-Type": "application/json"
-    }
-    
+    try:
+        api_key, url = caller_credentials()
+    except TenantError as e:
+        return {"error": True, "message": str(e), "status_code": 403}
+
+    if cassette is not None:
+        # requests has no transport hook, so cassette runs go through httpx
+        try:
+            with httpx.Client(transport=cassette.transport(httpx.HTTPTransport()), timeout=30) as client:
+                response = client.request(method, f"{url}{endpoint}", headers=_build_headers(api_key),
+                                          json=data if data else None)
+            return _parse_response(response.status_code, response.text)
+        except httpx.HTTPError as e:
+            return {"error": True, "message": f"Request error: {str(e)}"}
+
     try:
         response = requests.request(
             method=method,
-            url=url,
-            headers=headers,
+            url=f"{url}{endpoint}",
+            headers=_build_headers(api_key),
             json=data if data else None,
             timeout=30
         )
-        
-        # Check if response is successful
-        if response.status_code >= 200 and response.status_code < 300:
-            try:
-                return response.json()
-            except json.JSONDecodeError:
-                return {"success": True, "status_code": response.status_code}
-        else:
-            # Return error as dict instead of raising exception
-            try:
-                error_data = response.json()
-                return {
-                    "error": True,
-                    "message": error_data.get('message', f'HTTP {response.status_code} error'),
-                    "status_code": response.status_code,
-                    "error_type": error_data.get('type', 'unknown_error'),
-                    "error_code": error_data.get('code')
-                }
-            except json.JSONDecodeError:
-                return {
-                    "error": True,
-                    "message": f"HTTP {response.status_code}: {response.text}",
-                    "status_code": response.status_code
-                }
-                
+        return _parse_response(response.status_code, response.text)
+
     except requests.exceptions.Timeout:
         return {"error": True, "message": "Request timeout - Method API did not respond in time"}
     except requests.exceptions.ConnectionError:
@@ -64,10 +281,411 @@ def call_endpoint(endpoint: str, method: str = "GET", data: dict = None):
     except Exception as e:
         return {"error": True, "message": f"Unexpected error: {str(e)}"}
 
+async def _async_request(endpoint: str,
+                         method: str = "GET",
+                         data: dict = None,
+                         priority: int = PRIORITY_INTERACTIVE,
+                         idempotency_key: str = None,
+                         credentials: tuple = None):
+    """
+    Send one request on the tenant's pooled client through the scheduler
+    credentials is an (API key, base URL) pair, the current caller's when None
+    Requests carrying an idempotency key are retried like idempotent methods
+    Returns the httpx response, or an error dict if the request never completed
+    """
+    headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+    try:
+        api_key, url = credentials or caller_credentials()
+    except TenantError as e:
+        return {"error": True, "message": str(e), "status_code": 403}
+    tenant = tenant_pools.get(api_key, url)
+
+    async def send():
+        tenant.requests += 1
+        start = time.perf_counter()
+        try:
+            response = await tenant.client.request(
+                method=method,
+                url=endpoint,
+                json=data if data else None,
+                headers=headers,
+                extensions={"trace": tenant.trace},
+            )
+        except httpx.HTTPError:
+            record_upstream(time.perf_counter() - start, "error")
+            raise
+        record_upstream(time.perf_counter() - start, response.status_code)
+        return response
+
+    tenant.active += 1
+    try:
+        return await scheduler.submit(send, method=method, api_key=api_key or "", priority=priority,
+                                      idempotent=True if idempotency_key else None)
+    except SchedulerBusyError:
+        return {"error": True, "message": "Server busy - too many queued Method API requests", "status_code": 503}
+    except httpx.TimeoutException:
+        return {"error": True, "message": "Request timeout - Method API did not respond in time"}
+    except httpx.ConnectError:
+        return {"error": True, "message": "Connection error - Unable to connect to Method API"}
+    except httpx.HTTPError as e:
+        return {"error": True, "message": f"Request error: {str(e)}"}
+    except Exception as e:
+        return {"error": True, "message": f"Unexpected error: {str(e)}"}
+    finally:
+        tenant.active -= 1
+        tenant.last_used = time.monotonic()
+
+def _idempotency_material(endpoint: str, method: str, data: dict, api_key: str) -> str:
+    body = json.dumps(data or {}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{api_key or ''}|{method.upper()}|{endpoint}|{body}".encode()).hexdigest()
+
+async def idempotency_key_for(endpoint: str, method: str, data: dict = None, api_key: str = None) -> str:
+    """
+    Idempotency key for a write: the key issued to the first identical write (same
+    caller, endpoint and body) within idempotency_window seconds of it, else a new one
+    The window runs from the first write and is not extended, so it has no boundary a retry could cross
+    and a deliberate repeat after it is a new write; with shared state the key is shared by all workers
+    """
+    material = _idempotency_material(endpoint, method, data, caller_key() if api_key is None else api_key)
+    candidate = uuid.uuid4().hex
+    if shared_state is not None:
+        try:
+            return await shared_state.claim_idempotency_key(material, candidate, idempotency_window)
+        except SharedStateError:
+            pass
+    now = time.monotonic()
+    if len(_idempotency_keys) > 4096:
+        for stale in [m for m, (_, expires_at) in _idempotency_keys.items() if expires_at <= now]:
+            del _idempotency_keys[stale]
+    issued = _idempotency_keys.get(material)
+    if issued is not None and issued[1] > now:
+        return issued[0]
+    _idempotency_keys[material] = (candidate, now + idempotency_window)
+    return candidate
+
+# ===== CACHE ACCESS =====
+# The response cache lives in this process, or with the shared state of a multi-worker server
+
+async def _cache_get(api_key: str, method: str, endpoint: str):
+    if shared_state is not None:
+        try:
+            return await shared_state.cache_get(api_key, method, endpoint)
+        except SharedStateError:
+            return None
+    return response_cache.get(api_key, method, endpoint) if response_cache is not None else None
+
+def _cache_set(api_key: str, method: str, endpoint: str, body: str, ttl: float = None):
+    if shared_state is not None:
+        shared_state.cache_set(api_key, method, endpoint, body, ttl=ttl)
+    elif response_cache is not None:
+        response_cache.set(api_key, method, endpoint, body, ttl=ttl)
+
+def _cache_invalidate(endpoint: str, api_key: str = None):
+    if shared_state is not None:
+        shared_state.cache_invalidate(endpoint, api_key)
+    elif response_cache is not None:
+        response_cache.invalidate(endpoint, api_key)
+
+def _invalidate(endpoint: str, api_key: str = None):
+    """Drop the cached and stored copies a change to endpoint makes stale, of every tenant when api_key is None"""
+    _cache_invalidate(endpoint, api_key)
+    if snapshot_store is not None:
+        try:
+            snapshot_store.invalidate(endpoint, api_key)
+        except sqlite3.Error as e:
+            print(f"Could not write to snapshot store: {e}")
+
+def _caching() -> bool:
+    return shared_state is not None or response_cache is not None
+
+async def _call_upstream(endpoint: str, method: str, data: dict, priority: int, idempotency_key: str,
+                         credentials: tuple, cache_ttl: float = None, refreshed: bool = False):
+    response = await _async_request(endpoint, method, data, priority, idempotency_key, credentials)
+    if isinstance(response, dict):
+        return response
+    if method.upper() == "GET" and response.is_success:
+        _cache_set(credentials[0], method, endpoint, response.text, ttl=cache_ttl)
+    elif response.is_success:
+        # A read that ran alongside this write may have re-cached the old copy meanwhile
+        _invalidate(endpoint, credentials[0])
+    body = _parse_response(response.status_code, response.text)
+    if snapshot_store is not None and response.is_success:
+        _write_through(credentials[0], endpoint, body, refreshed=refreshed)
+    return body
+
+def _write_through(api_key: str, endpoint: str, body, refreshed: bool = False):
+    """
+    Keep the snapshot store current with any entities, accounts, payments or merchants a response carries
+    Objects a webhook refresh fetched are served for the store's max_age, others only for the route's cache TTL
+    """
+    try:
+        max_age = None if refreshed else route_ttl(split_endpoint(endpoint)[0])
+        snapshot_store.put_response(api_key, endpoint, body, max_age=max_age)
+    except sqlite3.Error as e:
+        print(f"Could not write to snapshot store: {e}")
+
+async def refresh_cached(endpoint: str, ttl: float = None):
+    """
+    Drop every tenant's cached and stored copies touched by a change to endpoint,
+    then fetch it again with the server's own credentials and cache the fresh
+    copy for ttl seconds (the route's TTL when None)
+    Returns the response data or an error dict
+    """
+    # Webhooks do not say which tenant's key saw the object, so no tenant may keep serving the old copy
+    _invalidate(endpoint)
+    return await _call_upstream(endpoint, "GET", None, PRIORITY_BULK, None, (method_api_key, base_url), cache_ttl=ttl,
+                                refreshed=True)
+
+async def async_call_endpoint(endpoint: str,
+                              method: str = "GET",
+                              data: dict = None,
+                              priority: int = PRIORITY_INTERACTIVE,
+                              idempotency_key: str = None,
+                              use_cache: bool = True):
+    """
+    Non-blocking variant of call_endpoint for use inside the MCP event loop
+    GET responses are served from the response cache or the snapshot store
+    when fresh (unless use_cache is False, which still
+    refreshes the cached copies), and any
+    other method invalidates the cached copies of the resource it touches
+    Identical GETs and job-creating POSTs already in flight share one upstream
+    call, and POSTs carry an idempotency key (shared by identical writes within
+    idempotency_window unless one is given) that the scheduler's retries reuse
+    Bulk callers pass PRIORITY_BULK so interactive requests are scheduled first
+    Every cache, store and in-flight lookup is scoped to the caller's credentials
+    Returns either the response data or an error dict
+    """
+    try:
+        credentials = caller_credentials()
+    except TenantError as e:
+        return {"error": True, "message": str(e), "status_code": 403}
+    api_key = credentials[0]
+    method = method.upper()
+    if method != "GET":
+        _invalidate(endpoint, api_key)
+    elif _caching() and use_cache:
+        cached = await _cache_get(api_key, method, endpoint)
+        if cached is not None:
+            record_cache_hit("cache")
+            return cached
+    if snapshot_store is not None and method == "GET" and use_cache:
+        stored = snapshot_store.get(api_key, endpoint)
+        if stored is not None:
+            record_cache_hit("store")
+            return stored
+
+    if method == "POST" and not idempotency_key:
+        idempotency_key = await idempotency_key_for(endpoint, method, data, api_key or "")
+
+    if method != "GET" and not (method == "POST" and not data and COALESCED_WRITES.match(endpoint)):
+        # Other writes each get their own upstream call; the idempotency key keeps repeats from executing twice
+        return await _call_upstream(endpoint, method, data, priority, idempotency_key, credentials)
+
+    flight_key = credentials + (method, endpoint, json.dumps(data, sort_keys=True) if data else "")
+    flight = _in_flight.get(flight_key)
+    if flight is not None:
+        # Someone else is already making this exact request; share their result
+        _coalesce_counters["coalesced"] += 1
+        record_cache_hit("coalesced")
+        return copy.deepcopy(await asyncio.shield(flight))
+
+    # Run the upstream call as its own task so followers survive the leader being cancelled
+    flight = asyncio.ensure_future(_shared_flight(
+        flight_key, lambda: _call_upstream(endpoint, method, data, priority, idempotency_key, credentials)))
+    _in_flight[flight_key] = flight
+    flight.add_done_callback(lambda _: _in_flight.pop(flight_key, None))
+    _coalesce_counters["leaders"] += 1
+    return await asyncio.shield(flight)
+
+async def _shared_flight(flight_key: tuple, call):
+    """
+    Run call() unless another worker is already making the same request, in which
+    case wait for and share its result; just call() without shared state
+    """
+    if shared_state is None:
+        return await call()
+    key = json.dumps(flight_key)
+    try:
+        leader, result = await shared_state.join_flight(key)
+    except SharedStateError:
+        return await call()
+    if not leader:
+        _coalesce_counters["coalesced_shared"] += 1
+        record_cache_hit("coalesced")
+        return result
+    try:
+        result = await call()
+    except BaseException:
+        shared_state.abandon_flight(key)
+        raise
+    shared_state.finish_flight(key, result)
+    return result
+
+async def batch_call_endpoint(endpoints: dict, method: str = "GET", concurrency: int = None) -> dict:
+    """
+    Call many endpoints concurrently, at most `concurrency` in flight at once
+    Takes a mapping of key -> endpoint and returns key -> response data or error dict
+    """
+    semaphore = asyncio.Semaphore(concurrency or batch_concurrency)
+
+    async def call(key, endpoint):
+        async with semaphore:
+            return key, await async_call_endpoint(endpoint, method, priority=PRIORITY_BULK)
+
+    return dict(await asyncio.gather(*(call(key, endpoint) for key, endpoint in endpoints.items())))
+
+# ===== PAGINATION =====
+
+class MethodAPIError(Exception):
+    """Raised by paginate when a page request fails; args[0] is the error dict"""
+
+def with_query(endpoint: str, params: dict) -> str:
+    """Append query parameters to an endpoint"""
+    if not params:
+        return endpoint
+    query_string = "&".join([f"{k}={v}" for k, v in params.items()])
+    return f"{endpoint}{'&' if '?' in endpoint else '?'}{query_string}"
+
+async def _fetch_page(endpoint: str, cursor: str, page_limit: int):
+    params = {"page[limit]": page_limit}
+    if cursor:
+        params["page[cursor]"] = cursor
+    response = await _async_request(with_query(endpoint, params), "GET", priority=PRIORITY_BULK)
+    if isinstance(response, dict):
+        raise MethodAPIError(response)
+    body = _parse_response(response.status_code, response.text)
+    if isinstance(body, dict) and body.get("error"):
+        raise MethodAPIError(body)
+    items = body.get("data") or [] if isinstance(body, dict) else body
+    return items, response.headers.get("Pagination-Page-Cursor-Next")
+
+async def paginate(endpoint: str,
+                   page_limit: int = 250,
+                   max_items: int = None,
+                   max_bytes: int = None,
+                   prefetch: bool = True,
+                   stats: dict = None):
+    """
+    Follow Method page cursors and yield every item of a list endpoint
+    With prefetch on, the next page is requested while the current one is consumed
+    Stops once max_items items or max_bytes of (compact JSON) items have been yielded
+    If given, stats is filled with the page count and whether the walk was truncated
+    Raises MethodAPIError if a page request fails
+    """
+    stats = {} if stats is None else stats
+    stats.update(pages=0, truncated=False)
+    page_limit = min(page_limit, 250)
+    yielded = 0
+    size = 0
+    pending = asyncio.ensure_future(_fetch_page(endpoint, None, page_limit))
+    try:
+        while pending is not None:
+            items, next_cursor = await pending
+            pending = None
+            stats["pages"] += 1
+            if next_cursor and prefetch:
+                pending = asyncio.ensure_future(_fetch_page(endpoint, next_cursor, page_limit))
+
+            for item in items:
+                if max_items is not None and yielded >= max_items:
+                    stats["truncated"] = True
+                    return
+                if max_bytes is not None:
+                    size += len(json.dumps(item, separators=(",", ":")))
+                    if size > max_bytes:
+                        stats["truncated"] = True
+                        return
+                yield item
+                yielded += 1
+
+            if next_cursor and not prefetch:
+                pending = asyncio.ensure_future(_fetch_page(endpoint, next_cursor, page_limit))
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+
+# ===== SNAPSHOT SYNC =====
+
+# Objects buffered before each write to the snapshot store during a sync
+SYNC_BATCH_SIZE = 1000
+
+async def _sync_collection(collection: str, full: bool, api_key: str) -> dict:
+    start = time.perf_counter()
+    if collection in FULL_SYNC_COLLECTIONS:
+        response = await _async_request(f"/{collection}", "GET", priority=PRIORITY_BULK)
+        if isinstance(response, dict):
+            raise MethodAPIError(response)
+        body = _parse_response(response.status_code, response.text)
+        if isinstance(body, dict) and body.get("error"):
+            raise MethodAPIError(body)
+        items = body.get("data") or [] if isinstance(body, dict) else body
+        fetched = len(items)
+        written = snapshot_store.put_many(api_key, collection, items)
+        watermark = None
+    else:
+        # Method filters lists by creation date, so only objects created since the newest one the last sync saw
+        # are walked; rows written through since then may be newer and must not move the watermark.
+        # Changes to older objects arrive through webhooks, write-through, or a full sync
+        watermark = None if full else snapshot_store.watermark(api_key, collection)
+        endpoint = with_query(f"/{collection}", {"from_date": watermark[:10]} if watermark else {})
+        fetched = written = 0
+        buffer = []
+        async for item in paginate(endpoint):
+            buffer.append(item)
+            fetched += 1
+            if isinstance(item, dict) and (watermark is None or (item.get("created_at") or "") > watermark):
+                watermark = item.get("created_at") or watermark
+            if len(buffer) >= SYNC_BATCH_SIZE:
+                written += snapshot_store.put_many(api_key, collection, buffer)
+                buffer = []
+        written += snapshot_store.put_many(api_key, collection, buffer)
+    snapshot_store.mark_synced(api_key, collection, watermark)
+    return {"fetched": fetched, "written": written, "seconds": round(time.perf_counter() - start, 3)}
+
+async def sync_store(collections: list = None, full: bool = False) -> dict:
+    """
+    Bring the caller's part of the snapshot store up to date (the server key's
+    outside an MCP request), only walking what changed since the last sync unless full is set
+    Returns per-collection counts of fetched and written objects, or an error dict per failed collection
+    """
+    if snapshot_store is None:
+        return {"error": True, "message": "Snapshot store is disabled (METHOD_STORE_ENABLED=false)"}
+    try:
+        api_key = caller_credentials()[0]
+    except TenantError as e:
+        return {"error": True, "message": str(e), "status_code": 403}
+    results = {}
+    for collection in collections or STORE_COLLECTIONS:
+        if collection not in STORE_COLLECTIONS:
+            results[collection] = {"error": True, "message": f"Unknown collection '{collection}'"}
+            continue
+        try:
+            results[collection] = await _sync_collection(collection, full, api_key)
+        except MethodAPIError as e:
+            results[collection] = e.args[0]
+        except sqlite3.Error as e:
+            results[collection] = {"error": True, "message": f"Snapshot store error: {e}"}
+    return results
+
+async def run_sync_loop(interval: float):
+    """Incrementally sync the snapshot store every interval seconds until cancelled"""
+    while True:
+        await sync_store()
+        await asyncio.sleep(interval)
+
+async def run_store_reload_loop(interval: float):
+    """Keep this process's copy of the snapshot store up to date with other workers' writes until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            snapshot_store.reload()
+        except sqlite3.Error as e:
+            print(f"Could not reload snapshot store: {e}")
+
 async def main():
     # Test endpoint
-    response = call_endpoint("/entities", "GET")
+    response = await async_call_endpoint("/entities", "GET")
     print("Response:", response)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Per-route TTLs in seconds, first matching prefix wins. Routes not listed are never cached.
+ROUTE_TTLS: List[Tuple[str, float]] = [
+    ("/merchants", 6 * 60 * 60),
+    ("/webhooks", 5 * 60),
+    ("/entities", 15),
+    ("/accounts", 15),
+    ("/payments", 10),
+]
+
+CacheKey = Tuple[str, str, str, str]
+
+
+def split_endpoint(endpoint: str) -> Tuple[str, str]:
+    """Split an endpoint into its path and a normalized (sorted) query string"""
+    path, _, query = endpoint.partition("?")
+    if query:
+        query = "&".join(sorted(query.split("&")))
+    return path.rstrip("/") or "/", query
+
+
+def route_ttl(path: str) -> float:
+    """TTL configured for a resource path, 0 when the route is not cacheable"""
+    for prefix, ttl in ROUTE_TTLS:
+        if path == prefix or path.startswith(prefix + "/"):
+            return ttl
+    return 0
+
+
+class ResponseCache:
+    """
+    Bounded TTL + LRU cache of raw Method API response bodies.
+    Entries are evicted least-recently-used first once either the entry
+    count or the total body size exceeds its limit.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, Tuple[float, str]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _key(self, api_key: str, method: str, endpoint: str) -> Tuple[CacheKey, str]:
+        path, query = split_endpoint(endpoint)
+        return (api_key or "", method.upper(), path, query), path
+
+    def _drop(self, key: CacheKey):
+        _, body = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def get(self, api_key: str, method: str, endpoint: str) -> Optional[Dict]:
+        """Return a fresh copy of the cached response, or None on a miss"""
+        body = self.get_body(api_key, method, endpoint)
+        return None if body is None else json.loads(body)
+
+    def get_body(self, api_key: str, method: str, endpoint: str) -> Optional[str]:
+        """Return the cached raw response body, or None on a miss"""
+        key, _ = self._key(api_key, method, endpoint)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, body = entry
+        if expires_at <= time.monotonic():
+            self._drop(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def set(self, api_key: str, method: str, endpoint: str, body: str, ttl: Optional[float] = None):
+        """Store a raw response body if its route is cacheable, for ttl seconds or the route's TTL"""
+        key, path = self._key(api_key, method, endpoint)
+        if route_ttl(path) <= 0:
+            return
+        ttl = route_ttl(path) if ttl is None else ttl
+        if ttl <= 0 or len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic() + ttl, body)
+        self._bytes += len(body)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def invalidate(self, endpoint: str, api_key: Optional[str] = None) -> int:
+        """
+        Drop cached copies touched by a write to endpoint: the resource itself,
+        everything below it, and the collection lists above it
+        """
+        path, _ = split_endpoint(endpoint)
+        ancestors = set()
+        parent = path
+        while parent.count("/") > 1:
+            parent = parent.rsplit("/", 1)[0]
+            ancestors.add(parent)
+
+        stale = [
+            key for key in self._entries
+            if (api_key is None or key[0] == api_key)
+            and (key[2] == path or key[2].startswith(path + "/") or key[2] in ancestors)
+        ]
+        for key in stale:
+            self._drop(key)
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self, api_key: Optional[str] = None):
+        """Drop every entry, or only those cached for one API key"""
+        if api_key is None:
+            self._entries.clear()
+            self._bytes = 0
+            return
+        for key in [key for key in self._entries if key[0] == api_key]:
+            self._drop(key)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+def cache_from_env() -> Optional[ResponseCache]:
+    """Build the response cache from METHOD_CACHE_* settings, None when disabled"""
+    if os.getenv("METHOD_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    return ResponseCache(
+        max_entries=int(os.getenv("METHOD_CACHE_MAX_ENTRIES", "1024")),
+        max_bytes=int(os.getenv("METHOD_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    )
@@ -0,0 +1,287 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+CASSETTE_VERSION = 1
+
+# Response headers that describe the original transfer rather than the response
+DROPPED_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "connection", "keep-alive", "date",
+                   "set-cookie"}
+
+RequestKey = Tuple[str, str, str]
+
+
+class CassetteMissError(httpx.HTTPError):
+    """Raised on replay when no recorded exchange is left for a request; never retried"""
+
+
+def _text(data: bytes) -> str:
+    # surrogateescape keeps bytes that are not valid UTF-8 (e.g. a chunk ending mid-character) round-trippable
+    return data.decode("utf-8", "surrogateescape")
+
+
+def _bytes(text: str) -> bytes:
+    return text.encode("utf-8", "surrogateescape")
+
+
+def _normalized_body(body: str) -> str:
+    try:
+        return json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        return body
+
+
+def request_key(method: str, url: httpx.URL, body: str) -> RequestKey:
+    """Method, path with query and normalized body; the host is left out so replays may target another base URL"""
+    return method.upper(), url.raw_path.decode("ascii"), _normalized_body(body) if body else ""
+
+
+class Cassette:
+    """
+    HTTP exchanges recorded to, or replayed from, a JSON lines file.
+
+    In record mode every response passing through a CassetteTransport is
+    written with the time its headers and each body chunk arrived. In replay
+    mode a request gets the first unused recording with the same method, path
+    and body, or failing that the next unused one for the same method and path
+    (so runs whose prompts drifted still replay in order). Delays are the
+    recorded ones multiplied by time_scale: 1 for original timing, 0 for none.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", time_scale: float = 1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode '{mode}'")
+        self.path = path
+        self.mode = mode
+        self.time_scale = time_scale
+        self.started = time.perf_counter()
+        self.counters = {"recorded": 0, "replayed": 0, "replayed_in_order": 0, "missed": 0}
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._file = None
+        self._notes: List[Dict] = []
+        self._exact: Dict[RequestKey, Deque[Dict]] = defaultdict(deque)
+        self._in_order: Dict[Tuple[str, str], Deque[Dict]] = defaultdict(deque)
+        self._used = set()
+        if mode == "record":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, "w", buffering=1)
+            self._write({"cassette": CASSETTE_VERSION, "recorded_at": time.time()})
+        else:
+            self._load()
+
+    def _load(self):
+        with open(self.path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if "note" in entry:
+                    self._notes.append(entry)
+                elif "request" in entry:
+                    key = tuple(entry["request"]["key"])
+                    self._exact[key].append(entry)
+                    self._in_order[key[:2]].append(entry)
+
+    def _write(self, entry: Dict):
+        with self._lock:
+            self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # ===== RECORDING =====
+
+    def note(self, kind: str, **fields):
+        """Record something other than an HTTP exchange, e.g. the user queries of a session"""
+        if self.mode == "record":
+            self._write(dict(fields, note=kind))
+
+    def record(self, key: RequestKey, url: str, started: float, response: httpx.Response, headers_at: float,
+               chunks: List[List]):
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        self._write({
+            "seq": seq,
+            "t": round(started - self.started, 6),
+            "request": {"key": list(key), "url": url},
+            "status": response.status_code,
+            "headers": [[k, v] for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS],
+            "headers_at": round(headers_at, 6),
+            "chunks": chunks,
+        })
+        self.counters["recorded"] += 1
+
+    # ===== REPLAY =====
+
+    def notes(self, kind: str) -> List[Dict]:
+        return [entry for entry in self._notes if entry["note"] == kind]
+
+    def _pop_unused(self, queue: Deque[Dict]) -> Optional[Dict]:
+        while queue:
+            entry = queue.popleft()
+            if entry["seq"] not in self._used:
+                self._used.add(entry["seq"])
+                return entry
+        return None
+
+    def take(self, key: RequestKey) -> Dict:
+        """The recorded exchange to answer a request with; raises CassetteMissError when none is left"""
+        with self._lock:
+            entry = self._pop_unused(self._exact.get(key, deque()))
+            if entry is not None:
+                self.counters["replayed"] += 1
+                return entry
+            entry = self._pop_unused(self._in_order.get(key[:2], deque()))
+            if entry is not None:
+                self.counters["replayed_in_order"] += 1
+                return entry
+            self.counters["missed"] += 1
+        raise CassetteMissError(f"No recorded response left for {key[0]} {key[1]} in {self.path}")
+
+    def transport(self, inner=None) -> "CassetteTransport":
+        """A transport recording what inner returns, or replaying without touching the network"""
+        return CassetteTransport(self, inner)
+
+    def stats(self) -> Dict:
+        return dict(self.counters, path=self.path, mode=self.mode, time_scale=self.time_scale)
+
+
+class _RecordingStream(httpx.AsyncByteStream, httpx.SyncByteStream):
+    """Passes the body through while noting when each chunk arrived, then records the exchange on close"""
+
+    def __init__(self, stream, on_close, started: float):
+        self._stream = stream
+        self._on_close = on_close
+        self._started = started
+        self._chunks: List[List] = []
+        self._closed = False
+
+    def _note(self, chunk: bytes):
+        self._chunks.append([round(time.perf_counter() - self._started, 6), _text(chunk)])
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._note(chunk)
+            yield chunk
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._note(chunk)
+            yield chunk
+
+    def _finish(self):
+        if not self._closed:
+            self._closed = True
+            self._on_close(self._chunks)
+
+    async def aclose(self):
+        await self._stream.aclose()
+        self._finish()
+
+    def close(self):
+        self._stream.close()
+        self._finish()
+
+
+class _ReplayStream(httpx.AsyncByteStream, httpx.SyncByteStream):
+    """Yields recorded chunks at their recorded offsets (scaled) from when the request was sent"""
+
+    def __init__(self, chunks: List[List], time_scale: float, started: float):
+        self._chunks = chunks
+        self._time_scale = time_scale
+        self._started = started
+
+    def _delay(self, offset: float) -> float:
+        return offset * self._time_scale - (time.perf_counter() - self._started)
+
+    async def __aiter__(self):
+        for offset, text in self._chunks:
+            delay = self._delay(offset)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield _bytes(text)
+
+    def __iter__(self):
+        for offset, text in self._chunks:
+            delay = self._delay(offset)
+            if delay > 0:
+                time.sleep(delay)
+            yield _bytes(text)
+
+
+class CassetteTransport(httpx.AsyncBaseTransport, httpx.BaseTransport):
+    """httpx transport (sync or async) that records through inner or replays from a Cassette"""
+
+    def __init__(self, cassette: Cassette, inner=None):
+        self.cassette = cassette
+        self.inner = inner
+
+    def _replay(self, request: httpx.Request, body: bytes, started: float) -> Tuple[httpx.Response, float]:
+        entry = self.cassette.take(request_key(request.method, request.url, _text(body)))
+        stream = _ReplayStream(entry["chunks"], self.cassette.time_scale, started)
+        response = httpx.Response(entry["status"], headers=entry["headers"], stream=stream, request=request)
+        return response, entry["headers_at"] * self.cassette.time_scale - (time.perf_counter() - started)
+
+    def _recording(self, request: httpx.Request, body: bytes, started: float,
+                   response: httpx.Response) -> httpx.Response:
+        key = request_key(request.method, request.url, _text(body))
+        headers_at = time.perf_counter() - started
+
+        def on_close(chunks):
+            self.cassette.record(key, str(request.url.copy_with(query=None)), started, response, headers_at, chunks)
+
+        stream = _RecordingStream(response.stream, on_close, started)
+        return httpx.Response(response.status_code, headers=response.headers, stream=stream,
+                              extensions=response.extensions, request=request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        body = await request.aread()
+        if self.cassette.mode == "replay":
+            response, delay = self._replay(request, body, started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return response
+        # Uncompressed bodies keep the cassette readable and replayable as-is
+        request.headers["accept-encoding"] = "identity"
+        response = await self.inner.handle_async_request(request)
+        return self._recording(request, body, started, response)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        body = request.read()
+        if self.cassette.mode == "replay":
+            response, delay = self._replay(request, body, started)
+            if delay > 0:
+                time.sleep(delay)
+            return response
+        request.headers["accept-encoding"] = "identity"
+        response = self.inner.handle_request(request)
+        return self._recording(request, body, started, response)
+
+    async def aclose(self):
+        if self.inner is not None:
+            await self.inner.aclose()
+
+    def close(self):
+        if self.inner is not None:
+            self.inner.close()
+
+
+def cassette_from_env(prefix: str = "METHOD_") -> Optional[Cassette]:
+    """Cassette from {prefix}CASSETTE (path), {prefix}CASSETTE_MODE and {prefix}CASSETTE_TIME_SCALE, None when unset"""
+    path = os.getenv(f"{prefix}CASSETTE")
+    if not path:
+        return None
+    return Cassette(path, mode=os.getenv(f"{prefix}CASSETTE_MODE", "replay").lower(),
+                    time_scale=float(os.getenv(f"{prefix}CASSETTE_TIME_SCALE", "1")))
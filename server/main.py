@@ -2,18 +2,123 @@ from fastmcp import FastMCP
 from dotenv import load_dotenv
 import os
 import asyncio
-from server.api import call_endpoint
-from typing import List, Dict, Optional, Annotated
+import json
+import sqlite3
+from server import api
+from server.api import async_call_endpoint, batch_call_endpoint, paginate, with_query, MethodAPIError, open_http_client, close_http_client, get_pool_stats, get_cache_stats, get_scheduler_stats, get_store_stats, get_tenant_stats, get_cassette_stats, get_shared_stats, sync_store, run_sync_loop, run_store_reload_loop, caller_credentials
+from server.merchants import catalog_from_env
+from server.poller import poller_from_env
+from server.metrics import metrics_from_env, render_families
+from server.webhooks import receiver_from_env, SIGNATURE_HEADER
+from server.tenants import TenantError
+from server.shared import SharedStateClient, SharedStateError
+from server.workers import run_workers
+from server.tool_schema import publish_tool_schema_hash
+from server.query import find as find_stored, aggregate as aggregate_stored, QueryError
+from server.projection import project, shape_response, count_by as count_items_by
+from typing import List, Dict, Optional, Annotated, Literal, Union
 from pydantic import Field
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
 
 load_dotenv()
-print(f"Method API Key in server: {os.getenv('METHOD_API_KEY')}")
 
 mcp = FastMCP()
+tool_metrics, metrics_middleware = metrics_from_env()
+if metrics_middleware is not None:
+    mcp.add_middleware(metrics_middleware)
+publish_tool_schema_hash(mcp)
+merchant_catalog = catalog_from_env()
+job_poller = poller_from_env()
+webhook_receiver = receiver_from_env()
+
+# Hard cap on items returned by an auto-paginated list call
+MAX_LIST_ITEMS = 10000
+
+# Projection options shared by the retrieve/list tools (see server/projection.py)
+ViewOption = Annotated[
+    Optional[Literal["summary", "ids_only", "full"]],
+    Field(description="Response detail: summary (key fields only), ids_only, or full (default)"),
+]
+FieldsOption = Annotated[
+    Optional[List[str]],
+    Field(description="Only return these fields, dotted paths allowed (e.g., id, status, liability.mch_id); overrides view"),
+]
+MaxBytesOption = Annotated[
+    Optional[int],
+    Field(description="Stop once the returned items reach this many bytes of JSON when all_pages is set"),
+]
+
+def _shape_items(items: List[Dict], resource: str, view: Optional[str], fields: Optional[List[str]], count_by: Optional[str]) -> Dict:
+    """Apply the list tools' projection or count aggregation to a list of items"""
+    if count_by:
+        return {"count": len(items), "counts": count_items_by(items, count_by)}
+    return {"count": len(items), "data": [project(item, resource, view, fields) for item in items]}
+
+async def _list_resource(endpoint: str,
+                         resource: str,
+                         params: Dict,
+                         page_cursor: Optional[str],
+                         page_limit: Optional[int],
+                         all_pages: Optional[bool],
+                         max_items: Optional[int],
+                         max_bytes: Optional[int],
+                         view: Optional[str],
+                         fields: Optional[List[str]],
+                         count_by: Optional[str]) -> Dict:
+    """Shared body of the list tools: one page, or every page when all_pages is set"""
+    if all_pages and page_cursor:
+        return {"error": True, "message": "page_cursor cannot be combined with all_pages, which always starts from the first page"}
+    if max_bytes is not None and not all_pages:
+        return {"error": True, "message": "max_bytes only applies when all_pages is set"}
+    if all_pages:
+        stats = {}
+        items = []
+        limit = min(max_items or 1000, MAX_LIST_ITEMS)
+        try:
+            async for item in paginate(with_query(endpoint, params), page_limit=page_limit or 250,
+                                       max_items=limit, max_bytes=max_bytes, stats=stats):
+                items.append(item)
+        except MethodAPIError as e:
+            return dict(e.args[0], partial_count=len(items))
+        result = _shape_items(items, resource, view, fields, count_by)
+        result.update(pages=stats["pages"], truncated=stats["truncated"])
+        return result
+
+    if page_cursor:
+        params["page[cursor]"] = page_cursor
+    if page_limit:
+        params["page[limit]"] = min(page_limit, 250)
+    response = await async_call_endpoint(with_query(endpoint, params), "GET")
+    if count_by and isinstance(response, dict) and isinstance(response.get("data"), list):
+        return _shape_items(response["data"], resource, view, fields, count_by)
+    return shape_response(response, resource, view, fields)
+
+# Options of the create tools for long-running resources (balances, updates, connects, credit scores)
+WaitOption = Annotated[
+    Optional[bool],
+    Field(description="Wait on the server until the request completes or fails instead of returning it pending"),
+]
+WaitTimeoutOption = Annotated[
+    Optional[float],
+    Field(description="Maximum seconds to wait when wait is set (default 30, max 120)"),
+]
+
+async def _create_job(endpoint: str, wait: Optional[bool], wait_timeout: Optional[float]) -> Dict:
+    """Create a long-running resource and, with wait set, poll it on the server until it finishes"""
+    response = await async_call_endpoint(endpoint, "POST")
+    if not wait or not isinstance(response, dict) or response.get("error"):
+        return response
+    job_id = (response.get("data") or {}).get("id")
+    if not job_id:
+        return response
+    return await job_poller.wait(f"{endpoint}/{job_id}", wait_timeout or 30.0, initial=response)
 
 @mcp.tool(name="HelloWorld", description="A simple hello world tool")
 def hello_world():
-    return f"Hello, World! my API key is {os.getenv('METHOD_API_KEY')}"
+    # Callers share this server, so only say whether a server key is configured, never the key itself
+    configured = "is" if os.getenv("METHOD_API_KEY") else "is not"
+    return f"Hello, World! A server Method API key {configured} configured"
 
 # ===== ENTITY ENDPOINTS =====
 
@@ -48,7 +153,7 @@ async def create_individual(
             "zip": zip
         }
     }
-    return call_endpoint("/entities", "POST", data=entity_data)
+    return await async_call_endpoint("/entities", "POST", data=entity_data)
 
 @mcp.tool(name="create_corporation", description="Create a corporation entity in Method")
 async def create_corporation(
@@ -102,7 +207,7 @@ async def create_corporation(
             "zip": zip
         }
     }
-    return call_endpoint("/entities", "POST", data=entity_data)
+    return await async_call_endpoint("/entities", "POST", data=entity_data)
 
 @mcp.tool(name="list_entities", description="List all entities")
 async def list_entities(
@@ -110,6 +215,12 @@ async def list_entities(
     status: Annotated[Optional[str], Field(description="Filter by status: active, incomplete, disabled")] = None,
     page_cursor: Annotated[Optional[str], Field(description="Cursor for pagination")] = None,
     page_limit: Annotated[Optional[int], Field(description="Number of entities per page (max 250)")] = None,
+    all_pages: Annotated[Optional[bool], Field(description="Follow page cursors and return every matching item in one call")] = False,
+    max_items: Annotated[Optional[int], Field(description="Maximum items to return when all_pages is set (default 1000, max 10000)")] = None,
+    max_bytes: MaxBytesOption = None,
+    view: ViewOption = None,
+    fields: FieldsOption = None,
+    count_by: Annotated[Optional[str], Field(description="Return counts grouped by this field (e.g., status) instead of items")] = None,
 ) -> Dict:
     """List all entities with optional filters"""
     params = {}
@@ -117,25 +228,17 @@ async def list_entities(
         params["type"] = entity_type
     if status:
         params["status"] = status
-    if page_cursor:
-        params["page[cursor]"] = page_cursor
-    if page_limit:
-        params["page[limit]"] = min(page_limit, 250)
-    
-    if params:
-        query_string = "&".join([f"{k}={v}" for k, v in params.items()])
-        endpoint = f"/entities?{query_string}"
-    else:
-        endpoint = "/entities"
-    
-    return call_endpoint(endpoint, "GET")
+
+    return await _list_resource("/entities", "entity", params, page_cursor, page_limit, all_pages, max_items, max_bytes, view, fields, count_by)
 
 @mcp.tool(name="retrieve_entity", description="Retrieve a specific entity by ID")
 async def retrieve_entity(
-    entity_id: Annotated[str, Field(description="The entity ID to retrieve (e.g., ent_au22b1fbFJbp8)")]
+    entity_id: Annotated[str, Field(description="The entity ID to retrieve (e.g., ent_au22b1fbFJbp8)")],
+    view: ViewOption = None,
+    fields: FieldsOption = None,
 ) -> Dict:
     """Retrieve entity details by ID"""
-    return call_endpoint(f"/entities/{entity_id}", "GET")
+    return shape_response(await async_call_endpoint(f"/entities/{entity_id}", "GET"), "entity", view, fields)
 
 @mcp.tool(name="update_entity", description="Update an entity")
 async def update_entity(
@@ -164,55 +267,67 @@ async def update_entity(
     if individual_updates:
         update_data["individual"] = individual_updates
     
-    return call_endpoint(f"/entities/{entity_id}", "PUT", data=update_data)
+    return await async_call_endpoint(f"/entities/{entity_id}", "PUT", data=update_data)
 
 # ===== ENTITY CONNECT ENDPOINTS =====
 
 @mcp.tool(name="create_entity_connect", description="Create a connect session to discover entity's liability accounts")
 async def create_entity_connect(
-    entity_id: Annotated[str, Field(description="The entity ID to connect")]
+    entity_id: Annotated[str, Field(description="The entity ID to connect")],
+    wait: WaitOption = False,
+    wait_timeout: WaitTimeoutOption = None,
 ) -> Dict:
     """Create a connect session to discover entity's liability accounts"""
-    return call_endpoint(f"/entities/{entity_id}/connect", "POST")
+    return await _create_job(f"/entities/{entity_id}/connect", wait, wait_timeout)
 
 @mcp.tool(name="retrieve_entity_connect", description="Retrieve a specific connect session")
 async def retrieve_entity_connect(
     entity_id: Annotated[str, Field(description="The entity ID")],
-    connect_id: Annotated[str, Field(description="The connect session ID")]
+    connect_id: Annotated[str, Field(description="The connect session ID")],
+    view: ViewOption = None,
+    fields: FieldsOption = None,
 ) -> Dict:
     """Retrieve a specific connect session"""
-    return call_endpoint(f"/entities/{entity_id}/connect/{connect_id}", "GET")
+    return shape_response(await async_call_endpoint(f"/entities/{entity_id}/connect/{connect_id}", "GET"), "connect", view, fields)
 
 @mcp.tool(name="list_entity_connects", description="List connects for an entity")
 async def list_entity_connects(
-    entity_id: Annotated[str, Field(description="The entity ID")]
+    entity_id: Annotated[str, Field(description="The entity ID")],
+    view: ViewOption = None,
+    fields: FieldsOption = None,
 ) -> Dict:
     """List all connects for a specific entity"""
-    return call_endpoint(f"/entities/{entity_id}/connect", "GET")
+    return shape_response(await async_call_endpoint(f"/entities/{entity_id}/connect", "GET"), "connect", view, fields)
 
 # ===== CREDIT SCORE ENDPOINTS =====
 
 @mcp.tool(name="create_credit_score", description="Get entity's credit score")
 async def create_credit_score(
-    entity_id: Annotated[str, Field(description="The entity ID")]
+    entity_id: Annotated[str, Field(description="The entity ID")],
+    wait: WaitOption = False,
+    wait_timeout: WaitTimeoutOption = None,
 ) -> Dict:
     """Create a credit score request for an entity"""
-    return call_endpoint(f"/entities/{entity_id}/credit_scores", "POST")
+    return await _create_job(f"/entities/{entity_id}/credit_scores", wait, wait_timeout)
 
 @mcp.tool(name="retrieve_credit_score", description="Retrieve a specific credit score")
 async def retrieve_credit_score(
     entity_id: Annotated[str, Field(description="The entity ID")],
-    credit_score_id: Annotated[str, Field(description="The credit score ID")]
+    credit_score_id: Annotated[str, Field(description="The credit score ID")],
+    view: ViewOption = None,
+    fields: FieldsOption = None,
 ) -> Dict:
     """Retrieve a specific credit score"""
-    return call_endpoint(f"/entities/{entity_id}/credit_scores/{credit_score_id}", "GET")
+    return shape_response(await async_call_endpoint(f"/entities/{entity_id}/credit_scores/{credit_score_id}", "GET"), "credit_score", view, fields)
 
 @mcp.tool(name="list_credit_scores", description="List credit scores for an entity")
 async def list_credit_scores(
-    entity_id: Annotated[str, Field(description="The entity ID")]
+    entity_id: Annotated[str, Field(description="The entity ID")],
+    view: ViewOption = None,
+    fields: FieldsOption = None,
 ) -> Dict:
     """List all credit scores for a specific entity"""
-    return call_endpoint(f"/entities/{entity_id}/credit_scores", "GET")
+    return shape_response(await async_call_endpoint(f"/entities/{entity_id}/credit_scores", "GET"), "credit_score", view, fields)
 
 # ===== ACCOUNT ENDPOINTS =====
 
@@ -232,15 +347,34 @@ async def create_ach_account(
             "type": account_type
         }
     }
-    return call_endpoint("/accounts", "POST", data=account_data)
+    return await async_call_endpoint("/accounts", "POST", data=account_data)
 
 @mcp.tool(name="create_liability_account", description="Create a liability account (credit card, loan, etc.)")
 async def create_liability_account(
     entity_id: Annotated[str, Field(description="The entity ID that owns this account")],
-    merchant_id: Annotated[str, Field(description="The merchant ID (e.g., mch_2)")],
-    account_number: Annotated[str, Field(description="The account number")]
-) -> Dict:
-    """Create a liability account"""
+    account_number: Annotated[str, Field(description="The account number")],
+    merchant_id: Annotated[Optional[str], Field(description="The merchant ID (e.g., mch_2)")] = None,
+    merchant_name: Annotated[Optional[str], Field(description="Merchant name to resolve when the merchant ID is unknown (e.g., Chase Sapphire)")] = None,
+) -> Dict:
+    """Create a liability account, resolving the merchant by name if no ID is given"""
+    if not merchant_id:
+        if not merchant_name:
+            return {"error": True, "message": "Either merchant_id or merchant_name is required"}
+        await merchant_catalog.ensure_loaded()
+        merchant, candidates = merchant_catalog.resolve(merchant_name)
+        if merchant is None:
+            if not candidates:
+                return {"error": True, "message": f"No merchant found matching '{merchant_name}'"}
+            return {
+                "error": True,
+                "message": f"'{merchant_name}' does not match one merchant confidently; pass merchant_id for one of the candidates",
+                "candidates": [
+                    {"id": c["id"], "name": c.get("name"), "type": c.get("type"), "score": c["score"]}
+                    for c in candidates
+                ],
+            }
+        merchant_id = merchant["id"]
+
     account_data = {
         "holder_id": entity_id,
         "liability": {
@@ -248,59 +382,63 @@ async def create_liability_account(
             "account_number": account_number
         }
     }
-    return call_endpoint("/accounts", "POST", data=account_data)
+    return await async_call_endpoint("/accounts", "POST", data=account_data)
 
 @mcp.tool(name="list_accounts", description="List all accounts")
 async def list_accounts(
     entity_id: Annotated[Optional[str], Field(description="Filter by entity ID")] = None,
     page_cursor: Annotated[Optional[str], Field(description="Cursor for pagination")] = None,
     page_limit: Annotated[Optional[int], Field(description="Number of accounts per page")] = None,
+    all_pages: Annotated[Optional[bool], Field(description="Follow page cursors and return every matching item in one call")] = False,
+    max_items: Annotated[Optional[int], Field(description="Maximum items to return when all_pages is set (default 1000, max 10000)")] = None,
+    max_bytes: MaxBytesOption = None,
+    view: ViewOption = None,
+    fields: FieldsOption = None,
+    count_by: Annotated[Optional[str], Field(description="Return counts grouped by this field (e.g., status) instead of items")] = None,
 ) -> Dict:
     """List all accounts with optional filters"""
     params = {}
     if entity_id:
         params["holder_id"] = entity_id
-    if page_cursor:
-        params["page[cursor]"] = page_cursor
-    if page_limit:
-        params["page[limit]"] = min(page_limit, 250)
-    
-    if params:
-        query_string = "&".join([f"{k}={v}" for k, v in params.items()])
-        endpoint = f"/accounts?{query_string}"
-    else:
-        endpoint = "/accounts"
-    
-    return call_endpoint(endpoint, "GET")
+
+    return await _list_resource("/accounts", "account", params, page_cursor, page_limit, all_pages, max_items, max_bytes, view, fields, count_by)
 
 @mcp.tool(name="retrieve_account", description="Retrieve a specific account by ID")
 async def retrieve_account(
-    account_id: Annotated[str, Field(description="The account ID to retrieve")]
+    account_id: Annotated[str, Field(description="The account ID to retrieve")],
+    view: ViewOption = None,
+    fields: FieldsOption = None,
 ) -> Dict:
     """Retrieve account details by ID"""
-    return call_endpoint(f"/accounts/{account_id}", "GET")
+    return shape_response(await async_call_endpoint(f"/accounts/{account_id}", "GET"), "account", view, fields)
 
 # ===== ACCOUNT UPDATES ENDPOINTS =====
 
 @mcp.tool(name="create_account_update", description="Create an account update to get real-time data")
 async def create_account_update(
-    account_id: Annotated[str, Field(description="The account ID to update")]
+    account_id: Annotated[str, Field(description="The account ID to update")],
+    wait: WaitOption = False,
+    wait_timeout: WaitTimeoutOption = None,
 ) -> Dict:
     """Create an update for real-time account data"""
-    return call_endpoint(f"/accounts/{account_id}/updates", "POST")
+    return await _create_job(f"/accounts/{account_id}/updates", wait, wait_timeout)
 
 @mcp.tool(name="retrieve_account_update", description="Retrieve a specific account update")
 async def retrieve_account_update(
     account_id: Annotated[str, Field(description="The account ID")],
-    update_id: Annotated[str, Field(description="The update ID")]
+    update_id: Annotated[str, Field(description="The update ID")],
+    view: ViewOption = None,
+    fields: FieldsOption = None,
 ) -> Dict:
     """Retrieve a specific account update"""
-    return call_endpoint(f"/accounts/{account_id}/updates/{update_id}", "GET")
+    return shape_response(await async_call_endpoint(f"/accounts/{account_id}/updates/{update_id}", "GET"), "account_update", view, fields)
 
 @mcp.tool(name="list_account_updates", description="List updates for an account")
 async def list_account_updates(
     account_id: Annotated[str, Field(description="The account ID")],
     page_limit: Annotated[Optional[int], Field(description="Number of updates per page")] = None,
+    view: ViewOption = None,
+    fields: FieldsOption = None,
 ) -> Dict:
     """List all updates for a specific account"""
     params = {}
@@ -309,31 +447,37 @@ async def list_account_updates(
     
     query_string = "&".join([f"{k}={v}" for k, v in params.items()]) if params else ""
     endpoint = f"/accounts/{account_id}/updates?{query_string}" if query_string else f"/accounts/{account_id}/updates"
-    return call_endpoint(endpoint, "GET")
+    return shape_response(await async_call_endpoint(endpoint, "GET"), "account_update", view, fields)
 
 # ===== BALANCE ENDPOINTS =====
 
 @mcp.tool(name="create_balance", description="Get real-time balance for an account")
 async def create_balance(
-    account_id: Annotated[str, Field(description="The account ID")]
+    account_id: Annotated[str, Field(description="The account ID")],
+    wait: WaitOption = False,
+    wait_timeout: WaitTimeoutOption = None,
 ) -> Dict:
     """Create a balance request to get real-time balance"""
-    return call_endpoint(f"/accounts/{account_id}/balances", "POST")
+    return await _create_job(f"/accounts/{account_id}/balances", wait, wait_timeout)
 
 @mcp.tool(name="retrieve_balance", description="Retrieve a specific balance")
 async def retrieve_balance(
     account_id: Annotated[str, Field(description="The account ID")],
-    balance_id: Annotated[str, Field(description="The balance ID")]
+    balance_id: Annotated[str, Field(description="The balance ID")],
+    view: ViewOption = None,
+    fields: FieldsOption = None,
 ) -> Dict:
     """Retrieve a specific balance"""
-    return call_endpoint(f"/accounts/{account_id}/balances/{balance_id}", "GET")
+    return shape_response(await async_call_endpoint(f"/accounts/{account_id}/balances/{balance_id}", "GET"), "balance", view, fields)
 
 @mcp.tool(name="list_balances", description="List balances for an account")
 async def list_balances(
-    account_id: Annotated[str, Field(description="The account ID")]
+    account_id: Annotated[str, Field(description="The account ID")],
+    view: ViewOption = None,
+    fields: FieldsOption = None,
 ) -> Dict:
     """List all balances for an account"""
-    return call_endpoint(f"/accounts/{account_id}/balances", "GET")
+    return shape_response(await async_call_endpoint(f"/accounts/{account_id}/balances", "GET"), "balance", view, fields)
 
 # ===== PAYMENT ENDPOINTS =====
 
@@ -344,6 +488,7 @@ async def create_payment(
     destination: Annotated[str, Field(description="Destination account ID (liability account)")],
     description: Annotated[str, Field(description="Payment description (max 10 characters)")],
     dry_run: Annotated[Optional[bool], Field(description="Simulate payment without processing")] = False,
+    idempotency_key: Annotated[Optional[str], Field(description="Idempotency key; pass the same key when retrying a payment. Without one, identical payments from the same caller within the server's idempotency window (default 120s) are sent once; pass a new key to deliberately repeat an identical payment")] = None,
 ) -> Dict:
     """Create a payment from source to destination account"""
     # Validate description length
@@ -362,41 +507,37 @@ async def create_payment(
     if dry_run:
         payment_data["dry_run"] = dry_run
     
-    return call_endpoint("/payments", "POST", data=payment_data)
+    return await async_call_endpoint("/payments", "POST", data=payment_data, idempotency_key=idempotency_key)
 
 @mcp.tool(name="list_payments", description="List all payments")
 async def list_payments(
     page_cursor: Annotated[Optional[str], Field(description="Cursor for pagination")] = None,
     page_limit: Annotated[Optional[int], Field(description="Number of payments per page")] = None,
+    all_pages: Annotated[Optional[bool], Field(description="Follow page cursors and return every matching item in one call")] = False,
+    max_items: Annotated[Optional[int], Field(description="Maximum items to return when all_pages is set (default 1000, max 10000)")] = None,
+    max_bytes: MaxBytesOption = None,
+    view: ViewOption = None,
+    fields: FieldsOption = None,
+    count_by: Annotated[Optional[str], Field(description="Return counts grouped by this field (e.g., status) instead of items")] = None,
 ) -> Dict:
     """List all payments"""
-    params = {}
-    if page_cursor:
-        params["page[cursor]"] = page_cursor
-    if page_limit:
-        params["page[limit]"] = min(page_limit, 250)
-    
-    if params:
-        query_string = "&".join([f"{k}={v}" for k, v in params.items()])
-        endpoint = f"/payments?{query_string}"
-    else:
-        endpoint = "/payments"
-    
-    return call_endpoint(endpoint, "GET")
+    return await _list_resource("/payments", "payment", {}, page_cursor, page_limit, all_pages, max_items, max_bytes, view, fields, count_by)
 
 @mcp.tool(name="retrieve_payment", description="Retrieve a specific payment by ID")
 async def retrieve_payment(
-    payment_id: Annotated[str, Field(description="The payment ID to retrieve")]
+    payment_id: Annotated[str, Field(description="The payment ID to retrieve")],
+    view: ViewOption = None,
+    fields: FieldsOption = None,
 ) -> Dict:
     """Retrieve payment details by ID"""
-    return call_endpoint(f"/payments/{payment_id}", "GET")
+    return shape_response(await async_call_endpoint(f"/payments/{payment_id}", "GET"), "payment", view, fields)
 
 @mcp.tool(name="delete_payment", description="Delete a payment")
 async def delete_payment(
     payment_id: Annotated[str, Field(description="The payment ID to delete")]
 ) -> Dict:
     """Delete a payment by ID"""
-    return call_endpoint(f"/payments/{payment_id}", "DELETE")
+    return await async_call_endpoint(f"/payments/{payment_id}", "DELETE")
 
 # ===== WEBHOOK ENDPOINTS =====
 
@@ -417,40 +558,72 @@ async def create_webhook(
     if hmac_secret:
         webhook_data["hmac_secret"] = hmac_secret
     
-    return call_endpoint("/webhooks", "POST", data=webhook_data)
+    return await async_call_endpoint("/webhooks", "POST", data=webhook_data)
 
 @mcp.tool(name="retrieve_webhook", description="Retrieve a specific webhook")
 async def retrieve_webhook(
-    webhook_id: Annotated[str, Field(description="The webhook ID to retrieve")]
+    webhook_id: Annotated[str, Field(description="The webhook ID to retrieve")],
+    view: ViewOption = None,
+    fields: FieldsOption = None,
 ) -> Dict:
     """Retrieve a webhook by ID"""
-    return call_endpoint(f"/webhooks/{webhook_id}", "GET")
+    return shape_response(await async_call_endpoint(f"/webhooks/{webhook_id}", "GET"), "webhook", view, fields)
 
 @mcp.tool(name="list_webhooks", description="List all webhooks")
-async def list_webhooks() -> Dict:
+async def list_webhooks(
+    view: ViewOption = None,
+    fields: FieldsOption = None,
+) -> Dict:
     """List all registered webhooks"""
-    return call_endpoint("/webhooks", "GET")
+    return shape_response(await async_call_endpoint("/webhooks", "GET"), "webhook", view, fields)
 
 @mcp.tool(name="delete_webhook", description="Delete a webhook")
 async def delete_webhook(
     webhook_id: Annotated[str, Field(description="The webhook ID to delete")]
 ) -> Dict:
     """Delete a webhook by ID"""
-    return call_endpoint(f"/webhooks/{webhook_id}", "DELETE")
+    return await async_call_endpoint(f"/webhooks/{webhook_id}", "DELETE")
 
 # ===== MERCHANT ENDPOINTS =====
 
 @mcp.tool(name="list_merchants", description="List all merchants")
-async def list_merchants() -> Dict:
+async def list_merchants(
+    view: ViewOption = None,
+    fields: FieldsOption = None,
+) -> Dict:
     """List all merchants (financial institutions)"""
-    return call_endpoint("/merchants", "GET")
+    return shape_response(await async_call_endpoint("/merchants", "GET"), "merchant", view, fields)
 
 @mcp.tool(name="retrieve_merchant", description="Retrieve a specific merchant")
 async def retrieve_merchant(
-    merchant_id: Annotated[str, Field(description="The merchant ID to retrieve")]
+    merchant_id: Annotated[str, Field(description="The merchant ID to retrieve")],
+    view: ViewOption = None,
+    fields: FieldsOption = None,
 ) -> Dict:
     """Retrieve merchant details by ID"""
-    return call_endpoint(f"/merchants/{merchant_id}", "GET")
+    return shape_response(await async_call_endpoint(f"/merchants/{merchant_id}", "GET"), "merchant", view, fields)
+
+@mcp.tool(name="search_merchants", description="Search merchants by name or provider ID and return the best matches")
+async def search_merchants(
+    query: Annotated[str, Field(description="Merchant name (fuzzy, e.g., Chase Sapphire) or provider ID (e.g., ins_3)")],
+    limit: Annotated[Optional[int], Field(description="Maximum number of matches to return (max 25)")] = 5,
+    merchant_type: Annotated[Optional[str], Field(description="Filter by type, e.g., credit_card, auto_loan, student_loan, mortgage")] = None,
+) -> Dict:
+    """Search the locally indexed merchant catalog instead of listing every merchant"""
+    await merchant_catalog.ensure_loaded()
+    matches = merchant_catalog.search(query, limit=min(limit or 5, 25), merchant_type=merchant_type)
+    return {
+        "data": [
+            {
+                "id": m["id"],
+                "name": m.get("name"),
+                "parent_name": m.get("parent_name"),
+                "type": m.get("type"),
+                "score": m["score"],
+            }
+            for m in matches
+        ]
+    }
 
 # ===== SUBSCRIPTION ENDPOINTS =====
 
@@ -460,7 +633,7 @@ async def create_entity_subscription(
     subscription_type: Annotated[str, Field(description="Subscription type: credit_score, connect, or attribute")]
 ) -> Dict:
     """Create a subscription for continuous updates on an entity"""
-    return call_endpoint(f"/entities/{entity_id}/subscriptions", "POST", data={"name": subscription_type})
+    return await async_call_endpoint(f"/entities/{entity_id}/subscriptions", "POST", data={"name": subscription_type})
 
 @mcp.tool(name="retrieve_entity_subscription", description="Retrieve a specific entity subscription")
 async def retrieve_entity_subscription(
@@ -468,14 +641,14 @@ async def retrieve_entity_subscription(
     subscription_id: Annotated[str, Field(description="The subscription ID")]
 ) -> Dict:
     """Retrieve a specific subscription"""
-    return call_endpoint(f"/entities/{entity_id}/subscriptions/{subscription_id}", "GET")
+    return await async_call_endpoint(f"/entities/{entity_id}/subscriptions/{subscription_id}", "GET")
 
 @mcp.tool(name="list_entity_subscriptions", description="List entity subscriptions")
 async def list_entity_subscriptions(
     entity_id: Annotated[str, Field(description="The entity ID")]
 ) -> Dict:
     """List all subscriptions for an entity"""
-    return call_endpoint(f"/entities/{entity_id}/subscriptions", "GET")
+    return await async_call_endpoint(f"/entities/{entity_id}/subscriptions", "GET")
 
 @mcp.tool(name="delete_entity_subscription", description="Delete an entity subscription")
 async def delete_entity_subscription(
@@ -483,7 +656,7 @@ async def delete_entity_subscription(
     subscription_id: Annotated[str, Field(description="The subscription ID to delete")]
 ) -> Dict:
     """Delete a subscription"""
-    return call_endpoint(f"/entities/{entity_id}/subscriptions/{subscription_id}", "DELETE")
+    return await async_call_endpoint(f"/entities/{entity_id}/subscriptions/{subscription_id}", "DELETE")
 
 @mcp.tool(name="create_account_subscription", description="Create a subscription for an account")
 async def create_account_subscription(
@@ -491,14 +664,14 @@ async def create_account_subscription(
     subscription_type: Annotated[str, Field(description="Subscription type: update, transaction, or balance")]
 ) -> Dict:
     """Create a subscription for continuous updates on an account"""
-    return call_endpoint(f"/accounts/{account_id}/subscriptions", "POST", data={"name": subscription_type})
+    return await async_call_endpoint(f"/accounts/{account_id}/subscriptions", "POST", data={"name": subscription_type})
 
 @mcp.tool(name="list_account_subscriptions", description="List account subscriptions")
 async def list_account_subscriptions(
     account_id: Annotated[str, Field(description="The account ID")]
 ) -> Dict:
     """List all subscriptions for an account"""
-    return call_endpoint(f"/accounts/{account_id}/subscriptions", "GET")
+    return await async_call_endpoint(f"/accounts/{account_id}/subscriptions", "GET")
 
 @mcp.tool(name="delete_account_subscription", description="Delete an account subscription")
 async def delete_account_subscription(
@@ -506,10 +679,262 @@ async def delete_account_subscription(
     subscription_id: Annotated[str, Field(description="The subscription ID to delete")]
 ) -> Dict:
     """Delete an account subscription"""
-    return call_endpoint(f"/accounts/{account_id}/subscriptions/{subscription_id}", "DELETE")
+    return await async_call_endpoint(f"/accounts/{account_id}/subscriptions/{subscription_id}", "DELETE")
+
+# ===== BATCH ENDPOINTS =====
+
+# Maximum number of ids accepted by a single batch tool call
+MAX_BATCH_IDS = 100
+
+async def _batch(ids: List[str], endpoint_template: str, resource: str, method: str = "GET",
+                 view: Optional[str] = None, fields: Optional[List[str]] = None) -> Dict:
+    """Fan out one request per unique id and fold the responses into a compact per-id map"""
+    unique_ids = list(dict.fromkeys(ids))
+    if len(unique_ids) > MAX_BATCH_IDS:
+        return {"error": True, "message": f"At most {MAX_BATCH_IDS} ids per batch call"}
+
+    responses = await batch_call_endpoint(
+        {obj_id: endpoint_template.format(id=obj_id) for obj_id in unique_ids}, method
+    )
+    results = {}
+    errors = {}
+    for obj_id, response in responses.items():
+        if not isinstance(response, dict) or response.get("error"):
+            errors[obj_id] = response.get("message") if isinstance(response, dict) else str(response)
+            continue
+        results[obj_id] = project(response.get("data", response), resource, view, fields)
+    return {"succeeded": len(results), "failed": len(errors), "results": results, "errors": errors}
+
+@mcp.tool(name="batch_retrieve_accounts", description="Retrieve many accounts by ID in one call")
+async def batch_retrieve_accounts(
+    account_ids: Annotated[List[str], Field(description="Account IDs to retrieve (max 100)")],
+    view: ViewOption = None,
+    fields: FieldsOption = None,
+) -> Dict:
+    """Retrieve accounts concurrently, reporting failures per ID"""
+    return await _batch(account_ids, "/accounts/{id}", "account", view=view, fields=fields)
+
+@mcp.tool(name="batch_retrieve_entities", description="Retrieve many entities by ID in one call")
+async def batch_retrieve_entities(
+    entity_ids: Annotated[List[str], Field(description="Entity IDs to retrieve (max 100)")],
+    view: ViewOption = None,
+    fields: FieldsOption = None,
+) -> Dict:
+    """Retrieve entities concurrently, reporting failures per ID"""
+    return await _batch(entity_ids, "/entities/{id}", "entity", view=view, fields=fields)
+
+@mcp.tool(name="batch_create_balances", description="Request real-time balances for many accounts in one call")
+async def batch_create_balances(
+    account_ids: Annotated[List[str], Field(description="Account IDs to request balances for (max 100)")]
+) -> Dict:
+    """Create balance requests concurrently, reporting failures per account ID"""
+    return await _batch(account_ids, "/accounts/{id}/balances", "balance", "POST")
+
+# ===== SNAPSHOT STORE =====
+
+# Seconds between background incremental syncs of the snapshot store, 0 to only sync on request
+STORE_SYNC_INTERVAL = float(os.getenv("METHOD_STORE_SYNC_SECONDS", "0"))
+
+@mcp.tool(name="sync_snapshot", description="Sync entities, accounts, payments and merchants into the server's local snapshot store")
+async def sync_snapshot(
+    collections: Annotated[Optional[List[Literal["entities", "accounts", "payments", "merchants"]]], Field(description="Collections to sync (default all)")] = None,
+    full: Annotated[Optional[bool], Field(description="Walk every object instead of only those created since the last sync")] = False,
+) -> Dict:
+    """Incrementally sync the local snapshot store, reporting fetched and written objects per collection"""
+    return await sync_store(collections, bool(full))
+
+# Resource name of each stored collection, for projection
+COLLECTION_RESOURCES = {"entities": "entity", "accounts": "account", "payments": "payment", "merchants": "merchant"}
+
+StoredCollection = Annotated[
+    Literal["entities", "accounts", "payments", "merchants"],
+    Field(description="Collection to query"),
+]
+WhereOption = Annotated[
+    Optional[Dict[str, Union[str, int, float, bool, None, List[Union[str, int, float]]]]],
+    Field(description="Field path -> value (or list of allowed values). Payments reach their accounts "
+                      "(source.holder_id, destination.liability.mch_id, destination.merchant.name); accounts reach "
+                      "holder.* and merchant.* (e.g., {\"status\": [\"pending\", \"processing\"]})"),
+]
+CreatedFromOption = Annotated[Optional[str], Field(description="Only objects created at or after this ISO date/time (e.g., 2024-05-01)")]
+CreatedToOption = Annotated[Optional[str], Field(description="Only objects created at or before this ISO date/time; a bare date includes the whole day")]
+
+@mcp.tool(name="query_snapshot", description="Find synced entities, accounts, payments or merchants matching filters, without calling the Method API")
+async def query_snapshot(
+    collection: StoredCollection,
+    where: WhereOption = None,
+    created_from: CreatedFromOption = None,
+    created_to: CreatedToOption = None,
+    order_by: Annotated[Optional[str], Field(description="Field path to sort by (default created_at)")] = None,
+    ascending: Annotated[Optional[bool], Field(description="Sort ascending instead of newest/largest first")] = False,
+    limit: Annotated[Optional[int], Field(description="Maximum objects to return (default 50, max 500)")] = 50,
+    view: ViewOption = None,
+    fields: FieldsOption = None,
+) -> Dict:
+    """Filter the local snapshot store; run sync_snapshot first so it is current"""
+    if api.snapshot_store is None:
+        return {"error": True, "message": "Snapshot store is disabled (METHOD_STORE_ENABLED=false)"}
+    try:
+        result = find_stored(api.snapshot_store, caller_credentials()[0], collection, where, created_from, created_to,
+                             order_by, not ascending, max(1, min(limit or 50, 500)))
+    except (QueryError, TenantError, sqlite3.Error) as e:
+        return {"error": True, "message": f"Query failed: {e}"}
+    resource = COLLECTION_RESOURCES[collection]
+    items = [project(json.loads(body), resource, view, fields) for body in result.pop("bodies")]
+    return dict(result, count=len(items), data=items)
+
+@mcp.tool(name="aggregate_snapshot", description="Count, sum, average, min or max synced Method objects grouped by fields, without calling the Method API")
+async def aggregate_snapshot(
+    collection: StoredCollection,
+    group_by: Annotated[Optional[List[str]], Field(description="Up to 3 field paths to group by, joins allowed (e.g., destination.merchant.name)")] = None,
+    metric: Annotated[Optional[Literal["count", "sum", "avg", "min", "max"]], Field(description="Aggregate to compute (default count)")] = "count",
+    value_field: Annotated[Optional[str], Field(description="Numeric field for sum/avg/min/max (e.g., amount)")] = None,
+    where: WhereOption = None,
+    created_from: CreatedFromOption = None,
+    created_to: CreatedToOption = None,
+    limit: Annotated[Optional[int], Field(description="Maximum groups to return, largest first (default 100)")] = 100,
+) -> Dict:
+    """Aggregate the local snapshot store and return only the grouped totals"""
+    if api.snapshot_store is None:
+        return {"error": True, "message": "Snapshot store is disabled (METHOD_STORE_ENABLED=false)"}
+    try:
+        return aggregate_stored(api.snapshot_store, caller_credentials()[0], collection, group_by, metric or "count",
+                                value_field, where, created_from, created_to, max(1, min(limit or 100, 1000)))
+    except (QueryError, TenantError, sqlite3.Error) as e:
+        return {"error": True, "message": f"Query failed: {e}"}
+
+# ===== WEBHOOK RECEIVER =====
+
+@mcp.custom_route("/webhooks/method", methods=["POST"])
+async def receive_webhook(request: Request) -> JSONResponse:
+    """Signed Method webhook events; enabled by setting METHOD_WEBHOOK_SECRET"""
+    if webhook_receiver is None:
+        return JSONResponse({"error": True, "message": "Webhook receiver is not enabled"}, status_code=404)
+    status_code, body = await webhook_receiver.handle(await request.body(), request.headers.get(SIGNATURE_HEADER))
+    return JSONResponse(body, status_code=status_code)
+
+# ===== SERVER STATS =====
+
+@mcp.custom_route("/stats", methods=["GET"])
+async def stats(request: Request) -> JSONResponse:
+    """Connection pool, tenant, response cache, scheduler, job poller, webhook, snapshot store, cassette, shared state and per-tool statistics"""
+    return JSONResponse({"worker": {"index": WORKER_INDEX, "pid": os.getpid()},
+                         "pool": get_pool_stats(), "tenants": get_tenant_stats(), "cache": get_cache_stats(),
+                         "scheduler": get_scheduler_stats(),
+                         "poller": job_poller.stats(),
+                         "webhooks": webhook_receiver.stats() if webhook_receiver else {"enabled": False},
+                         "store": get_store_stats(), "cassette": get_cassette_stats(),
+                         "shared": await get_shared_stats(),
+                         "tools": tool_metrics.summary() if tool_metrics else {"enabled": False}})
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> PlainTextResponse:
+    """Per-tool latency, payload, status code and cache hit metrics in the Prometheus text format"""
+    if tool_metrics is None:
+        return PlainTextResponse("# metrics disabled (METHOD_METRICS_ENABLED=false)\n", status_code=404)
+    if api.shared_state is None:
+        return PlainTextResponse(tool_metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+    # A scrape reaches any one worker, so it answers for all of them, each worker's series labelled with its index
+    families = publish_worker_metrics()
+    try:
+        published = await api.shared_state.metrics()
+    except SharedStateError:
+        published = {}
+    others = [f for worker, f in sorted(published.items()) if worker != str(WORKER_INDEX)]
+    return PlainTextResponse(render_families([families] + others), media_type="text/plain; version=0.0.4")
+
+# Address of the streamable-http endpoint; with METHOD_WORKERS above 1, that many worker processes share it
+SERVER_HOST = os.getenv("METHOD_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("METHOD_PORT", "8002"))
+WORKERS = int(os.getenv("METHOD_WORKERS", "1"))
+# Seconds between a worker's reloads of the merchant snapshot and store rows other workers wrote,
+# and between publishes of its tool metrics to the shared state
+WORKER_RELOAD_INTERVAL = float(os.getenv("METHOD_WORKER_RELOAD_SECONDS", "5"))
+
+# Index of this process among the workers, 0 in a single process
+WORKER_INDEX = 0
+
+def publish_worker_metrics() -> List[Dict]:
+    """Send this worker's tool metrics, labelled with its index, to the shared state; returns them"""
+    families = tool_metrics.families(labels=(("worker", WORKER_INDEX),))
+    api.shared_state.publish_metrics(WORKER_INDEX, families)
+    return families
+
+async def run_metrics_publish_loop(interval: float):
+    """Keep this worker's published tool metrics current until cancelled"""
+    while True:
+        publish_worker_metrics()
+        await asyncio.sleep(interval)
+
+async def serve(sock=None, shared_socket: str = None):
+    """
+    Run the streamable-http server with a pooled Method client for its lifetime
+    As a worker it accepts on sock, shared with the other workers, and keeps its
+    response cache, rate limit buckets and in-flight requests with the shared
+    state at shared_socket (see server/workers.py)
+    """
+    if shared_socket:
+        api.shared_state = SharedStateClient(shared_socket)
+        try:
+            await api.shared_state.connect()
+        except SharedStateError as e:
+            print(f"{e}; retrying on first use")
+        api.scheduler.shared_tokens = api.shared_state.reserve
+    open_http_client()
+    merchant_catalog.load_snapshot()
+    # With a cassette, only requests made on behalf of clients may reach Method, so a replay
+    # answers exactly what was recorded; background refreshes and syncs would use up recordings.
+    # Of several workers only the first refreshes and syncs; the others follow what it writes to disk
+    background = api.cassette is None and WORKER_INDEX == 0
+    tasks = [asyncio.create_task(api.tenant_pools.run_eviction_loop())]
+    if background:
+        tasks.append(asyncio.create_task(merchant_catalog.run_refresh_loop()))
+    elif WORKER_INDEX > 0:
+        tasks.append(asyncio.create_task(merchant_catalog.run_reload_loop(WORKER_RELOAD_INTERVAL)))
+    store = api.snapshot_store
+    if store is not None:
+        store.open()
+        print(f"Loaded {store.count()} stored Method objects in {store.load_seconds:.3f}s")
+        if STORE_SYNC_INTERVAL > 0 and background:
+            tasks.append(asyncio.create_task(run_sync_loop(STORE_SYNC_INTERVAL)))
+        if WORKERS > 1:
+            tasks.append(asyncio.create_task(run_store_reload_loop(WORKER_RELOAD_INTERVAL)))
+    if api.shared_state is not None and tool_metrics is not None:
+        tasks.append(asyncio.create_task(run_metrics_publish_loop(WORKER_RELOAD_INTERVAL)))
+    try:
+        if sock is None:
+            await mcp.run_async(transport="streamable-http", host=SERVER_HOST, port=SERVER_PORT)
+        else:
+            import uvicorn
+            # Consecutive requests of one MCP session may reach different workers, so none keeps session state
+            app = mcp.http_app(transport="streamable-http", stateless_http=True)
+            await uvicorn.Server(uvicorn.Config(app, log_level="warning", timeout_graceful_shutdown=5)).serve(
+                sockets=[sock])
+    finally:
+        for task in tasks:
+            task.cancel()
+        if store is not None:
+            store.close()
+        await close_http_client()
+        if api.cassette is not None:
+            api.cassette.close()
+        if api.shared_state is not None:
+            await api.shared_state.close()
+
+def run_worker(sock, shared_socket: str, index: int):
+    """Entry point of one worker process of a multi-worker server"""
+    global WORKER_INDEX
+    WORKER_INDEX = index
+    asyncio.run(serve(sock, shared_socket))
 
 def main():
-    mcp.run(transport="streamable-http", port=8002)
+    if WORKERS > 1 and api.cassette is not None:
+        # Workers would each truncate or replay the same file
+        raise SystemExit("METHOD_CASSETTE cannot be used with METHOD_WORKERS above 1")
+    if WORKERS > 1:
+        run_workers(run_worker, WORKERS, SERVER_HOST, SERVER_PORT, os.getenv("METHOD_SHARED_SOCKET"))
+    else:
+        asyncio.run(serve())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
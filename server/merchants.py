@@ -0,0 +1,218 @@
+import asyncio
+import difflib
+import heapq
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from server.api import async_call_endpoint
+from server.scheduler import PRIORITY_BULK
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "method-fi-mcp", "merchants.json")
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# A name resolves on its own only when the best match scores at least this
+# much and beats the runner-up by the margin; otherwise the caller has to pick
+RESOLVE_MIN_SCORE = 0.7
+RESOLVE_MIN_MARGIN = 0.1
+
+
+def _tokens(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+class MerchantCatalog:
+    """
+    In-memory copy of the Method merchant list, indexed by name tokens
+    (with prefixes), provider ids and merchant type.
+    The list is loaded once from an on-disk snapshot or the API and
+    refreshed in the background.
+    """
+
+    def __init__(self, snapshot_path: str = DEFAULT_SNAPSHOT_PATH, refresh_interval: float = 6 * 60 * 60):
+        self.snapshot_path = snapshot_path
+        self.refresh_interval = refresh_interval
+        self.fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self._build_index([])
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    @property
+    def is_stale(self) -> bool:
+        return time.time() - self.fetched_at > self.refresh_interval
+
+    def _build_index(self, merchants: List[Dict]):
+        by_id = {}
+        by_prefix: Dict[str, Set[str]] = defaultdict(set)
+        by_token: Dict[str, Set[str]] = defaultdict(set)
+        by_provider_id = {}
+        by_type: Dict[str, Set[str]] = defaultdict(set)
+        names = {}
+
+        for merchant in merchants:
+            mch_id = merchant.get("id")
+            if not mch_id:
+                continue
+            by_id[mch_id] = merchant
+            name = merchant.get("name") or ""
+            names[mch_id] = (" ".join(_tokens(name)), len(_tokens(name)))
+            for token in set(_tokens(name) + _tokens(merchant.get("parent_name"))):
+                by_token[token].add(mch_id)
+                for end in range(2, len(token) + 1):
+                    by_prefix[token[:end]].add(mch_id)
+            for provider_ids in (merchant.get("provider_ids") or {}).values():
+                for provider_id in provider_ids or []:
+                    by_provider_id[str(provider_id).lower()] = mch_id
+            if merchant.get("type"):
+                by_type[merchant["type"]].add(mch_id)
+
+        self.by_id = by_id
+        self._by_prefix = dict(by_prefix)
+        self._by_token = dict(by_token)
+        self._by_provider_id = by_provider_id
+        self._by_type = dict(by_type)
+        self._names = names
+        self._vocabulary: Dict[str, List[str]] = defaultdict(list)
+        for token in by_token:
+            self._vocabulary[token[0]].append(token)
+        self._close_tokens: Dict[str, List[str]] = {}
+
+    def load(self, merchants: List[Dict], fetched_at: Optional[float] = None):
+        """Replace the catalog contents and rebuild the index"""
+        self._build_index(merchants)
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+    def load_snapshot(self) -> bool:
+        """Warm the catalog from the on-disk snapshot, if there is one"""
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return False
+        self.load(snapshot.get("merchants", []), snapshot.get("fetched_at", 0.0))
+        return True
+
+    def save_snapshot(self):
+        os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+        # Per process, so workers refreshing at the same time never write into one file
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"fetched_at": self.fetched_at, "merchants": list(self.by_id.values())}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.snapshot_path)
+
+    async def refresh(self) -> bool:
+        """Fetch the merchant list from Method, rebuild the index and persist a snapshot"""
+        async with self._lock:
+            response = await async_call_endpoint("/merchants", "GET", priority=PRIORITY_BULK)
+            if not isinstance(response, dict) or response.get("error"):
+                return False
+            self.load(response.get("data") or [])
+            try:
+                self.save_snapshot()
+            except OSError as e:
+                print(f"Could not write merchant snapshot: {e}")
+            return True
+
+    async def ensure_loaded(self):
+        if not self.by_id and not self.load_snapshot():
+            await self.refresh()
+
+    async def run_refresh_loop(self):
+        """Keep the catalog fresh until cancelled"""
+        while True:
+            if not self.by_id or self.is_stale:
+                await self.refresh()
+            delay = max(self.refresh_interval - (time.time() - self.fetched_at), 60)
+            await asyncio.sleep(delay)
+
+    def _snapshot_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.snapshot_path)
+        except OSError:
+            return None
+
+    async def run_reload_loop(self, interval: float):
+        """Follow the snapshot kept fresh by another process, reloading it whenever it changes, until cancelled"""
+        modified = self._snapshot_mtime()
+        while True:
+            await asyncio.sleep(interval)
+            mtime = self._snapshot_mtime()
+            if mtime is not None and mtime != modified and self.load_snapshot():
+                modified = mtime
+
+    def _closest_tokens(self, token: str) -> List[str]:
+        # Typo tolerance: closest known tokens sharing the first letter, memoized per index
+        if token not in self._close_tokens:
+            self._close_tokens[token] = difflib.get_close_matches(
+                token, self._vocabulary.get(token[0], []), n=3, cutoff=0.75
+            )
+        return self._close_tokens[token]
+
+    def _candidates(self, query_tokens: List[str]) -> Dict[str, float]:
+        scores: Dict[str, float] = defaultdict(float)
+        for token in query_tokens:
+            exact = self._by_token.get(token, set())
+            for mch_id in exact:
+                scores[mch_id] += 1.0
+            partial = self._by_prefix.get(token, set()) - exact
+            for mch_id in partial:
+                scores[mch_id] += 0.7
+            if not exact and not partial:
+                for close in self._closest_tokens(token):
+                    for mch_id in self._by_token[close]:
+                        scores[mch_id] += 0.5
+        return scores
+
+    def search(self, query: str, limit: int = 5, merchant_type: Optional[str] = None) -> List[Dict]:
+        """Top matches for a merchant name or provider id, best first"""
+        normalized = query.strip().lower()
+        provider_match = self._by_provider_id.get(normalized)
+        if provider_match:
+            return [dict(self.by_id[provider_match], score=1.0)]
+
+        query_tokens = _tokens(query)
+        if not query_tokens:
+            return []
+        allowed = self._by_type.get(merchant_type, set()) if merchant_type else None
+
+        full_query = " ".join(query_tokens)
+        ranked = []
+        for mch_id, score in self._candidates(query_tokens).items():
+            if allowed is not None and mch_id not in allowed:
+                continue
+            name, name_length = self._names[mch_id]
+            score = score / len(query_tokens)
+            if name == full_query:
+                score += 1.0
+            # Prefer tighter names when several share the matched tokens
+            score -= 0.01 * name_length
+            ranked.append((score, mch_id))
+
+        best = heapq.nsmallest(limit, ranked, key=lambda item: (-item[0], item[1]))
+        return [dict(self.by_id[mch_id], score=round(score, 3)) for score, mch_id in best]
+
+    def resolve(self, name: str, merchant_type: Optional[str] = None) -> Tuple[Optional[Dict], List[Dict]]:
+        """
+        (match, candidates) for a merchant name. match is None unless the best
+        candidate is a confident, unambiguous match; candidates are the top
+        matches, best first, for the caller to choose from.
+        """
+        candidates = self.search(name, limit=5, merchant_type=merchant_type)
+        if not candidates or candidates[0]["score"] < RESOLVE_MIN_SCORE:
+            return None, candidates
+        if len(candidates) > 1 and candidates[0]["score"] - candidates[1]["score"] < RESOLVE_MIN_MARGIN:
+            return None, candidates
+        return candidates[0], candidates
+
+
+def catalog_from_env() -> MerchantCatalog:
+    return MerchantCatalog(
+        snapshot_path=os.getenv("METHOD_MERCHANT_SNAPSHOT", DEFAULT_SNAPSHOT_PATH),
+        refresh_interval=float(os.getenv("METHOD_MERCHANT_REFRESH_SECONDS", str(6 * 60 * 60))),
+    )
@@ -0,0 +1,268 @@
+import bisect
+import contextvars
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastmcp.server.middleware import Middleware
+
+# Latency buckets in seconds, from cache hits to slow upstream calls with retries
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Payload buckets in bytes, from ids_only answers to unprojected full pages
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _load_tracer():
+    """OpenTelemetry tracer when the SDK is installed and METHOD_OTEL_ENABLED is set, else None"""
+    if os.getenv("METHOD_OTEL_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        print("METHOD_OTEL_ENABLED is set but opentelemetry is not installed; spans are disabled")
+        return None
+    return trace.get_tracer("method-fi-mcp")
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile, None when empty"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class CallStats:
+    """What one tool call did upstream, filled in by server.api while the call runs"""
+
+    __slots__ = ("upstream_seconds", "upstream_requests", "status_codes", "cache_hits")
+
+    def __init__(self):
+        self.upstream_seconds = 0.0
+        self.upstream_requests = 0
+        self.status_codes: Dict[str, int] = defaultdict(int)
+        self.cache_hits: Dict[str, int] = defaultdict(int)
+
+
+_current_call: contextvars.ContextVar[Optional[CallStats]] = contextvars.ContextVar("method_tool_call", default=None)
+
+
+def record_upstream(seconds: float, status_code: Any):
+    """Attribute one upstream HTTP attempt (status code, or 'error' for transport failures) to the running tool"""
+    call = _current_call.get()
+    if call is not None:
+        call.upstream_seconds += seconds
+        call.upstream_requests += 1
+        call.status_codes[str(status_code)] += 1
+
+
+def record_cache_hit(source: str):
+    """Attribute a response served without an upstream request (cache, store, coalesced) to the running tool"""
+    call = _current_call.get()
+    if call is not None:
+        call.cache_hits[source] += 1
+
+
+class _ToolSeries:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.duration = Histogram(LATENCY_BUCKETS)
+        self.upstream = Histogram(LATENCY_BUCKETS)
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.request_bytes = 0
+        self.upstream_requests = 0
+        self.status_codes: Dict[str, int] = defaultdict(int)
+        self.cache_hits: Dict[str, int] = defaultdict(int)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class ToolMetrics:
+    """Per-tool latency, payload, status code and cache hit series"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._series: Dict[str, _ToolSeries] = defaultdict(_ToolSeries)
+
+    def observe(self, tool: str, duration: float, request_bytes: int, response_bytes: int,
+                error: bool, call: CallStats):
+        series = self._series[tool]
+        series.calls += 1
+        series.errors += int(error)
+        series.duration.observe(duration)
+        series.upstream.observe(call.upstream_seconds)
+        series.response_bytes.observe(response_bytes)
+        series.request_bytes += request_bytes
+        series.upstream_requests += call.upstream_requests
+        for code, count in call.status_codes.items():
+            series.status_codes[code] += count
+        for source, count in call.cache_hits.items():
+            series.cache_hits[source] += count
+
+    def summary(self) -> Dict:
+        """Per-tool totals and approximate percentiles, heaviest total wall time first"""
+        tools = {}
+        for tool, s in sorted(self._series.items(), key=lambda item: -item[1].duration.sum):
+            tools[tool] = {
+                "calls": s.calls,
+                "errors": s.errors,
+                "total_seconds": round(s.duration.sum, 4),
+                "p50_seconds": s.duration.quantile(0.5),
+                "p95_seconds": s.duration.quantile(0.95),
+                "upstream_seconds": round(s.upstream.sum, 4),
+                "upstream_requests": s.upstream_requests,
+                "request_bytes": s.request_bytes,
+                "response_bytes": int(s.response_bytes.sum),
+                "status_codes": dict(s.status_codes),
+                "cache_hits": dict(s.cache_hits),
+            }
+        return tools
+
+    def families(self, labels: Tuple[Tuple[str, Any], ...] = ()) -> List[Dict]:
+        """
+        Every metric family as {"name", "help", "type", "samples"}, samples being
+        exposition lines; labels are added to every sample (e.g. the worker index)
+        """
+        families: List[Dict] = []
+        extra = "".join(f',{key}="{_label(str(val))}"' for key, val in labels)
+
+        def histogram(name: str, help_text: str, unit_attr: str):
+            samples = []
+            for tool, series in sorted(self._series.items()):
+                h: Histogram = getattr(series, unit_attr)
+                tool_label = f'tool="{_label(tool)}"{extra}'
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    samples.append(f'{name}_bucket{{{tool_label},le="{bound}"}} {cumulative}')
+                samples.append(f'{name}_bucket{{{tool_label},le="+Inf"}} {h.count}')
+                samples.append(f'{name}_sum{{{tool_label}}} {h.sum}')
+                samples.append(f'{name}_count{{{tool_label}}} {h.count}')
+            families.append({"name": name, "help": help_text, "type": "histogram", "samples": samples})
+
+        def counter(name: str, help_text: str, values):
+            samples = []
+            for series_labels, value in values:
+                rendered = ",".join(f'{key}="{_label(str(val))}"' for key, val in series_labels)
+                samples.append(f"{name}{{{rendered}{extra}}} {value}")
+            families.append({"name": name, "help": help_text, "type": "counter", "samples": samples})
+
+        series = sorted(self._series.items())
+        counter("method_mcp_tool_calls_total", "Tool calls", [((("tool", t),), s.calls) for t, s in series])
+        counter("method_mcp_tool_errors_total", "Tool calls that returned an error",
+                [((("tool", t),), s.errors) for t, s in series])
+        histogram("method_mcp_tool_duration_seconds", "Wall time of a tool call", "duration")
+        histogram("method_mcp_tool_upstream_seconds", "Time a tool call spent in Method API HTTP requests, summed over concurrent requests", "upstream")
+        histogram("method_mcp_tool_response_bytes", "Size of a tool result's content", "response_bytes")
+        counter("method_mcp_tool_request_bytes_total", "Encoded size of tool arguments",
+                [((("tool", t),), s.request_bytes) for t, s in series])
+        counter("method_mcp_upstream_responses_total", "Method API responses by status code",
+                [((("tool", t), ("status", code)), n) for t, s in series for code, n in sorted(s.status_codes.items())])
+        counter("method_mcp_cache_hits_total", "Responses served without an upstream request",
+                [((("tool", t), ("source", src)), n) for t, s in series for src, n in sorted(s.cache_hits.items())])
+        return families
+
+    def render_prometheus(self) -> str:
+        """All series in the Prometheus text exposition format"""
+        return render_families([self.families()])
+
+
+def render_families(sources: List[List[Dict]]) -> str:
+    """Metric families of one or more processes as one exposition, each family's samples together"""
+    merged: Dict[str, Dict] = {}
+    for families in sources:
+        for family in families:
+            entry = merged.setdefault(family["name"], dict(family, samples=[]))
+            entry["samples"].extend(family["samples"])
+    lines: List[str] = []
+    for family in merged.values():
+        lines.append(f"# HELP {family['name']} {family['help']}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        lines.extend(family["samples"])
+    return "\n".join(lines) + "\n"
+
+
+def _is_error(result) -> bool:
+    structured = getattr(result, "structured_content", None)
+    if isinstance(structured, dict):
+        if structured.get("error"):
+            return True
+        inner = structured.get("result")
+        return isinstance(inner, dict) and bool(inner.get("error"))
+    return False
+
+
+def _content_bytes(result) -> int:
+    """Size of a tool result's content, counting text blocks by their text so nothing is encoded twice"""
+    size = 0
+    for block in getattr(result, "content", None) or []:
+        text = getattr(block, "text", None)
+        size += len(text) if isinstance(text, str) else len(block.model_dump_json())
+    return size
+
+
+class MetricsMiddleware(Middleware):
+    """Records a ToolMetrics observation (and an OpenTelemetry span, if enabled) for every tool call"""
+
+    def __init__(self, metrics: ToolMetrics, tracer=None):
+        self.metrics = metrics
+        self.tracer = tracer
+
+    async def on_call_tool(self, context, call_next):
+        tool = context.message.name
+        request_bytes = len(json.dumps(context.message.arguments or {}, default=str))
+        call = CallStats()
+        token = _current_call.set(call)
+        span = self.tracer.start_span(f"tool {tool}") if self.tracer is not None else None
+        start = time.perf_counter()
+        result = None
+        error = True
+        try:
+            result = await call_next(context)
+            error = _is_error(result)
+            return result
+        finally:
+            duration = time.perf_counter() - start
+            _current_call.reset(token)
+            response_bytes = _content_bytes(result)
+            self.metrics.observe(tool, duration, request_bytes, response_bytes, error, call)
+            if span is not None:
+                span.set_attribute("mcp.tool", tool)
+                span.set_attribute("mcp.error", error)
+                span.set_attribute("mcp.request_bytes", request_bytes)
+                span.set_attribute("mcp.response_bytes", response_bytes)
+                span.set_attribute("method.upstream_requests", call.upstream_requests)
+                span.set_attribute("method.upstream_seconds", call.upstream_seconds)
+                span.end()
+
+
+def metrics_from_env() -> Tuple[Optional[ToolMetrics], Optional[MetricsMiddleware]]:
+    """The metrics registry and its middleware, (None, None) when METHOD_METRICS_ENABLED is false"""
+    if os.getenv("METHOD_METRICS_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None, None
+    metrics = ToolMetrics()
+    return metrics, MetricsMiddleware(metrics, _load_tracer())
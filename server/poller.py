@@ -0,0 +1,145 @@
+import asyncio
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from server.api import async_call_endpoint, caller_key
+
+# Statuses after which a balance, update, connect or credit score no longer changes
+TERMINAL_STATUSES = {"completed", "failed", "canceled", "cancelled", "expired"}
+
+
+def job_status(response) -> Optional[str]:
+    """Status of the resource in a Method response, None for errors or unknown shapes"""
+    if not isinstance(response, dict) or response.get("error"):
+        return None
+    data = response.get("data")
+    return data.get("status") if isinstance(data, dict) else None
+
+
+def is_terminal(response) -> bool:
+    """True when polling cannot change the outcome: a terminal status or an error"""
+    if not isinstance(response, dict) or response.get("error"):
+        return True
+    return job_status(response) in TERMINAL_STATUSES
+
+
+class _Job:
+    def __init__(self, deadline: float, last):
+        self.started = time.monotonic()
+        self.deadline = deadline
+        self.last = last
+        self.polls = 0
+        # Seconds from the start to the last poll that still found the job running
+        self.pending_for = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+
+class JobPoller:
+    """
+    Polls long-running Method resources until they reach a terminal status.
+
+    Waiters on the same resource share one polling loop, which runs until the
+    latest of their deadlines. The first poll waits about as long as jobs of
+    the same kind (balances, updates, ...) recently took, initial_delay until
+    one has finished, since polling a job that cannot be done yet only spends
+    rate limit. A job still running by then is probably close to done, so
+    the next poll follows after a quarter of that wait (at least min_delay),
+    and delays grow by `backoff` per attempt from there up to max_delay.
+    """
+
+    def __init__(self,
+                 initial_delay: float = 1.5,
+                 min_delay: float = 0.25,
+                 max_delay: float = 5.0,
+                 backoff: float = 1.5,
+                 max_timeout: float = 120.0):
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.max_timeout = max_timeout
+        self._jobs: Dict[Tuple[str, str], _Job] = {}
+        # Estimated seconds until a job of each kind finishes, learned from finished jobs
+        self._typical: Dict[str, float] = {}
+        self.counters = {"waits": 0, "shared_waits": 0, "polls": 0, "completed": 0, "timeouts": 0}
+
+    def _learn(self, kind: str, job: _Job):
+        elapsed = time.monotonic() - job.started
+        if job.polls == 1:
+            # Done at the first poll: it may have finished well before, so probe a little earlier next time
+            self._typical[kind] = max(elapsed * 0.9, 0.1)
+        else:
+            # Finished between the last poll that found it running and this one
+            self._typical[kind] = (job.pending_for + elapsed) / 2
+
+    async def _run(self, endpoint: str, job: _Job):
+        kind = endpoint.rstrip("/").split("/")[-2]
+        delay = min(self._typical.get(kind, self.initial_delay), self.max_delay)
+        while True:
+            remaining = job.deadline - time.monotonic()
+            if remaining <= 0:
+                return job.last
+            await asyncio.sleep(min(delay, remaining))
+            # Bypass the response cache: a cached pending copy would hide the transition
+            job.last = await async_call_endpoint(endpoint, "GET", use_cache=False)
+            job.polls += 1
+            self.counters["polls"] += 1
+            if is_terminal(job.last):
+                if job_status(job.last) is not None:
+                    self._learn(kind, job)
+                return job.last
+            job.pending_for = time.monotonic() - job.started
+            delay = max(delay * 0.25, self.min_delay) if job.polls == 1 else min(delay * self.backoff, self.max_delay)
+
+    async def wait(self, endpoint: str, timeout: float = 30.0, initial=None) -> Dict:
+        """
+        Wait for the resource at endpoint to finish, at most timeout seconds
+        initial is the response already in hand (usually from the create call); if it
+        is terminal no request is made
+        Returns the last response seen, with timed_out set when the job was still running
+        """
+        self.counters["waits"] += 1
+        if initial is not None and is_terminal(initial):
+            self.counters["completed"] += 1
+            return initial
+
+        timeout = max(0.0, min(timeout, self.max_timeout))
+        deadline = time.monotonic() + timeout
+        # Jobs are shared per caller: the polling task runs with the first waiter's credentials
+        key = (caller_key(), endpoint)
+        job = self._jobs.get(key)
+        if job is None:
+            job = self._jobs[key] = _Job(deadline, initial)
+            job.task = asyncio.ensure_future(self._run(endpoint, job))
+            job.task.add_done_callback(lambda _: self._jobs.pop(key, None))
+        else:
+            self.counters["shared_waits"] += 1
+            job.deadline = max(job.deadline, deadline)
+
+        try:
+            response = await asyncio.wait_for(asyncio.shield(job.task), timeout)
+        except asyncio.TimeoutError:
+            response = job.last
+
+        if is_terminal(response):
+            self.counters["completed"] += 1
+            return response
+        self.counters["timeouts"] += 1
+        result = dict(response) if isinstance(response, dict) else {"data": response}
+        result["timed_out"] = True
+        return result
+
+    def stats(self) -> Dict:
+        polled = self.counters["waits"] - self.counters["shared_waits"]
+        return dict(self.counters, active_jobs=len(self._jobs),
+                    polls_per_wait=round(self.counters["polls"] / polled, 2) if polled else 0.0,
+                    typical_seconds={kind: round(seconds, 3) for kind, seconds in self._typical.items()})
+
+
+def poller_from_env() -> JobPoller:
+    return JobPoller(
+        initial_delay=float(os.getenv("METHOD_POLL_INITIAL_DELAY", "1.5")),
+        max_delay=float(os.getenv("METHOD_POLL_MAX_DELAY", "5")),
+        max_timeout=float(os.getenv("METHOD_POLL_MAX_TIMEOUT", "120")),
+    )
@@ -0,0 +1,96 @@
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def get_path(obj: Any, path: str) -> Any:
+    """Read a dotted path (e.g. liability.mch_id) from a nested dict, None if absent"""
+    for part in path.split("."):
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(part)
+    return obj
+
+
+def select_fields(obj: Dict, fields: List[str]) -> Dict:
+    """Keep only the given dotted paths of obj, preserving nesting"""
+    selected: Dict = {}
+    for path in fields:
+        value = get_path(obj, path)
+        if value is None:
+            continue
+        target = selected
+        parts = path.split(".")
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return selected
+
+
+def count_by(items: Iterable[Dict], path: str) -> Dict[str, int]:
+    """Count items per value of a dotted path"""
+    return dict(Counter(str(get_path(item, path)) for item in items))
+
+
+# ===== VIEWS =====
+
+VIEWS = ("summary", "ids_only", "full")
+
+# Fields kept by the summary view of each resource; dotted paths reach into nested objects
+SUMMARY_FIELDS: Dict[str, List[str]] = {
+    "entity": ["id", "type", "status", "individual.first_name", "individual.last_name", "individual.email",
+               "corporation.name", "created_at"],
+    "account": ["id", "holder_id", "type", "status", "liability.mch_id", "liability.name", "liability.type",
+                "liability.mask", "ach.type", "ach.routing", "created_at"],
+    "payment": ["id", "source", "destination", "amount", "description", "status", "created_at"],
+    "merchant": ["id", "name", "parent_name", "type"],
+    "webhook": ["id", "type", "url", "status"],
+    "balance": ["id", "account_id", "status", "amount", "error"],
+    "account_update": ["id", "account_id", "status", "source", "error", "created_at"],
+    "credit_score": ["id", "entity_id", "status", "scores", "error", "created_at"],
+    "connect": ["id", "entity_id", "status", "accounts", "error", "created_at"],
+}
+
+ID_FIELDS = ["id"]
+
+
+def drop_nulls(obj: Any) -> Any:
+    """Recursively remove None values (and the empty containers they leave) from dicts"""
+    if isinstance(obj, dict):
+        cleaned = {}
+        for key, value in obj.items():
+            value = drop_nulls(value)
+            if value is None or value == {}:
+                continue
+            cleaned[key] = value
+        return cleaned
+    if isinstance(obj, list):
+        return [drop_nulls(item) for item in obj]
+    return obj
+
+
+def project(obj: Any, resource: str, view: Optional[str] = None, fields: Optional[List[str]] = None) -> Any:
+    """Project one Method object: explicit fields win over the view, full keeps everything"""
+    if not isinstance(obj, dict):
+        return obj
+    if fields:
+        return select_fields(obj, fields)
+    if view == "ids_only":
+        return select_fields(obj, ID_FIELDS)
+    if view == "summary":
+        return select_fields(obj, SUMMARY_FIELDS.get(resource, ID_FIELDS))
+    return drop_nulls(obj)
+
+
+def shape_response(response: Any, resource: str, view: Optional[str] = None, fields: Optional[List[str]] = None) -> Any:
+    """
+    Apply a view or field selection to a Method response and drop nulls.
+    Error dicts pass through untouched; the success/message envelope is dropped.
+    """
+    if not isinstance(response, dict) or response.get("error") or "data" not in response:
+        return response
+    data = response["data"]
+    if isinstance(data, list):
+        data = [project(item, resource, view, fields) for item in data]
+    else:
+        data = project(data, resource, view, fields)
+    return {"data": data}
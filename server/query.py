@@ -0,0 +1,187 @@
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.store import SnapshotStore, tenant_id
+
+QUERY_COLLECTIONS = ("entities", "accounts", "payments", "merchants")
+
+# Dotted paths answered from an indexed column instead of the stored JSON
+INDEXED_PATHS: Dict[str, Dict[str, str]] = {
+    "entities": {"id": "id", "status": "status", "created_at": "created_at", "updated_at": "updated_at"},
+    "accounts": {"id": "id", "holder_id": "holder_id", "status": "status", "liability.mch_id": "mch_id",
+                 "created_at": "created_at", "updated_at": "updated_at"},
+    "payments": {"id": "id", "status": "status", "source": "source", "destination": "destination",
+                 "created_at": "created_at", "updated_at": "updated_at"},
+    "merchants": {"id": "id"},
+}
+
+# Joined objects reachable from a collection: path prefix -> (target collection, local key path)
+JOINS: Dict[str, Dict[str, Tuple[str, str]]] = {
+    "payments": {"source": ("accounts", "source"), "destination": ("accounts", "destination")},
+    "accounts": {"holder": ("entities", "holder_id"), "merchant": ("merchants", "liability.mch_id")},
+}
+
+METRICS = ("count", "sum", "avg", "min", "max")
+
+_PATH_RE = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
+
+
+class QueryError(ValueError):
+    """Raised for queries that cannot be answered, e.g. an invalid field path"""
+
+
+class _Query:
+    """Builds one SELECT over the objects table, adding a LEFT JOIN per joined prefix used"""
+
+    def __init__(self, collection: str):
+        if collection not in QUERY_COLLECTIONS:
+            raise QueryError(f"Unknown collection '{collection}'")
+        self.collection = collection
+        self.joins: List[str] = []
+        self.collections = {collection}
+        self._aliases: Dict[Tuple[str, ...], Tuple[str, str]] = {(): ("o", collection)}
+
+    @staticmethod
+    def _column(alias: str, collection: str, path: str) -> str:
+        column = INDEXED_PATHS.get(collection, {}).get(path)
+        if column:
+            return f"{alias}.{column}"
+        return f"json_extract({alias}.body, '$.{path}')"
+
+    def column(self, path: str) -> str:
+        """SQL expression for a dotted field path, joining related objects as needed"""
+        if not path or not _PATH_RE.match(path):
+            raise QueryError(f"Invalid field path '{path}'")
+        parts = path.split(".")
+        prefix: Tuple[str, ...] = ()
+        alias, collection = self._aliases[prefix]
+        while len(parts) > 1 and parts[0] in JOINS.get(collection, {}):
+            target, key = JOINS[collection][parts[0]]
+            prefix += (parts[0],)
+            if prefix not in self._aliases:
+                joined = f"j{len(self._aliases)}"
+                self.joins.append(
+                    f"LEFT JOIN objects {joined} ON {joined}.tenant = o.tenant "
+                    f"AND {joined}.collection = '{target}' AND {joined}.id = {self._column(alias, collection, key)}"
+                )
+                self._aliases[prefix] = (joined, target)
+                self.collections.add(target)
+            alias, collection = self._aliases[prefix]
+            parts = parts[1:]
+        return self._column(alias, collection, ".".join(parts))
+
+    def where(self, tenant: str, filters: Optional[Dict[str, Any]], created_from: Optional[str],
+              created_to: Optional[str]) -> Tuple[str, List]:
+        clauses = ["o.tenant = ?", "o.collection = ?"]
+        params: List[Any] = [tenant, self.collection]
+        for path, value in (filters or {}).items():
+            column = self.column(path)
+            if isinstance(value, list):
+                if not value:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{column} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            elif value is None:
+                clauses.append(f"{column} IS NULL")
+            else:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if created_from:
+            clauses.append("o.created_at >= ?")
+            params.append(created_from)
+        if created_to:
+            # A bare date includes the whole day
+            clauses.append("o.created_at <= ?")
+            params.append(created_to if len(created_to) > 10 else f"{created_to}T23:59:59.999Z")
+        return " AND ".join(clauses), params
+
+
+def _freshness(store: SnapshotStore, api_key: str, collections) -> Dict[str, Optional[float]]:
+    ages = {}
+    for collection in sorted(collections):
+        age = store.synced_age(api_key, collection)
+        ages[collection] = None if age is None else round(age, 1)
+    return ages
+
+
+def find(store: SnapshotStore,
+         api_key: str,
+         collection: str,
+         filters: Optional[Dict[str, Any]] = None,
+         created_from: Optional[str] = None,
+         created_to: Optional[str] = None,
+         order_by: Optional[str] = None,
+         descending: bool = True,
+         limit: int = 50) -> Dict:
+    """Stored objects of one collection matching filters, newest first unless order_by is given"""
+    start = time.perf_counter()
+    query = _Query(collection)
+    where, params = query.where(tenant_id(api_key), filters, created_from, created_to)
+    order = query.column(order_by) if order_by else "o.created_at"
+    joins = " ".join(query.joins)
+    db = store.db
+    matched = db.execute(f"SELECT COUNT(*) FROM objects o {joins} WHERE {where}", params).fetchone()[0]
+    rows = db.execute(
+        f"SELECT o.body FROM objects o {joins} WHERE {where} "
+        f"ORDER BY {order} {'DESC' if descending else 'ASC'} LIMIT ?",
+        params + [limit],
+    ).fetchall()
+    return {
+        "matched": matched,
+        "bodies": [row[0] for row in rows],
+        "synced_seconds_ago": _freshness(store, api_key, query.collections),
+        "query_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+
+
+def aggregate(store: SnapshotStore,
+              api_key: str,
+              collection: str,
+              group_by: Optional[List[str]] = None,
+              metric: str = "count",
+              value_field: Optional[str] = None,
+              filters: Optional[Dict[str, Any]] = None,
+              created_from: Optional[str] = None,
+              created_to: Optional[str] = None,
+              limit: int = 100) -> Dict:
+    """
+    Count, sum, average, min or max of value_field over matching objects,
+    grouped by up to three field paths, largest groups first
+    """
+    start = time.perf_counter()
+    if metric not in METRICS:
+        raise QueryError(f"Unknown metric '{metric}'")
+    if metric != "count" and not value_field:
+        raise QueryError(f"value_field is required for {metric}")
+    group_by = group_by or []
+    if len(group_by) > 3:
+        raise QueryError("At most 3 group_by fields")
+
+    query = _Query(collection)
+    where, params = query.where(tenant_id(api_key), filters, created_from, created_to)
+    groups = [query.column(path) for path in group_by]
+    selects = [f"{column} AS g{i}" for i, column in enumerate(groups)] + ["COUNT(*) AS n"]
+    if metric != "count":
+        selects.append(f"{metric.upper()}({query.column(value_field)}) AS v")
+    sql = f"SELECT {', '.join(selects)} FROM objects o {' '.join(query.joins)} WHERE {where}"
+    if groups:
+        sql += f" GROUP BY {', '.join(f'g{i}' for i in range(len(groups)))}"
+        sql += f" ORDER BY {'v' if metric != 'count' else 'n'} DESC LIMIT ?"
+        params = params + [limit]
+
+    rows = []
+    for row in store.db.execute(sql, params):
+        result = {path: row[i] for i, path in enumerate(group_by)}
+        result["count"] = row[len(groups)]
+        if metric != "count":
+            value = row[len(groups) + 1]
+            result[metric] = round(value, 4) if isinstance(value, float) else value
+        rows.append(result)
+    return {
+        "collection": collection,
+        "groups": rows,
+        "synced_seconds_ago": _freshness(store, api_key, query.collections),
+        "query_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
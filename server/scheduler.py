@@ -0,0 +1,235 @@
+import asyncio
+import email.utils
+import heapq
+import itertools
+import os
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class SchedulerBusyError(Exception):
+    """Raised when the request queue is full"""
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second, holding at most `burst`"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def reserve(self) -> float:
+        """Take one token, returning how long the caller must wait before using it"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), if present"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+class RequestScheduler:
+    """
+    Admission control, rate limiting and retries for Method API requests.
+
+    Requests first take a token from their API key's bucket, then wait in a
+    bounded priority queue (interactive before bulk) for one of max_in_flight slots.
+    Timeouts, connection errors and 5xx responses are retried with exponential
+    backoff and full jitter when the request is idempotent; 429 responses are
+    always retried since Method rejected them without acting. Retry-After wins
+    over the computed backoff.
+    """
+
+    def __init__(self,
+                 max_in_flight: int = 32,
+                 max_queue: int = 1000,
+                 rate: float = 100.0,
+                 burst: float = 100.0,
+                 max_retries: int = 3,
+                 base_delay: float = 0.25,
+                 max_delay: float = 8.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._buckets: Dict[str, TokenBucket] = {}
+        # Takes a token from a bucket shared with other worker processes (server/shared.py); the local
+        # buckets are used when None or while it raises ConnectionError
+        self.shared_tokens: Optional[Callable[[str], Awaitable[float]]] = None
+        self.counters = {
+            "submitted": 0,
+            "retries": 0,
+            "retries_rate_limited": 0,
+            "retries_server_error": 0,
+            "retries_transport_error": 0,
+            "rejected_queue_full": 0,
+            "rate_limit_waits": 0,
+            "rate_limit_wait_seconds": 0.0,
+        }
+
+    # ===== ADMISSION =====
+
+    async def _acquire(self, priority: int):
+        if self._in_flight < self.max_in_flight and not self._waiters:
+            self._in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.counters["rejected_queue_full"] += 1
+            raise SchedulerBusyError("Too many queued Method API requests")
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled
+                self._release()
+            raise
+
+    def _release(self):
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                # Hand the slot straight to the next waiter
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    async def _wait_for_token(self, api_key: str):
+        delay = None
+        if self.shared_tokens is not None:
+            try:
+                delay = await self.shared_tokens(api_key)
+            except ConnectionError:
+                delay = None
+        if delay is None:
+            bucket = self._buckets.get(api_key)
+            if bucket is None:
+                bucket = self._buckets[api_key] = TokenBucket(self.rate, self.burst)
+            delay = bucket.reserve()
+        if delay > 0:
+            self.counters["rate_limit_waits"] += 1
+            self.counters["rate_limit_wait_seconds"] += delay
+            await asyncio.sleep(delay)
+
+    def forget(self, api_key: str):
+        """Drop the rate limit bucket of an API key no longer in use"""
+        self._buckets.pop(api_key, None)
+
+    # ===== RETRIES =====
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def submit(self,
+                     send: Callable[[], Awaitable[httpx.Response]],
+                     method: str = "GET",
+                     api_key: str = "",
+                     priority: int = PRIORITY_INTERACTIVE,
+                     idempotent: Optional[bool] = None) -> httpx.Response:
+        """
+        Run send() under the scheduler, retrying transient failures
+        Returns the final response; transport errors of the last attempt propagate
+        """
+        self.counters["submitted"] += 1
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        attempt = 0
+        while True:
+            # Wait for the key's token before taking a slot, so a throttled key never holds one idle
+            await self._wait_for_token(api_key)
+            await self._acquire(priority)
+            try:
+                response = await send()
+                error = None
+            except httpx.TransportError as e:
+                response = None
+                error = e
+            finally:
+                self._release()
+
+            if attempt >= self.max_retries:
+                break
+            if error is not None:
+                if not idempotent:
+                    break
+                reason, delay = "retries_transport_error", self._backoff(attempt)
+            elif response.status_code == 429:
+                reason = "retries_rate_limited"
+                retry_after = _retry_after(response)
+                delay = self._backoff(attempt) if retry_after is None else retry_after
+            elif response.status_code in RETRYABLE_STATUS_CODES and idempotent:
+                reason = "retries_server_error"
+                retry_after = _retry_after(response)
+                delay = self._backoff(attempt) if retry_after is None else retry_after
+            else:
+                break
+
+            if delay > self.max_delay * 4:
+                # Not worth holding the tool call open; surface the error instead
+                break
+            self.counters["retries"] += 1
+            self.counters[reason] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+        if error is not None:
+            raise error
+        return response
+
+    def stats(self) -> Dict:
+        return dict(
+            self.counters,
+            rate_limit_wait_seconds=round(self.counters["rate_limit_wait_seconds"], 3),
+            in_flight=self._in_flight,
+            queue_depth=sum(1 for _, _, waiter in self._waiters if not waiter.done()),
+            max_in_flight=self.max_in_flight,
+            max_queue=self.max_queue,
+            rate=self.rate,
+            burst=self.burst,
+        )
+
+
+def scheduler_from_env(default_max_in_flight: int = 32) -> RequestScheduler:
+    return RequestScheduler(
+        max_in_flight=int(os.getenv("METHOD_MAX_IN_FLIGHT", str(default_max_in_flight))),
+        max_queue=int(os.getenv("METHOD_MAX_QUEUE", "1000")),
+        rate=float(os.getenv("METHOD_RATE_LIMIT", "100")),
+        burst=float(os.getenv("METHOD_RATE_BURST", "100")),
+        max_retries=int(os.getenv("METHOD_MAX_RETRIES", "3")),
+    )
@@ -0,0 +1,381 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.cache import ResponseCache, cache_from_env
+from server.scheduler import TokenBucket
+
+# Largest message on the socket; a cached body can be as large as METHOD_CACHE_MAX_BYTES
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+# Seconds between sweeps of rate limit buckets that have refilled completely
+BUCKET_SWEEP_INTERVAL = 60.0
+
+_ABANDONED = object()
+
+
+class SharedStateError(ConnectionError):
+    """Raised when the shared state server cannot be reached; callers fall back to per-process state"""
+
+
+def _encode(message: Dict) -> bytes:
+    return json.dumps(message, separators=(",", ":"), default=str).encode() + b"\n"
+
+
+class _Flight:
+    def __init__(self, owner: int):
+        self.owner = owner
+        self.result = asyncio.get_running_loop().create_future()
+
+
+class SharedStateServer:
+    """
+    Response cache, rate limit buckets, in-flight requests and issued
+    idempotency keys shared by the workers of one server, plus the tool metrics each worker last published,
+    served as JSON lines over a Unix socket.
+
+    It runs in the supervisor process (see server/workers.py) and every worker
+    keeps one SharedStateClient connection to it. A worker about to call
+    Method joins the request's flight: the first becomes its leader, the rest
+    wait for the leader's result. A leader that disconnects or abandons its
+    flight hands it to the next waiter, and a waiter that times out calls
+    Method itself.
+    """
+
+    def __init__(self, path: str, cache: Optional[ResponseCache] = None, rate: float = 100.0, burst: float = 100.0,
+                 flight_timeout: float = 60.0):
+        self.path = path
+        self.cache = cache
+        self.rate = rate
+        self.burst = burst
+        self.flight_timeout = flight_timeout
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._flights: Dict[str, _Flight] = {}
+        # Idempotency keys issued to writes, by request digest: (key, monotonic expiry)
+        self._idempotency_keys: Dict[str, Tuple[str, float]] = {}
+        # Latest tool metric families published by each worker, by worker index
+        self._metrics: Dict[str, List[Dict]] = {}
+        self._connections = itertools.count(1)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._last_sweep = time.monotonic()
+        self.counters = {"connections": 0, "requests": 0, "flights_led": 0, "flights_joined": 0,
+                         "flights_abandoned": 0, "flights_timed_out": 0}
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve_connection, path=self.path,
+                                                       limit=MAX_MESSAGE_BYTES)
+        os.chmod(self.path, 0o600)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = next(self._connections)
+        self.counters["connections"] += 1
+        waits = set()
+
+        def reply(request_id, response: Dict):
+            # Requests without an id are notifications and get no reply
+            if request_id and not writer.is_closing():
+                writer.write(_encode(dict(response, id=request_id)))
+
+        async def join(request_id, key: str):
+            reply(request_id, await self._join_flight(connection, key))
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = json.loads(line)
+                self.counters["requests"] += 1
+                if request.get("op") == "flight":
+                    wait = asyncio.ensure_future(join(request.get("id"), request["key"]))
+                    waits.add(wait)
+                    wait.add_done_callback(waits.discard)
+                    continue
+                try:
+                    response = self._handle(connection, request)
+                except (KeyError, TypeError, ValueError) as e:
+                    response = {"error": f"{type(e).__name__}: {e}"}
+                reply(request.get("id"), response)
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            for wait in waits:
+                wait.cancel()
+            for key, flight in list(self._flights.items()):
+                if flight.owner == connection:
+                    self._end_flight(key, _ABANDONED)
+            writer.close()
+
+    def _handle(self, connection: int, request: Dict) -> Dict:
+        op = request["op"]
+        if op == "cache_get":
+            body = self.cache.get_body(request["api_key"], request["method"], request["endpoint"]) if self.cache else None
+            return {"body": body}
+        if op == "cache_set":
+            if self.cache is not None:
+                self.cache.set(request["api_key"], request["method"], request["endpoint"], request["body"],
+                               ttl=request.get("ttl"))
+            return {}
+        if op == "cache_invalidate":
+            dropped = self.cache.invalidate(request["endpoint"], request.get("api_key")) if self.cache else 0
+            return {"dropped": dropped}
+        if op == "cache_clear":
+            if self.cache is not None:
+                self.cache.clear(request.get("api_key"))
+            return {}
+        if op == "reserve":
+            return {"delay": self._reserve(request["api_key"])}
+        if op in ("flight_done", "flight_abandon"):
+            flight = self._flights.get(request["key"])
+            if flight is not None and flight.owner == connection:
+                self._end_flight(request["key"], request.get("result") if op == "flight_done" else _ABANDONED)
+            return {}
+        if op == "idempotency_key":
+            return {"key": self._claim_key(request["material"], request["key"], float(request["ttl"]))}
+        if op == "metrics_put":
+            self._metrics[str(request["worker"])] = request["families"]
+            return {}
+        if op == "metrics_get":
+            return {"metrics": self._metrics}
+        if op == "stats":
+            return {"stats": self.stats()}
+        raise ValueError(f"Unknown operation '{op}'")
+
+    # ===== RATE LIMITS =====
+
+    def _reserve(self, api_key: str) -> float:
+        now = time.monotonic()
+        if now - self._last_sweep > BUCKET_SWEEP_INTERVAL:
+            # A bucket that has refilled is no different from a new one
+            self._last_sweep = now
+            for key in [k for k, b in self._buckets.items() if b.tokens + (now - b.updated_at) * b.rate >= b.burst]:
+                del self._buckets[key]
+        bucket = self._buckets.get(api_key)
+        if bucket is None:
+            bucket = self._buckets[api_key] = TokenBucket(self.rate, self.burst)
+        return bucket.reserve()
+
+    # ===== IDEMPOTENCY KEYS =====
+
+    def _claim_key(self, material: str, key: str, ttl: float) -> str:
+        now = time.monotonic()
+        if len(self._idempotency_keys) > 4096:
+            for stale in [m for m, (_, expires_at) in self._idempotency_keys.items() if expires_at <= now]:
+                del self._idempotency_keys[stale]
+        issued = self._idempotency_keys.get(material)
+        if issued is not None and issued[1] > now:
+            return issued[0]
+        self._idempotency_keys[material] = (key, now + ttl)
+        return key
+
+    # ===== IN-FLIGHT REQUESTS =====
+
+    async def _join_flight(self, connection: int, key: str) -> Dict:
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                self._flights[key] = _Flight(connection)
+                self.counters["flights_led"] += 1
+                return {"leader": True}
+            try:
+                result = await asyncio.wait_for(asyncio.shield(flight.result), self.flight_timeout)
+            except asyncio.TimeoutError:
+                # Not worth waiting any longer; the caller makes the request itself, outside the flight
+                self.counters["flights_timed_out"] += 1
+                return {"leader": True}
+            if result is not _ABANDONED:
+                self.counters["flights_joined"] += 1
+                return {"leader": False, "result": result}
+
+    def _end_flight(self, key: str, result: Any):
+        flight = self._flights.pop(key)
+        if result is _ABANDONED:
+            self.counters["flights_abandoned"] += 1
+        if not flight.result.done():
+            flight.result.set_result(result)
+
+    def stats(self) -> Dict:
+        return dict(
+            self.counters,
+            cache=dict(self.cache.stats(), enabled=True) if self.cache else {"enabled": False},
+            rate_limit_buckets=len(self._buckets),
+            flights_in_progress=len(self._flights),
+            rate=self.rate,
+            burst=self.burst,
+        )
+
+
+class SharedStateClient:
+    """
+    A worker's connection to the SharedStateServer. Requests are multiplexed
+    over one Unix socket connection. Writes that need no answer (cache sets,
+    invalidations, flight results) are sent without waiting. Calls raise
+    SharedStateError while the server is unreachable; the connection is
+    re-established on the next call after retry_interval seconds.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0, retry_interval: float = 1.0):
+        self.path = path
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._retry_at = 0.0
+        self._connecting = asyncio.Lock()
+        self.counters = {"calls": 0, "errors": 0, "reconnects": 0}
+
+    async def connect(self):
+        try:
+            self._reader, self._writer = await asyncio.open_unix_connection(self.path, limit=MAX_MESSAGE_BYTES)
+        except OSError as e:
+            self._retry_at = time.monotonic() + self.retry_interval
+            raise SharedStateError(f"Shared state server at {self.path} is unreachable: {e}") from e
+        self._read_task = asyncio.ensure_future(self._read_loop())
+
+    async def _ensure_connected(self):
+        if self._writer is not None and not self._writer.is_closing():
+            return
+        async with self._connecting:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            if time.monotonic() < self._retry_at:
+                raise SharedStateError(f"Shared state server at {self.path} is unreachable")
+            self.counters["reconnects"] += 1
+            await self.connect()
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                waiter = self._pending.pop(response.get("id"), None)
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(response)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self._disconnected()
+
+    def _disconnected(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = None
+        self._retry_at = time.monotonic() + self.retry_interval
+        pending, self._pending = self._pending, {}
+        for waiter in pending.values():
+            if not waiter.done():
+                waiter.set_exception(SharedStateError("Lost the connection to the shared state server"))
+
+    async def _call(self, op: str, timeout: Optional[float] = -1, **fields) -> Dict:
+        await self._ensure_connected()
+        self.counters["calls"] += 1
+        request_id = next(self._ids)
+        waiter = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = waiter
+        self._writer.write(_encode(dict(fields, op=op, id=request_id)))
+        try:
+            response = await asyncio.wait_for(waiter, self.timeout if timeout == -1 else timeout)
+        except asyncio.TimeoutError as e:
+            self.counters["errors"] += 1
+            raise SharedStateError(f"Shared state server did not answer '{op}' in time") from e
+        finally:
+            self._pending.pop(request_id, None)
+        if "error" in response:
+            self.counters["errors"] += 1
+            raise SharedStateError(response["error"])
+        return response
+
+    def _notify(self, op: str, **fields):
+        if self._writer is not None and not self._writer.is_closing():
+            self._writer.write(_encode(dict(fields, op=op)))
+
+    # ===== CACHE =====
+
+    async def cache_get(self, api_key: str, method: str, endpoint: str) -> Optional[Dict]:
+        """A fresh copy of the cached response, or None on a miss"""
+        body = (await self._call("cache_get", api_key=api_key or "", method=method, endpoint=endpoint))["body"]
+        return None if body is None else json.loads(body)
+
+    def cache_set(self, api_key: str, method: str, endpoint: str, body: str, ttl: Optional[float] = None):
+        self._notify("cache_set", api_key=api_key or "", method=method, endpoint=endpoint, body=body, ttl=ttl)
+
+    def cache_invalidate(self, endpoint: str, api_key: Optional[str] = None):
+        self._notify("cache_invalidate", endpoint=endpoint, api_key=api_key)
+
+    def cache_clear(self, api_key: Optional[str] = None):
+        self._notify("cache_clear", api_key=api_key)
+
+    # ===== RATE LIMITS =====
+
+    async def reserve(self, api_key: str) -> float:
+        """Take a token from the API key's shared bucket, returning how long to wait before using it"""
+        return (await self._call("reserve", api_key=api_key or ""))["delay"]
+
+    # ===== IDEMPOTENCY KEYS =====
+
+    async def claim_idempotency_key(self, material: str, key: str, ttl: float) -> str:
+        """The key already issued for this request digest within its ttl, else key, which is recorded"""
+        return (await self._call("idempotency_key", material=material, key=key, ttl=ttl))["key"]
+
+    # ===== IN-FLIGHT REQUESTS =====
+
+    async def join_flight(self, key: str) -> Tuple[bool, Any]:
+        """(True, None) when the caller should make the request, else (False, the leader's result)"""
+        response = await self._call("flight", timeout=None, key=key)
+        return response["leader"], response.get("result")
+
+    def finish_flight(self, key: str, result: Any):
+        self._notify("flight_done", key=key, result=result)
+
+    def abandon_flight(self, key: str):
+        self._notify("flight_abandon", key=key)
+
+    # ===== METRICS =====
+
+    def publish_metrics(self, worker: int, families: List[Dict]):
+        """Replace this worker's tool metric families (see ToolMetrics.families)"""
+        self._notify("metrics_put", worker=worker, families=families)
+
+    async def metrics(self) -> Dict[str, List[Dict]]:
+        """The tool metric families every worker last published, by worker index"""
+        return (await self._call("metrics_get"))["metrics"]
+
+    async def stats(self) -> Dict:
+        return (await self._call("stats"))["stats"]
+
+    async def close(self):
+        if self._read_task is not None:
+            self._read_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def shared_state_server_from_env(path: str) -> SharedStateServer:
+    """Shared state server using the METHOD_CACHE_* and METHOD_RATE_* settings every worker would use"""
+    return SharedStateServer(
+        path,
+        cache=cache_from_env(),
+        rate=float(os.getenv("METHOD_RATE_LIMIT", "100")),
+        burst=float(os.getenv("METHOD_RATE_BURST", "100")),
+        flight_timeout=float(os.getenv("METHOD_SHARED_FLIGHT_TIMEOUT", "60")),
+    )
@@ -0,0 +1,321 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from server.cache import split_endpoint
+
+DEFAULT_STORE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "method-fi-mcp", "store.sqlite3")
+
+# Collections kept in the store; every other path goes straight to the API
+STORE_COLLECTIONS = ("entities", "accounts", "payments", "merchants")
+
+# Collections without pagination or date filters, re-read in full on every sync
+FULL_SYNC_COLLECTIONS = {"merchants"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    tenant TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    holder_id TEXT,
+    status TEXT,
+    mch_id TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    body TEXT NOT NULL,
+    source TEXT,
+    destination TEXT,
+    fetched_at REAL,
+    max_age REAL,
+    PRIMARY KEY (tenant, collection, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sync_state (
+    tenant TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    watermark TEXT,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (tenant, collection)
+) WITHOUT ROWID;
+"""
+
+# Secondary indexes used by the local query tools (see server/query.py)
+INDEXES = """
+CREATE INDEX IF NOT EXISTS objects_holder_id ON objects (tenant, collection, holder_id);
+CREATE INDEX IF NOT EXISTS objects_status ON objects (tenant, collection, status);
+CREATE INDEX IF NOT EXISTS objects_mch_id ON objects (tenant, collection, mch_id);
+CREATE INDEX IF NOT EXISTS objects_created_at ON objects (tenant, collection, created_at);
+CREATE INDEX IF NOT EXISTS objects_source ON objects (tenant, collection, source);
+CREATE INDEX IF NOT EXISTS objects_destination ON objects (tenant, collection, destination);
+"""
+
+COLUMNS = ("tenant", "collection", "id", "holder_id", "status", "mch_id", "created_at", "updated_at", "body",
+           "source", "destination", "fetched_at", "max_age")
+
+Slot = Tuple[str, str]
+
+# Seconds of overlap between reloads, so a row committed late by another process is not missed
+RELOAD_OVERLAP = 5.0
+
+
+def tenant_id(api_key: Optional[str]) -> str:
+    """Stable, non-reversible id for the API key that owns a row"""
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+
+def store_path(endpoint: str) -> Tuple[Optional[str], Optional[str]]:
+    """(collection, object id) for a store-backed path; id is None for the collection itself"""
+    path, _ = split_endpoint(endpoint)
+    parts = [p for p in path.split("/") if p]
+    if not parts or parts[0] not in STORE_COLLECTIONS or len(parts) > 2:
+        return None, None
+    return parts[0], parts[1] if len(parts) == 2 else None
+
+
+def _row(tenant: str, collection: str, obj: Dict, body: str, fetched_at: float, max_age: float) -> Tuple:
+    mch_id = obj.get("id") if collection == "merchants" else (obj.get("liability") or {}).get("mch_id")
+    source, destination = obj.get("source"), obj.get("destination")
+    return (tenant, collection, obj["id"], obj.get("holder_id"), obj.get("status"), mch_id,
+            obj.get("created_at"), obj.get("updated_at"), body,
+            source if isinstance(source, str) else None, destination if isinstance(destination, str) else None,
+            fetched_at, max_age)
+
+
+class SnapshotStore:
+    """
+    SQLite-backed copy of the entities, accounts, payments and merchants
+    fetched from Method, kept per API key.
+
+    Rows are written through whenever a response carries these objects and by
+    incremental syncs (see api.sync_store). On open the whole store is loaded
+    into memory as raw JSON, so retrieves are served without touching the
+    disk or the API while the object is fresh: for max_age seconds after a
+    sync or webhook refresh fetched it, and for the max_age the writer passed
+    (the route's cache TTL for write-through) otherwise. An incremental sync
+    only walks new objects, so older ones age out and are fetched again on
+    their next retrieve. Writes expire the copies they touch.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, max_age: float = 300.0):
+        self.path = path
+        self.max_age = max_age
+        self._db: Optional[sqlite3.Connection] = None
+        # (updated_at, body, fetched_at, max_age) per object id
+        self._objects: Dict[Slot, Dict[str, Tuple[Optional[str], str, float, float]]] = {}
+        self._sync_state: Dict[Slot, Tuple[Optional[str], float]] = {}
+        self.hits = 0
+        self.writes = 0
+        self.unchanged = 0
+        self.load_seconds = 0.0
+        self._loaded_until = 0.0
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.open()
+        return self._db
+
+    def open(self):
+        """Open (creating if needed) the database and load it into memory"""
+        if self._db is not None:
+            return
+        start = time.perf_counter()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(SCHEMA)
+        if "max_age" not in {row[1] for row in db.execute("PRAGMA table_info(objects)")}:
+            # Stores written before per-object max ages; their rows expire on the next retrieve
+            db.execute("ALTER TABLE objects ADD COLUMN max_age REAL")
+        db.executescript(INDEXES)
+        self._db = db
+
+        objects: Dict[Slot, Dict[str, Tuple[Optional[str], str, float, float]]] = {}
+        for tenant, collection, obj_id, updated_at, body, fetched_at, max_age in db.execute(
+                "SELECT tenant, collection, id, updated_at, body, fetched_at, max_age FROM objects"):
+            slot = (tenant, collection)
+            bucket = objects.get(slot)
+            if bucket is None:
+                bucket = objects[slot] = {}
+            bucket[obj_id] = (updated_at, body, fetched_at or 0.0, max_age or 0.0)
+            self._loaded_until = max(self._loaded_until, fetched_at or 0.0)
+        self._objects = objects
+        self._load_sync_state()
+        self.load_seconds = time.perf_counter() - start
+
+    def _load_sync_state(self):
+        self._sync_state = {
+            (tenant, collection): (watermark, synced_at)
+            for tenant, collection, watermark, synced_at in self._db.execute(
+                "SELECT tenant, collection, watermark, synced_at FROM sync_state")
+        }
+
+    def reload(self) -> int:
+        """
+        Pick up objects and sync state that other processes sharing the database
+        wrote since the last load or reload; returns how many objects changed
+        """
+        db = self.db
+        changed = 0
+        for tenant, collection, obj_id, updated_at, body, fetched_at, max_age in db.execute(
+                "SELECT tenant, collection, id, updated_at, body, fetched_at, max_age FROM objects WHERE fetched_at > ?",
+                (self._loaded_until - RELOAD_OVERLAP,)):
+            bucket = self._objects.setdefault((tenant, collection), {})
+            current = bucket.get(obj_id)
+            if current is None or current[2] < fetched_at:
+                bucket[obj_id] = (updated_at, body, fetched_at, max_age or 0.0)
+                changed += 1
+            self._loaded_until = max(self._loaded_until, fetched_at)
+        self._load_sync_state()
+        return changed
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # ===== READS =====
+
+    def synced_age(self, api_key: str, collection: str) -> Optional[float]:
+        """Seconds since the collection was last synced, None if it never was"""
+        state = self._sync_state.get((tenant_id(api_key), collection))
+        return time.time() - state[1] if state else None
+
+    def watermark(self, api_key: str, collection: str) -> Optional[str]:
+        state = self._sync_state.get((tenant_id(api_key), collection))
+        return state[0] if state else None
+
+    def get(self, api_key: str, endpoint: str) -> Optional[Dict]:
+        """A single stored object as a Method response, if it is still fresh"""
+        collection, obj_id = store_path(endpoint)
+        if obj_id is None or "?" in endpoint:
+            return None
+        entry = self._objects.get((tenant_id(api_key), collection), {}).get(obj_id)
+        if entry is None or time.time() - entry[2] > entry[3]:
+            return None
+        self.hits += 1
+        return {"success": True, "data": json.loads(entry[1]), "message": None}
+
+    def count(self, api_key: Optional[str] = None, collection: Optional[str] = None) -> int:
+        tenant = tenant_id(api_key) if api_key is not None else None
+        return sum(len(bucket) for (t, c), bucket in self._objects.items()
+                   if (tenant is None or t == tenant) and (collection is None or c == collection))
+
+    # ===== WRITES =====
+
+    def put_many(self, api_key: str, collection: str, objects: Iterable[Dict], max_age: Optional[float] = None) -> int:
+        """
+        Upsert objects of one collection, skipping unchanged ones; returns how many were written
+        They are served for max_age seconds (the store's max_age when None, for syncs and webhook refreshes)
+        Unchanged objects are only marked fetched in memory, so they stay servable without a disk write
+        """
+        db = self.db
+        tenant = tenant_id(api_key)
+        now = time.time()
+        max_age = self.max_age if max_age is None else max_age
+        bucket = self._objects.setdefault((tenant, collection), {})
+        rows = []
+        for obj in objects:
+            if not isinstance(obj, dict) or not obj.get("id"):
+                continue
+            updated_at = obj.get("updated_at")
+            current = bucket.get(obj["id"])
+            if current is not None and updated_at is not None and current[0] == updated_at:
+                bucket[obj["id"]] = (updated_at, current[1], now, max_age)
+                self.unchanged += 1
+                continue
+            body = json.dumps(obj, separators=(",", ":"))
+            if current is not None and current[1] == body:
+                bucket[obj["id"]] = (updated_at, body, now, max_age)
+                self.unchanged += 1
+                continue
+            bucket[obj["id"]] = (updated_at, body, now, max_age)
+            rows.append(_row(tenant, collection, obj, body, now, max_age))
+        if rows:
+            with db:
+                db.executemany(f"INSERT OR REPLACE INTO objects ({', '.join(COLUMNS)}) "
+                               f"VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+            self.writes += len(rows)
+        return len(rows)
+
+    def put_response(self, api_key: str, endpoint: str, response, max_age: Optional[float] = None) -> int:
+        """Write through the objects carried by a successful response from a store-backed path"""
+        collection, _ = store_path(endpoint)
+        if collection is None or not isinstance(response, dict) or response.get("error"):
+            return 0
+        data = response.get("data")
+        return self.put_many(api_key, collection, data if isinstance(data, list) else [data], max_age=max_age)
+
+    def mark_synced(self, api_key: str, collection: str, watermark: Optional[str], synced_at: Optional[float] = None):
+        db = self.db
+        synced_at = time.time() if synced_at is None else synced_at
+        tenant = tenant_id(api_key)
+        self._sync_state[(tenant, collection)] = (watermark, synced_at)
+        with db:
+            db.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                            (tenant, collection, watermark, synced_at))
+
+    def invalidate(self, endpoint: str, api_key: Optional[str] = None) -> int:
+        """
+        Expire the stored objects a write to endpoint touches, the object itself and the
+        objects above it (e.g. the account of /accounts/acc_1/updates), of every tenant
+        when api_key is None. Rows are kept but marked expired, so other processes
+        pick the expiry up on their next reload; returns how many were expired
+        """
+        path, _ = split_endpoint(endpoint)
+        targets = []
+        while path.count("/") >= 2:
+            collection, obj_id = store_path(path)
+            if obj_id is not None:
+                targets.append((collection, obj_id))
+            path = path.rsplit("/", 1)[0]
+        tenant = tenant_id(api_key) if api_key is not None else None
+        now = time.time()
+        expired = []
+        for (t, c), bucket in self._objects.items():
+            if tenant is not None and t != tenant:
+                continue
+            for collection, obj_id in targets:
+                current = bucket.get(obj_id) if c == collection else None
+                if current is not None:
+                    bucket[obj_id] = (current[0], current[1], now, 0.0)
+                    expired.append((now, t, c, obj_id))
+        if expired:
+            db = self.db
+            with db:
+                db.executemany("UPDATE objects SET fetched_at = ?, max_age = 0 WHERE tenant = ? AND collection = ? AND id = ?",
+                               expired)
+        return len(expired)
+
+    def clear(self):
+        db = self.db
+        with db:
+            db.execute("DELETE FROM objects")
+            db.execute("DELETE FROM sync_state")
+        self._objects = {}
+        self._sync_state = {}
+
+    def stats(self) -> Dict:
+        return {
+            "path": self.path,
+            "objects": self.count(),
+            "collections": {c: self.count(collection=c) for c in STORE_COLLECTIONS},
+            "hits": self.hits,
+            "writes": self.writes,
+            "unchanged": self.unchanged,
+            "load_seconds": round(self.load_seconds, 4),
+            "max_age": self.max_age,
+        }
+
+
+def store_from_env() -> Optional[SnapshotStore]:
+    if os.getenv("METHOD_STORE_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    return SnapshotStore(
+        path=os.getenv("METHOD_STORE_PATH", DEFAULT_STORE_PATH),
+        max_age=float(os.getenv("METHOD_STORE_MAX_AGE", "300")),
+    )
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set, Tuple
+
+import httpx
+
+from server.store import tenant_id
+
+# Header a caller may set to reach another Method environment with their own key
+BASE_URL_HEADER = "x-method-base-url"
+
+# Method environments a caller may pick with BASE_URL_HEADER unless METHOD_ALLOWED_BASE_URLS says otherwise
+METHOD_BASE_URLS = ("https://dev.methodfi.com", "https://sandbox.methodfi.com", "https://production.methodfi.com")
+
+TenantKey = Tuple[str, str]
+OpenPool = Callable[[Optional[str], str], Tuple[httpx.AsyncClient, httpx.AsyncHTTPTransport]]
+
+
+class TenantError(ValueError):
+    """Raised when a caller's credentials cannot be routed, e.g. a base URL outside the allowlist"""
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    """The token of a 'Bearer <token>' Authorization header, None if absent or empty"""
+    if not authorization:
+        return None
+    scheme, _, token = authorization.strip().partition(" ")
+    token = token.strip()
+    # Clients without a key configured send "Bearer None"
+    if scheme.lower() != "bearer" or not token or token == "None":
+        return None
+    return token
+
+
+class Tenant:
+    """One caller's Method credentials and the pooled HTTP client opened for them"""
+
+    def __init__(self, api_key: Optional[str], base_url: str, client: httpx.AsyncClient,
+                 transport: httpx.AsyncHTTPTransport):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.client = client
+        self.transport = transport
+        self.active = 0
+        self.requests = 0
+        self.connections_created = 0
+        self.opened_at = time.monotonic()
+        self.last_used = self.opened_at
+
+    async def trace(self, event_name: str, info: dict):
+        # httpcore only emits connect_tcp events when a request opens a new connection
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_created += 1
+
+    def pool_stats(self) -> Dict:
+        pool = getattr(self.transport, "_pool", None)
+        connections = list(pool.connections) if pool is not None else []
+        pending = list(getattr(pool, "_requests", []))
+        return {
+            "connections_open": len(connections),
+            "connections_idle": sum(1 for c in connections if c.is_idle()),
+            "connections_created": self.connections_created,
+            "connections_reused": max(self.requests - self.connections_created, 0),
+            "requests_active": sum(1 for r in pending if not r.is_queued()),
+            "requests_waiting": sum(1 for r in pending if r.is_queued()),
+            "requests_total": self.requests,
+            "http2": bool(getattr(pool, "_http2", False)),
+        }
+
+
+class TenantPools:
+    """
+    Pooled HTTP clients keyed by (API key, base URL), opened on a tenant's
+    first request. Tenants with no request in flight are closed once idle for
+    idle_timeout seconds, and the least recently used idle tenant is closed
+    whenever more than max_tenants are open. on_evict is called with each
+    closed tenant so per-key state elsewhere (rate limit bucket, cached
+    responses) can be dropped with it.
+    """
+
+    def __init__(self, open_pool: OpenPool, idle_timeout: float = 300.0, max_tenants: int = 256,
+                 on_evict: Optional[Callable[[Tenant], None]] = None):
+        self.open_pool = open_pool
+        self.idle_timeout = idle_timeout
+        self.max_tenants = max_tenants
+        self.on_evict = on_evict
+        self._tenants: "OrderedDict[TenantKey, Tenant]" = OrderedDict()
+        self._closing: Set[asyncio.Future] = set()
+        self._last_sweep = time.monotonic()
+        self.counters = {"opened": 0, "evicted_idle": 0, "evicted_capacity": 0}
+
+    def get(self, api_key: Optional[str], base_url: str) -> Tenant:
+        """The open tenant for these credentials, opening its pool if needed"""
+        key = (api_key or "", base_url)
+        tenant = self._tenants.get(key)
+        if tenant is None or tenant.client.is_closed:
+            client, transport = self.open_pool(api_key, base_url)
+            tenant = self._tenants[key] = Tenant(api_key, base_url, client, transport)
+            self.counters["opened"] += 1
+        self._tenants.move_to_end(key)
+        tenant.last_used = time.monotonic()
+        self._sweep(tenant.last_used)
+        return tenant
+
+    def _sweep(self, now: float):
+        if len(self._tenants) <= self.max_tenants and now - self._last_sweep < self._sweep_interval:
+            return
+        self.evict_idle(now)
+        # The most recently used tenant (the one being handed out) is never a candidate
+        while len(self._tenants) > self.max_tenants:
+            key = next((k for k, t in list(self._tenants.items())[:-1] if t.active == 0), None)
+            if key is None:
+                break
+            self._evict(key, "evicted_capacity")
+
+    @property
+    def _sweep_interval(self) -> float:
+        return max(min(self.idle_timeout / 4, 30.0), 0.1)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Close tenants without a request for idle_timeout seconds; returns how many were closed"""
+        now = time.monotonic() if now is None else now
+        self._last_sweep = now
+        idle = [key for key, tenant in self._tenants.items()
+                if tenant.active == 0 and now - tenant.last_used > self.idle_timeout]
+        for key in idle:
+            self._evict(key, "evicted_idle")
+        return len(idle)
+
+    async def run_eviction_loop(self):
+        """Close idle tenants periodically until cancelled, so they go even when no new requests arrive"""
+        while True:
+            await asyncio.sleep(self._sweep_interval)
+            self.evict_idle()
+
+    def _evict(self, key: TenantKey, reason: str):
+        tenant = self._tenants.pop(key)
+        self.counters[reason] += 1
+        closing = asyncio.ensure_future(tenant.client.aclose())
+        self._closing.add(closing)
+        closing.add_done_callback(self._closing.discard)
+        if self.on_evict is not None:
+            self.on_evict(tenant)
+
+    async def close_all(self):
+        """Close every tenant's pool, e.g. on shutdown"""
+        tenants = list(self._tenants.values())
+        self._tenants.clear()
+        for tenant in tenants:
+            await tenant.client.aclose()
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return dict(
+            self.counters,
+            open=len(self._tenants),
+            max_tenants=self.max_tenants,
+            idle_timeout=self.idle_timeout,
+            tenants=[{
+                "tenant": tenant_id(tenant.api_key),
+                "base_url": tenant.base_url,
+                "active": tenant.active,
+                "requests": tenant.requests,
+                "idle_seconds": round(now - tenant.last_used, 1),
+            } for tenant in self._tenants.values()],
+        )
+
+    def __iter__(self):
+        return iter(list(self._tenants.values()))
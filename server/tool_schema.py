@@ -0,0 +1,31 @@
+import hashlib
+import json
+
+from fastmcp import FastMCP
+
+# Resource holding the schema hash, read by clients before deciding whether to call tools/list
+TOOL_SCHEMA_URI = "method://tool-schema-hash"
+
+
+async def tool_schema_hash(server: FastMCP) -> str:
+    """Hash of every tool's name, description and input schema as clients see them in tools/list"""
+    tools = await server.get_tools()
+    listed = [tool.to_mcp_tool(name=name).model_dump(mode="json", exclude_none=True)
+              for name, tool in sorted(tools.items())]
+    return hashlib.sha256(json.dumps(listed, sort_keys=True, separators=(",", ":")).encode()).hexdigest()[:32]
+
+
+def publish_tool_schema_hash(server: FastMCP):
+    """
+    Serve the tool schema hash as the TOOL_SCHEMA_URI resource so clients can
+    reuse a cached tool list instead of calling tools/list. The hash is
+    computed on first read, once every tool is registered.
+    """
+    computed = {}
+
+    @server.resource(TOOL_SCHEMA_URI, name="tool_schema_hash", mime_type="text/plain",
+                     description="Hash of this server's tool schemas; unchanged while tools/list is unchanged")
+    async def read_tool_schema_hash() -> str:
+        if "hash" not in computed:
+            computed["hash"] = await tool_schema_hash(server)
+        return computed["hash"]
@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from server.api import refresh_cached
+
+SIGNATURE_HEADER = "method-webhook-signature"
+
+# Event types whose resource is refreshed in the cache; other events are acknowledged and ignored
+CACHED_EVENT_TYPES = {"payment.update", "account.update", "entity.update"}
+
+# Collection path of each event type's resource, for events that carry an id but no path
+EVENT_COLLECTIONS = {"payment": "/payments", "account": "/accounts", "entity": "/entities"}
+
+
+def sign(secret: str, body: bytes) -> str:
+    """Hex HMAC-SHA256 of a raw request body"""
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret: str, body: bytes, signature: Optional[str]) -> bool:
+    if not signature:
+        return False
+    if signature.startswith("sha256="):
+        signature = signature[len("sha256="):]
+    return hmac.compare_digest(sign(secret, body), signature.strip())
+
+
+def event_path(event: Dict) -> Optional[str]:
+    """Resource path an event refers to, e.g. /payments/pmt_123"""
+    path = event.get("path")
+    if path:
+        return "/" + path.strip("/")
+    kind = (event.get("type") or "").split(".", 1)[0]
+    collection = EVENT_COLLECTIONS.get(kind)
+    object_id = event.get("id")
+    if collection and object_id:
+        return f"{collection}/{object_id}"
+    return None
+
+
+class WebhookReceiver:
+    """
+    Verifies and ingests Method webhook events.
+
+    A payment, account or entity update drops every cached copy of that
+    resource (and the lists above it), then fetches the resource once in the
+    background and caches it for cache_ttl seconds. While events keep
+    arriving, retrieves of those resources are served locally instead of
+    re-polling Method. Redelivered events are recognised by their id and
+    acknowledged without further work.
+    """
+
+    def __init__(self, secret: str, cache_ttl: float = 300.0, max_seen: int = 10000):
+        self.secret = secret
+        self.cache_ttl = cache_ttl
+        self.max_seen = max_seen
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._refreshes: Set[asyncio.Task] = set()
+        self.counters = {
+            "received": 0,
+            "rejected_signature": 0,
+            "rejected_payload": 0,
+            "duplicates": 0,
+            "ignored": 0,
+            "refreshed": 0,
+            "refresh_errors": 0,
+        }
+
+    def _is_duplicate(self, event_id: Optional[str]) -> bool:
+        if not event_id:
+            return False
+        if event_id in self._seen:
+            return True
+        self._seen[event_id] = None
+        if len(self._seen) > self.max_seen:
+            self._seen.popitem(last=False)
+        return False
+
+    async def _refresh(self, path: str):
+        response = await refresh_cached(path, ttl=self.cache_ttl)
+        if isinstance(response, dict) and response.get("error"):
+            self.counters["refresh_errors"] += 1
+        else:
+            self.counters["refreshed"] += 1
+
+    async def handle(self, body: bytes, signature: Optional[str]) -> Tuple[int, Dict]:
+        """Process one delivery, returning the HTTP status code and JSON body to answer with"""
+        if not verify_signature(self.secret, body, signature):
+            self.counters["rejected_signature"] += 1
+            return 401, {"error": True, "message": "Invalid webhook signature"}
+        try:
+            event = json.loads(body)
+        except json.JSONDecodeError:
+            event = None
+        if not isinstance(event, dict) or not event.get("type"):
+            self.counters["rejected_payload"] += 1
+            return 400, {"error": True, "message": "Malformed webhook event"}
+
+        self.counters["received"] += 1
+        event_id = event.get("event_id") or event.get("event")
+        if self._is_duplicate(event_id if isinstance(event_id, str) else None):
+            self.counters["duplicates"] += 1
+            return 200, {"received": True, "duplicate": True}
+
+        path = event_path(event)
+        if event["type"] not in CACHED_EVENT_TYPES or path is None:
+            self.counters["ignored"] += 1
+            return 200, {"received": True}
+
+        # Acknowledge right away; Method retries slow deliveries
+        task = asyncio.create_task(self._refresh(path))
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+        return 200, {"received": True, "path": path}
+
+    def stats(self) -> Dict:
+        return dict(self.counters, pending_refreshes=len(self._refreshes), cache_ttl=self.cache_ttl)
+
+
+def receiver_from_env() -> Optional[WebhookReceiver]:
+    """The webhook receiver, or None when METHOD_WEBHOOK_SECRET is not set"""
+    secret = os.getenv("METHOD_WEBHOOK_SECRET")
+    if not secret:
+        return None
+    return WebhookReceiver(secret, cache_ttl=float(os.getenv("METHOD_WEBHOOK_CACHE_TTL", "300")))
@@ -0,0 +1,115 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import tempfile
+import time
+from typing import Callable, List, Optional
+
+from server.shared import shared_state_server_from_env
+
+# Seconds between checks for exited workers, and the shortest gap between restarts of one worker
+CHECK_INTERVAL = 0.5
+RESTART_DELAY = 1.0
+
+# Seconds a worker gets to finish its requests on shutdown before it is killed
+SHUTDOWN_TIMEOUT = 10.0
+
+WorkerTarget = Callable[[socket.socket, str, int], None]
+
+
+def default_socket_path(port: int) -> str:
+    return os.path.join(tempfile.gettempdir(), f"method-fi-mcp-{port}.sock")
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """The listening socket every worker accepts connections on"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class WorkerSupervisor:
+    """
+    Runs a server as several worker processes behind one port.
+
+    The supervisor binds host:port once and starts `workers` processes that
+    accept on the shared socket, each running target(sock, socket_path, index).
+    It hosts the shared state (server/shared.py) on a Unix socket at
+    socket_path for them, and restarts any worker that exits until it is
+    stopped with SIGINT or SIGTERM. Workers are spawned, not forked, so each
+    starts from a clean interpreter.
+    """
+
+    def __init__(self, target: WorkerTarget, workers: int, host: str = "127.0.0.1", port: int = 8002,
+                 socket_path: Optional[str] = None):
+        self.target = target
+        self.workers = max(1, workers)
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path or default_socket_path(port)
+        self.restarts = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * self.workers
+        self._started_at = [0.0] * self.workers
+
+    def _start(self, sock: socket.socket, index: int):
+        process = self._context.Process(target=self.target, args=(sock, self.socket_path, index),
+                                        name=f"method-mcp-worker-{index}", daemon=False)
+        process.start()
+        self._processes[index] = process
+        self._started_at[index] = time.monotonic()
+
+    async def run(self):
+        sock = bind_socket(self.host, self.port)
+        shared = shared_state_server_from_env(self.socket_path)
+        await shared.start()
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stopping.set)
+
+        print(f"Serving on http://{self.host}:{self.port}/mcp with {self.workers} workers "
+              f"(shared state at {self.socket_path})")
+        try:
+            for index in range(self.workers):
+                self._start(sock, index)
+            while not stopping.is_set():
+                try:
+                    await asyncio.wait_for(stopping.wait(), CHECK_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                for index, process in enumerate(self._processes):
+                    if stopping.is_set() or process.is_alive():
+                        continue
+                    if time.monotonic() - self._started_at[index] < RESTART_DELAY:
+                        continue
+                    print(f"Worker {index} (pid {process.pid}) exited with {process.exitcode}; restarting")
+                    self.restarts += 1
+                    self._start(sock, index)
+        finally:
+            await self._stop_workers()
+            await shared.close()
+            sock.close()
+
+    async def _stop_workers(self):
+        processes = [p for p in self._processes if p is not None]
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for process in processes:
+            await asyncio.to_thread(process.join, max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+
+def run_workers(target: WorkerTarget, workers: int, host: str = "127.0.0.1", port: int = 8002,
+                socket_path: Optional[str] = None):
+    asyncio.run(WorkerSupervisor(target, workers, host, port, socket_path).run())
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from bench.stub_method import StubMethodAPI
+from server import api
+from server.cache import ResponseCache
+from server.scheduler import RequestScheduler
+
+
+def run(coro):
+    """Run a test coroutine on a fresh event loop, closing the pooled clients it opened"""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await api.close_http_client()
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def stub():
+    stub = StubMethodAPI(latency=0.05, job_duration=0, n_entities=5, n_payments=5).start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def method_api(stub, monkeypatch):
+    """server.api pointed at the stub, with its own cache and scheduler and no store or shared state"""
+    monkeypatch.setattr(api, "base_url", stub.base_url)
+    monkeypatch.setattr(api, "response_cache", ResponseCache())
+    monkeypatch.setattr(api, "snapshot_store", None)
+    monkeypatch.setattr(api, "cassette", None)
+    monkeypatch.setattr(api, "scheduler", RequestScheduler())
+    monkeypatch.setattr(api, "shared_state", None)
+    monkeypatch.setattr(api, "_in_flight", {})
+    monkeypatch.setattr(api, "_idempotency_keys", {})
+    return stub
@@ -0,0 +1,117 @@
+import asyncio
+
+from server import api
+from server.store import SnapshotStore
+from tests.conftest import run
+
+
+def test_identical_gets_share_one_upstream_call(method_api):
+    async def main():
+        responses = await asyncio.gather(*(api.async_call_endpoint("/merchants", use_cache=False) for _ in range(5)))
+        return responses
+
+    before = method_api.request_count
+    responses = run(main())
+    assert method_api.request_count - before == 1
+    assert all(r == responses[0] for r in responses)
+    assert all(r is not responses[0] for r in responses[1:])
+
+
+def test_identical_job_posts_share_one_upstream_call(method_api):
+    account_id = next(iter(method_api.data["accounts"]))
+
+    async def main():
+        return await asyncio.gather(*(api.async_call_endpoint(f"/accounts/{account_id}/balances", "POST")
+                                      for _ in range(3)))
+
+    before = method_api.request_count
+    responses = run(main())
+    assert method_api.request_count - before == 1
+    assert len({r["data"]["id"] for r in responses}) == 1
+
+
+def test_identical_writes_share_an_idempotency_key(method_api):
+    async def main():
+        first = await api.idempotency_key_for("/payments", "POST", {"amount": 1})
+        again = await api.idempotency_key_for("/payments", "POST", {"amount": 1})
+        other = await api.idempotency_key_for("/payments", "POST", {"amount": 2})
+        return first, again, other
+
+    first, again, other = run(main())
+    assert first == again
+    assert first != other
+
+
+def test_write_invalidates_cached_parent(method_api):
+    entity_id = next(iter(method_api.data["entities"]))
+
+    async def main():
+        await api.async_call_endpoint(f"/entities/{entity_id}")
+        cached = method_api.request_count
+        await api.async_call_endpoint(f"/entities/{entity_id}")
+        assert method_api.request_count == cached
+        await api.async_call_endpoint(f"/entities/{entity_id}", "PUT", data={"status": "disabled"})
+        written = method_api.request_count
+        response = await api.async_call_endpoint(f"/entities/{entity_id}")
+        assert method_api.request_count == written + 1
+        return response
+
+    assert run(main())["data"]["status"] == "disabled"
+
+
+def test_store_serves_write_through_only_for_route_ttl(method_api, monkeypatch):
+    monkeypatch.setattr(api, "response_cache", None)
+    monkeypatch.setattr(api, "snapshot_store", SnapshotStore(":memory:"))
+    payment_id = next(iter(method_api.data["payments"]))
+
+    async def main():
+        await api.async_call_endpoint(f"/payments/{payment_id}")
+        before = method_api.request_count
+        await api.async_call_endpoint(f"/payments/{payment_id}")
+        assert method_api.request_count == before
+        method_api.update("payments", payment_id, status="settled")
+        # Age the written-through copy past the payments route's 10s TTL
+        for bucket in api.snapshot_store._objects.values():
+            updated_at, body, fetched_at, max_age = bucket[payment_id]
+            assert max_age == 10
+            bucket[payment_id] = (updated_at, body, fetched_at - max_age - 1, max_age)
+        return await api.async_call_endpoint(f"/payments/{payment_id}")
+
+    assert run(main())["data"]["status"] == "settled"
+
+
+def test_write_below_an_object_expires_its_stored_copy(method_api, monkeypatch):
+    monkeypatch.setattr(api, "snapshot_store", SnapshotStore(":memory:"))
+    account_id = next(iter(method_api.data["accounts"]))
+
+    async def main():
+        await api.sync_store(["accounts"])
+        before = method_api.request_count
+        await api.async_call_endpoint(f"/accounts/{account_id}")
+        assert method_api.request_count == before
+        await api.async_call_endpoint(f"/accounts/{account_id}/updates", "POST")
+        written = method_api.request_count
+        await api.async_call_endpoint(f"/accounts/{account_id}")
+        assert method_api.request_count == written + 1
+
+    run(main())
+
+
+def test_incremental_sync_watermark_ignores_write_through(method_api, monkeypatch):
+    monkeypatch.setattr(api, "snapshot_store", SnapshotStore(":memory:"))
+    store = api.snapshot_store
+    accounts = list(method_api.data["accounts"])
+
+    async def main():
+        await api.sync_store(["payments"], full=True)
+        synced = store.watermark(api.method_api_key, "payments")
+        assert synced == max(p["created_at"] for p in method_api.data["payments"].values())
+        created = await api.async_call_endpoint("/payments", "POST", data={
+            "source": accounts[0], "destination": accounts[1], "amount": 100})
+        # The written-through payment is newer, but only a sync may move the watermark
+        assert store.watermark(api.method_api_key, "payments") == synced
+        result = await api.sync_store(["payments"])
+        assert result["payments"]["fetched"] >= 1
+        assert store.watermark(api.method_api_key, "payments") == created["data"]["created_at"]
+
+    run(main())
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from server.scheduler import RequestScheduler, SchedulerBusyError, PRIORITY_INTERACTIVE, PRIORITY_BULK
+
+
+def test_release_hands_slot_to_highest_priority_waiter():
+    async def main():
+        scheduler = RequestScheduler(max_in_flight=1)
+        await scheduler._acquire(PRIORITY_INTERACTIVE)
+        order = []
+
+        async def wait(name, priority):
+            await scheduler._acquire(priority)
+            order.append(name)
+
+        bulk = asyncio.ensure_future(wait("bulk", PRIORITY_BULK))
+        interactive = asyncio.ensure_future(wait("interactive", PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        scheduler._release()
+        await asyncio.sleep(0)
+        assert order == ["interactive"]
+        # The slot moved straight to the waiter, never freed in between
+        assert scheduler._in_flight == 1
+        scheduler._release()
+        await asyncio.gather(bulk, interactive)
+        assert order == ["interactive", "bulk"]
+        scheduler._release()
+        assert scheduler._in_flight == 0
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_is_skipped():
+    async def main():
+        scheduler = RequestScheduler(max_in_flight=1)
+        await scheduler._acquire(PRIORITY_INTERACTIVE)
+        cancelled = asyncio.ensure_future(scheduler._acquire(PRIORITY_INTERACTIVE))
+        waiting = asyncio.ensure_future(scheduler._acquire(PRIORITY_BULK))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        scheduler._release()
+        await waiting
+        assert cancelled.cancelled()
+        assert scheduler._in_flight == 1
+        scheduler._release()
+        assert scheduler._in_flight == 0
+    asyncio.run(main())
+
+
+def test_waiter_cancelled_after_handover_releases_its_slot():
+    async def main():
+        scheduler = RequestScheduler(max_in_flight=1)
+        await scheduler._acquire(PRIORITY_INTERACTIVE)
+        waiter = asyncio.ensure_future(scheduler._acquire(PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        # Hand the slot over, then cancel before the waiter gets to run
+        scheduler._release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler._in_flight == 0
+        assert not scheduler._waiters
+    asyncio.run(main())
+
+
+def test_full_queue_is_rejected():
+    async def main():
+        scheduler = RequestScheduler(max_in_flight=1, max_queue=1)
+        await scheduler._acquire(PRIORITY_INTERACTIVE)
+        queued = asyncio.ensure_future(scheduler._acquire(PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerBusyError):
+            await scheduler._acquire(PRIORITY_INTERACTIVE)
+        assert scheduler.counters["rejected_queue_full"] == 1
+        scheduler._release()
+        await queued
+    asyncio.run(main())
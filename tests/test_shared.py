@@ -0,0 +1,63 @@
+import asyncio
+
+from server.shared import SharedStateServer, SharedStateClient
+
+
+def _with_server(tmp_path, test, **settings):
+    async def main():
+        server = SharedStateServer(str(tmp_path / "s.sock"), **settings)
+        await server.start()
+        clients = [SharedStateClient(server.path) for _ in range(2)]
+        try:
+            await test(server, *clients)
+        finally:
+            for client in clients:
+                await client.close()
+            await server.close()
+    asyncio.run(main())
+
+
+def test_waiter_gets_the_leader_result(tmp_path):
+    async def test(server, leader, waiter):
+        assert await leader.join_flight("k") == (True, None)
+        joined = asyncio.ensure_future(waiter.join_flight("k"))
+        await asyncio.sleep(0.05)
+        leader.finish_flight("k", {"data": 1})
+        assert await joined == (False, {"data": 1})
+        assert server.counters["flights_joined"] == 1
+    _with_server(tmp_path, test)
+
+
+def test_abandoned_flight_passes_to_the_next_waiter(tmp_path):
+    async def test(server, leader, waiter):
+        assert (await leader.join_flight("k"))[0]
+        joined = asyncio.ensure_future(waiter.join_flight("k"))
+        await asyncio.sleep(0.05)
+        leader.abandon_flight("k")
+        assert await joined == (True, None)
+        assert server.counters["flights_abandoned"] == 1
+        # The waiter now leads the flight; a second join waits on it again
+        follower = asyncio.ensure_future(leader.join_flight("k"))
+        await asyncio.sleep(0.05)
+        waiter.finish_flight("k", "done")
+        assert await follower == (False, "done")
+    _with_server(tmp_path, test)
+
+
+def test_disconnected_leader_abandons_its_flights(tmp_path):
+    async def test(server, leader, waiter):
+        assert (await leader.join_flight("k"))[0]
+        joined = asyncio.ensure_future(waiter.join_flight("k"))
+        await asyncio.sleep(0.05)
+        await leader.close()
+        assert await asyncio.wait_for(joined, 1) == (True, None)
+        assert server.counters["flights_abandoned"] == 1
+    _with_server(tmp_path, test)
+
+
+def test_waiter_times_out_and_leads(tmp_path):
+    async def test(server, leader, waiter):
+        assert (await leader.join_flight("k"))[0]
+        assert await waiter.join_flight("k") == (True, None)
+        assert server.counters["flights_timed_out"] == 1
+    _with_server(tmp_path, test, flight_timeout=0.1)
@@ -0,0 +1,55 @@
+from server.store import SnapshotStore
+
+KEY = "sk_test"
+ACCOUNT = {"id": "acc_1", "holder_id": "ent_1", "status": "active", "updated_at": "2024-01-01T00:00:00.000Z"}
+
+
+def test_get_honours_per_object_max_age(tmp_path):
+    store = SnapshotStore(str(tmp_path / "store.sqlite3"), max_age=300)
+    store.put_many(KEY, "accounts", [ACCOUNT])
+    assert store.get(KEY, "/accounts/acc_1")["data"]["id"] == "acc_1"
+    store.put_many(KEY, "accounts", [ACCOUNT], max_age=0)
+    assert store.get(KEY, "/accounts/acc_1") is None
+
+
+def test_invalidate_expires_the_path_and_its_ancestors(tmp_path):
+    store = SnapshotStore(str(tmp_path / "store.sqlite3"))
+    store.put_many(KEY, "accounts", [ACCOUNT, dict(ACCOUNT, id="acc_2")])
+    store.put_many(KEY, "entities", [{"id": "ent_1", "updated_at": "2024-01-01T00:00:00.000Z"}])
+    assert store.invalidate("/accounts/acc_1/updates", KEY) == 1
+    assert store.get(KEY, "/accounts/acc_1") is None
+    assert store.get(KEY, "/accounts/acc_2") is not None
+    assert store.get(KEY, "/entities/ent_1") is not None
+
+
+def test_invalidate_without_key_covers_every_tenant(tmp_path):
+    store = SnapshotStore(str(tmp_path / "store.sqlite3"))
+    store.put_many(KEY, "accounts", [ACCOUNT])
+    store.put_many("sk_other", "accounts", [ACCOUNT])
+    assert store.invalidate("/accounts/acc_1") == 2
+    assert store.get(KEY, "/accounts/acc_1") is None
+    assert store.get("sk_other", "/accounts/acc_1") is None
+
+
+def test_reload_picks_up_another_process_expiry(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    writer = SnapshotStore(path)
+    writer.put_many(KEY, "accounts", [ACCOUNT])
+    reader = SnapshotStore(path)
+    reader.open()
+    assert reader.get(KEY, "/accounts/acc_1") is not None
+    writer.invalidate("/accounts/acc_1", KEY)
+    reader.reload()
+    assert reader.get(KEY, "/accounts/acc_1") is None
+
+
+def test_watermark_survives_reopen(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    store = SnapshotStore(path)
+    assert store.watermark(KEY, "payments") is None
+    store.mark_synced(KEY, "payments", "2024-02-01T00:00:00.000Z")
+    store.close()
+    reopened = SnapshotStore(path)
+    reopened.open()
+    assert reopened.watermark(KEY, "payments") == "2024-02-01T00:00:00.000Z"
+    assert reopened.watermark("sk_other", "payments") is None
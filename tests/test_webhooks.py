@@ -0,0 +1,48 @@
+import asyncio
+import json
+
+from server import api
+from server.webhooks import WebhookReceiver, sign, verify_signature
+from tests.conftest import run
+
+SECRET = "whsec_test"
+
+
+def test_verify_signature():
+    body = b'{"type": "payment.update"}'
+    signature = sign(SECRET, body)
+    assert verify_signature(SECRET, body, signature)
+    assert verify_signature(SECRET, body, f"sha256={signature}")
+    assert not verify_signature(SECRET, body + b" ", signature)
+    assert not verify_signature("other", body, signature)
+    assert not verify_signature(SECRET, body, None)
+
+
+def test_unsigned_event_is_rejected(method_api):
+    receiver = WebhookReceiver(SECRET)
+    body = json.dumps({"type": "payment.update", "path": "/payments/pmt_000000"}).encode()
+    status, response = run(receiver.handle(body, sign("other", body)))
+    assert status == 401 and response["error"]
+    assert receiver.counters["rejected_signature"] == 1
+
+
+def test_signed_event_refreshes_the_resource_once(method_api):
+    receiver = WebhookReceiver(SECRET, cache_ttl=60)
+    payment_id = next(iter(method_api.data["payments"]))
+    body = json.dumps({"type": "payment.update", "path": f"/payments/{payment_id}", "event_id": "evt_1"}).encode()
+
+    async def main():
+        await api.async_call_endpoint(f"/payments/{payment_id}")
+        method_api.update("payments", payment_id, status="settled")
+        status, response = await receiver.handle(body, sign(SECRET, body))
+        assert (status, response["path"]) == (200, f"/payments/{payment_id}")
+        await asyncio.gather(*receiver._refreshes)
+        duplicate = await receiver.handle(body, sign(SECRET, body))
+        assert duplicate == (200, {"received": True, "duplicate": True})
+        refreshed = method_api.request_count
+        response = await api.async_call_endpoint(f"/payments/{payment_id}")
+        assert method_api.request_count == refreshed
+        return response
+
+    assert run(main())["data"]["status"] == "settled"
+    assert receiver.counters["refreshed"] == 1